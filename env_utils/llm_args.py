@@ -8,4 +8,49 @@ load_dotenv()
 api_key = os.getenv("API_KEY")
 base_url = os.getenv("BASE_URL")
 model = os.getenv("MODEL")
-visual_model = os.getenv("VISUAL_MODEL")
\ No newline at end of file
+visual_model = os.getenv("VISUAL_MODEL")
+
+# 单个规划步骤内并发执行的工具调用上限
+tool_max_concurrency = int(os.getenv("TOOL_MAX_CONCURRENCY", 4))
+# 单个进程内同时进行的视觉模型调用上限
+visual_max_concurrency = int(os.getenv("VISUAL_MAX_CONCURRENCY", 8))
+# 评估服务并发评分的默认工作协程数
+verify_max_workers = int(os.getenv("VERIFY_MAX_WORKERS", 4))
+# 评估服务每分钟最多发起的评分请求数，小于等于 0 表示不限制
+verify_requests_per_minute = float(os.getenv("VERIFY_REQUESTS_PER_MINUTE", 0))
+# 单个进程内所有智能体同时进行的大模型调用上限，小于等于 0 表示不限制
+llm_max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", 0))
+
+# 大模型调用限流与重试（所有智能体共用）
+llm_requests_per_minute = float(os.getenv("LLM_REQUESTS_PER_MINUTE", 0))  # 小于等于 0 表示不限制
+llm_tokens_per_minute = float(os.getenv("LLM_TOKENS_PER_MINUTE", 0))  # 小于等于 0 表示不限制
+llm_adaptive_concurrency = os.getenv("LLM_ADAPTIVE_CONCURRENCY", "false").lower() in ("1", "true", "yes")  # 默认关闭；开启后与 LLM_MAX_CONCURRENCY 的固定上限同时生效
+llm_initial_concurrency = int(os.getenv("LLM_INITIAL_CONCURRENCY", 16))
+llm_min_concurrency = int(os.getenv("LLM_MIN_CONCURRENCY", 1))
+llm_adaptive_max_concurrency = int(os.getenv("LLM_ADAPTIVE_MAX_CONCURRENCY", 64))
+llm_latency_tolerance = float(os.getenv("LLM_LATENCY_TOLERANCE", 2.0))  # 近期延迟超过长期延迟的倍数时下调并发
+llm_retry_max_attempts = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", 5))  # 包含第一次调用
+llm_retry_base_delay = float(os.getenv("LLM_RETRY_BASE_DELAY", 1.0))  # 秒
+llm_retry_max_delay = float(os.getenv("LLM_RETRY_MAX_DELAY", 60.0))  # 秒
+llm_circuit_failure_threshold = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", 10))  # 连续失败次数，小于等于 0 表示不熔断
+llm_circuit_cooldown = float(os.getenv("LLM_CIRCUIT_COOLDOWN", 30.0))  # 秒
+
+# 所有模型客户端共享的 HTTP 连接池
+http_max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+http_max_keepalive_connections = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+http_keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))  # 空闲连接保留时间（秒）
+http_connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", 10))
+http_read_timeout = float(os.getenv("HTTP_READ_TIMEOUT", 120))  # 等待模型响应的超时时间（秒）
+http2 = os.getenv("HTTP2", "false").lower() in ("1", "true", "yes")  # 需要安装 h2
+
+# 规划器消息历史窗口（只影响发送给模型的消息，会话记忆中仍保留完整历史）
+history_window_enabled = os.getenv("HISTORY_WINDOW_ENABLED", "false").lower() in ("1", "true", "yes")
+history_keep_turns = int(os.getenv("HISTORY_KEEP_TURNS", 3))  # 超出预算时原样保留的最近推理轮数（一轮 = 一条模型回复及其工具结果）
+history_token_budget = int(os.getenv("HISTORY_TOKEN_BUDGET", 24000))  # 单次调用的输入 token 预算（估算），小于等于 0 表示不限制
+history_summary_field_chars = int(os.getenv("HISTORY_SUMMARY_FIELD_CHARS", 300))  # 证据摘要中单个字段的最大字符数
+
+# 服务端前缀缓存
+# implicit：只保证系统提示前缀稳定，依赖服务端自动缓存
+# key：额外为请求附带按系统提示生成的 prompt_cache_key（OpenAI），相同前缀的请求路由到同一缓存
+prompt_cache_mode = os.getenv("PROMPT_CACHE_MODE", "implicit").lower()
+prompt_cache_key_prefix = os.getenv("PROMPT_CACHE_KEY_PREFIX", "cityguard")
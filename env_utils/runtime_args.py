@@ -0,0 +1,69 @@
+import os
+from dotenv import load_dotenv
+
+# 加载.env文件
+load_dotenv()
+
+# 图片缓存字节预算（base64 编码后的大小），默认 256MB
+image_cache_max_bytes = int(os.getenv("IMAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# 视觉执行器报告缓存
+report_cache_enabled = os.getenv("REPORT_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")  # 默认关闭：缓存跨进程复用视觉模型输出，开启后重复实验不再是独立样本
+report_cache_path = os.getenv(
+    "REPORT_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "report_cache.sqlite3")
+)
+report_cache_ttl = float(os.getenv("REPORT_CACHE_TTL", 7 * 24 * 3600))  # 秒，小于等于 0 表示永不过期
+report_cache_max_entries = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", 10000))
+
+# 规划器检查点（会话记忆）
+checkpoint_backend = os.getenv("CHECKPOINT_BACKEND", "memory")  # memory / sqlite
+checkpoint_path = os.getenv(
+    "CHECKPOINT_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "checkpoints.sqlite3")
+)
+checkpoint_ttl = float(os.getenv("CHECKPOINT_TTL", 24 * 3600))  # 会话空闲过期时间（秒），小于等于 0 表示永不过期
+checkpoint_max_threads = int(os.getenv("CHECKPOINT_MAX_THREADS", 1000))  # 内存后端最多保留的会话数
+checkpoint_keep_per_thread = int(os.getenv("CHECKPOINT_KEEP_PER_THREAD", 2))  # sqlite 后端每个会话保留的检查点数
+
+# /task 结果缓存
+task_cache_enabled = os.getenv("TASK_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+task_cache_ttl = float(os.getenv("TASK_CACHE_TTL", 600))  # 秒，小于等于 0 表示永不过期
+task_cache_max_entries = int(os.getenv("TASK_CACHE_MAX_ENTRIES", 256))
+
+# 元数据（城市地图、监控、摄像头、根因分析信息）
+meta_root = os.getenv(
+    "META_ROOT",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "guard", "meta")
+)
+meta_snapshot_enabled = os.getenv("META_SNAPSHOT_ENABLED", "true").lower() in ("1", "true", "yes")
+meta_snapshot_path = os.getenv(
+    "META_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "meta_snapshot.pickle")
+)
+meta_reload_interval = float(os.getenv("META_RELOAD_INTERVAL", 0))  # 检查 JSON 变更的间隔（秒），小于等于 0 表示不热加载
+
+# 发送给视觉模型前的图片预处理
+image_preprocess_enabled = os.getenv("IMAGE_PREPROCESS_ENABLED", "false").lower() in ("1", "true", "yes")  # 默认关闭：预处理会改变视觉模型看到的图片，开启后的实验结果与之前不可直接比较
+image_max_edge = int(os.getenv("IMAGE_MAX_EDGE", 1280))  # 最长边上限（像素），小于等于 0 表示不缩放
+image_jpeg_quality = int(os.getenv("IMAGE_JPEG_QUALITY", 85))
+image_grayscale = os.getenv("IMAGE_GRAYSCALE", "false").lower() in ("1", "true", "yes")
+image_variant_cache_dir = os.getenv(
+    "IMAGE_VARIANT_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "image_variants")
+)
+
+# 实验结果存储
+result_store_path = os.getenv(
+    "RESULT_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "guard", "experiment", "results", "results.sqlite3")
+)
+
+# SSE 流式输出
+stream_tokens = os.getenv("STREAM_TOKENS", "true").lower() in ("1", "true", "yes")  # 是否逐 token 输出推理过程与最终报告
+stream_coalesce_interval = float(os.getenv("STREAM_COALESCE_INTERVAL", 0.1))  # 增量合并为一帧的最短间隔（秒），小于等于 0 表示逐块发送
+
+# 最终报告生成器输入中的消息历史序列化
+transcript_compact = os.getenv("TRANSCRIPT_COMPACT", "false").lower() in ("1", "true", "yes")  # 默认关闭：精简后生成器的输入不同，开启后的报告得分与之前不可直接比较
+transcript_max_field_chars = int(os.getenv("TRANSCRIPT_MAX_FIELD_CHARS", 2000))  # 单个字段的最大字符数，小于等于 0 表示不截断
+transcript_dedup = os.getenv("TRANSCRIPT_DEDUP", "true").lower() in ("1", "true", "yes")
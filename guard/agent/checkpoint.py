@@ -0,0 +1,398 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+from env_utils.runtime_args import (
+    checkpoint_backend,
+    checkpoint_path,
+    checkpoint_ttl,
+    checkpoint_max_threads,
+    checkpoint_keep_per_thread,
+)
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    有界的内存检查点：按 thread_id 记录最近访问时间
+    超过 ttl 未访问的会话、以及超过 max_threads 时最久未访问的会话会被整体删除
+    """
+    def __init__(self, max_threads: int = checkpoint_max_threads, ttl: float = checkpoint_ttl):
+        """
+        初始化
+        :param max_threads: 最多保留的会话数
+        :param ttl: 会话空闲过期时间（秒），小于等于 0 表示永不过期
+        """
+        super().__init__()
+        self.max_threads: int = max_threads
+        self.ttl: float = ttl
+        self._lock = threading.Lock()
+        self._last_access: OrderedDict[str, float] = OrderedDict()
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        self._touch(config["configurable"]["thread_id"])
+        return super().get_tuple(config)
+
+    def put(self,
+            config: RunnableConfig,
+            checkpoint: Checkpoint,
+            metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        self._touch(config["configurable"]["thread_id"])
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        self._evict(current_thread_id=config["configurable"]["thread_id"])
+        return next_config
+
+    def put_writes(self,
+                   config: RunnableConfig,
+                   writes: Sequence[tuple[str, Any]],
+                   task_id: str,
+                   task_path: str = "") -> None:
+        self._touch(config["configurable"]["thread_id"])
+        super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._last_access.pop(thread_id, None)
+        super().delete_thread(thread_id)
+
+    def _touch(self, thread_id: str) -> None:
+        with self._lock:
+            self._last_access[thread_id] = time.monotonic()
+            self._last_access.move_to_end(thread_id)
+
+    def _evict(self, current_thread_id: str) -> None:
+        """淘汰过期会话与超出上限的最久未访问会话（不淘汰当前会话）"""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            overflow = len(self._last_access) - self.max_threads
+            # 按最近访问时间从旧到新遍历
+            for thread_id, last_access in self._last_access.items():
+                if thread_id == current_thread_id:
+                    continue
+                if overflow > 0:
+                    overflow -= 1
+                elif not 0 < self.ttl < now - last_access:
+                    break
+                expired.append(thread_id)
+        for thread_id in expired:
+            self.delete_thread(thread_id)
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[int]):
+    """
+    基于 SQLite 的检查点，多个 uvicorn worker 指向同一个文件即可共享会话状态
+    每个会话只保留最近 keep_per_thread 个检查点（压缩），超过 ttl 未更新的会话会被清理
+    异步接口在线程中执行同步实现，同一个实例可同时用于 invoke / ainvoke
+    """
+    def __init__(self,
+                 db_path: str = checkpoint_path,
+                 ttl: float = checkpoint_ttl,
+                 keep_per_thread: int = checkpoint_keep_per_thread,
+                 compact_interval: int = 100):
+        """
+        初始化
+        :param db_path: SQLite 文件路径
+        :param ttl: 会话空闲过期时间（秒），小于等于 0 表示永不过期
+        :param keep_per_thread: 每个会话保留的检查点数量，小于等于 0 表示全部保留
+        :param compact_interval: 每写入多少个检查点执行一次过期会话清理
+        """
+        super().__init__()
+        self.db_path: str = db_path
+        self.ttl: float = ttl
+        self.keep_per_thread: int = keep_per_thread
+        self.compact_interval: int = compact_interval
+
+        self._lock = threading.Lock()
+        self._put_count: int = 0
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT,
+                checkpoint BLOB,
+                metadata_type TEXT,
+                metadata BLOB,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT,
+                value BLOB,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            CREATE INDEX IF NOT EXISTS idx_checkpoints_updated ON checkpoints (updated_at);
+        """)
+        self._conn.commit()
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                 "metadata_type, metadata FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?")
+        params: list[Any] = [thread_id, checkpoint_ns]
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            writes = self._load_writes(row[0], row[1], row[2])
+        return self._to_tuple(row, writes)
+
+    def list(self,
+             config: RunnableConfig | None,
+             *,
+             filter: dict[str, Any] | None = None,
+             before: RunnableConfig | None = None,
+             limit: int | None = None) -> Iterator[CheckpointTuple]:
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                 "metadata_type, metadata FROM checkpoints")
+        conditions, params = [], []
+        if config is not None:
+            conditions.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                conditions.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                conditions.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None and (before_checkpoint_id := get_checkpoint_id(before)):
+            conditions.append("checkpoint_id < ?")
+            params.append(before_checkpoint_id)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY checkpoint_id DESC"
+
+        # 先完整读出再逐条产出，避免在迭代期间持有锁
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            writes_lst = [self._load_writes(row[0], row[1], row[2]) for row in rows]
+
+        for row, writes in zip(rows, writes_lst):
+            checkpoint_tuple = self._to_tuple(row, writes)
+            if filter and not all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield checkpoint_tuple
+
+    def put(self,
+            config: RunnableConfig,
+            checkpoint: Checkpoint,
+            metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 checkpoint_type, checkpoint_blob, metadata_type, metadata_blob, time.time())
+            )
+            self._compact_thread(thread_id, checkpoint_ns)
+            self._put_count += 1
+            if self.compact_interval > 0 and self._put_count % self.compact_interval == 0:
+                self._delete_expired_threads()
+            self._conn.commit()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(self,
+                   config: RunnableConfig,
+                   writes: Sequence[tuple[str, Any]],
+                   task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        # 与 InMemorySaver 一致：特殊通道（idx < 0）覆盖写入，普通写入已存在时跳过
+        replace_rows, ignore_rows = [], []
+        for idx, (channel, value) in enumerate(writes):
+            value_type, value_blob = self.serde.dumps_typed(value)
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            (replace_rows if write_idx < 0 else ignore_rows).append(
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, value_type, value_blob, task_path)
+            )
+
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", replace_rows)
+            self._conn.executemany("INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", ignore_rows)
+            self._conn.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self._conn.commit()
+
+    def compact(self) -> None:
+        """清理过期会话、压缩每个会话的历史检查点，并回收数据库文件空间"""
+        with self._lock:
+            self._delete_expired_threads()
+            for thread_id, checkpoint_ns in self._conn.execute(
+                "SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints"
+            ).fetchall():
+                self._compact_thread(thread_id, checkpoint_ns)
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self,
+                    config: RunnableConfig | None,
+                    *,
+                    filter: dict[str, Any] | None = None,
+                    before: RunnableConfig | None = None,
+                    limit: int | None = None) -> AsyncIterator[CheckpointTuple]:
+        checkpoint_tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    async def aput(self,
+                   config: RunnableConfig,
+                   checkpoint: Checkpoint,
+                   metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self,
+                          config: RunnableConfig,
+                          writes: Sequence[tuple[str, Any]],
+                          task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def _load_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> Sequence[tuple]:
+        """读取检查点的待写入数据，调用方需持有锁"""
+        return self._conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+
+    def _to_tuple(self, row: tuple, writes: Sequence[tuple]) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint_blob, \
+            metadata_type, metadata_blob = row
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((checkpoint_type, checkpoint_blob)),
+            metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value_blob)))
+                for task_id, channel, value_type, value_blob in writes
+            ],
+        )
+
+    def _compact_thread(self, thread_id: str, checkpoint_ns: str) -> None:
+        """只保留会话最近的 keep_per_thread 个检查点及其写入，调用方需持有锁"""
+        if self.keep_per_thread <= 0:
+            return
+        stale = self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_per_thread)
+        ).fetchall()
+        for (checkpoint_id,) in stale:
+            params = (thread_id, checkpoint_ns, checkpoint_id)
+            self._conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+            )
+            self._conn.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+            )
+
+    def _delete_expired_threads(self) -> None:
+        """删除超过 ttl 未更新的会话，调用方需持有锁"""
+        if self.ttl <= 0:
+            return
+        expired = self._conn.execute(
+            "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(updated_at) < ?",
+            (time.time() - self.ttl,)
+        ).fetchall()
+        for (thread_id,) in expired:
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+
+def create_checkpointer(backend: str = checkpoint_backend) -> BaseCheckpointSaver:
+    """
+    按配置创建检查点
+    :param backend: memory（有界内存）或 sqlite（文件持久化，可多进程共享）
+    :return: 检查点实例
+    """
+    if backend == "memory":
+        return BoundedMemorySaver()
+    if backend == "sqlite":
+        return SQLiteCheckpointSaver()
+    raise ValueError(f"未知的检查点后端: {backend}，可选: memory, sqlite")
@@ -1,60 +1,60 @@
-import base64
-import json
-from collections import defaultdict
+import asyncio
 from dataclasses import dataclass
+from functools import lru_cache
 
 from langchain.agents import create_agent
 from langchain.agents.structured_output import ToolStrategy
 from langchain_core.messages import HumanMessage
-from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
+from langchain_core.tools import StructuredTool
+from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import ToolRuntime
+from pydantic import BaseModel
 
 from env_utils.llm_args import *
-from guard.common.model import Monitor, MonitorReport, Camera, CameraReport, RootAnalyzeData
+from guard.agent.limiter import visual_call_limiter
+from guard.agent.llm import get_chat_model
+from guard.agent.middleware import agent_middleware
+from guard.common.image_store import image_store, EncodedImage
+from guard.common.meta_registry import meta_registry
+from guard.common.model import MonitorReport, CameraReport
 from guard.common.prompt import monitor_executor_sys_prompt, camera_executor_sys_prompt
+from guard.common.report_cache import report_cache
 
 
-def load_monitors(file_path: str) -> dict[str, Monitor]:
-    """加载监控信息"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    return {key: Monitor(**monitor_dict) for key, monitor_dict in data.items()}
-
-def load_cameras(file_path: str) -> tuple[dict[str, Camera], dict[str, list[Camera]]]:
-    """加载车载摄像头信息"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    area_camera_dict = defaultdict(list)
-    name_camera_dict = {key: Camera(**camera_dict) for key, camera_dict in data.items()}
-
-    for camera in name_camera_dict.values():
-        area_camera_dict[camera.camera_area].append(camera)
-    return name_camera_dict, area_camera_dict
-
-def load_root_analyze_info(file_path: str) -> dict[str, list[RootAnalyzeData]]:
-    """加载根因分析信息"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    return {key: [RootAnalyzeData(**root_analyze_data_dict) for root_analyze_data_dict in root_analyze_data_lst] for key, root_analyze_data_lst in data.items()}
-
-monitors = load_monitors('../meta/monitor_info.json')
-name_camera_dict, area_camera_dict = load_cameras('../meta/camera_info.json')
-root_analyze_info = load_root_analyze_info('../meta/root_analyze_info.json')
-
-monitor_executor = create_agent(
-    model=ChatOpenAI(model=visual_model, base_url=base_url, api_key=api_key),
-    tools=[],
-    response_format=ToolStrategy(MonitorReport)
-)
+def __getattr__(name: str):
+    """
+    兼容旧的导入方式（from guard.agent.executor import monitors 等），元数据与执行器在首次访问时才加载
+    新代码请直接使用 guard.common.meta_registry.meta_registry 与 get_*_executor
+    """
+    if name == "monitor_executor":
+        return get_monitor_executor()
+    if name == "camera_executor":
+        return get_camera_executor()
+    if name in ("city_map", "monitors", "root_analyze_info"):
+        return getattr(meta_registry, name)
+    if name == "name_camera_dict":
+        return meta_registry.cameras
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+@lru_cache(maxsize=None)
+def get_monitor_executor() -> CompiledStateGraph:
+    """监控执行器，首次使用时创建"""
+    return create_agent(
+        model=get_chat_model(visual_model),
+        tools=[],
+        middleware=agent_middleware(),
+        response_format=ToolStrategy(MonitorReport)
+    )
 
-camera_executor = create_agent(
-model=ChatOpenAI(model=visual_model, base_url=base_url, api_key=api_key),
-    tools=[],
-    response_format=ToolStrategy(CameraReport)
-)
+@lru_cache(maxsize=None)
+def get_camera_executor() -> CompiledStateGraph:
+    """车载摄像头执行器，首次使用时创建"""
+    return create_agent(
+        model=get_chat_model(visual_model),
+        tools=[],
+        middleware=agent_middleware(),
+        response_format=ToolStrategy(CameraReport)
+    )
 
 
 @dataclass
@@ -63,119 +63,86 @@ class PlannerContext:
     type_name: str
     id: int
 
-@tool
-def get_monitor_report(monitor_name: str, task_description: str, runtime: ToolRuntime[PlannerContext]) -> MonitorReport:
+@dataclass
+class ExecutorRequest:
+    """视觉执行器请求"""
+    cache_key: str                    # 报告缓存 key
+    inputs: dict                      # 执行器输入
+    cached_report: BaseModel | None   # 命中缓存时的历史报告
+    image_stats: dict                 # 本次请求的图片字节统计
+
+    def artifact(self, report: BaseModel, cache_hit: bool) -> dict:
+        """工具产物：结构化报告（供最终报告生成器使用，不发送给规划器），是否命中报告缓存，以及图片预处理节省的字节数"""
+        return {"cache_hit": cache_hit, "report": report.model_dump(), **self.image_stats}
+
+def _image_stats(images: list[EncodedImage]) -> dict:
+    """统计一次请求中原图与实际发送的图片字节数"""
+    original_bytes = sum(image.original_bytes for image in images)
+    sent_bytes = sum(image.sent_bytes for image in images)
+    return {"image_bytes": sent_bytes, "image_bytes_saved": original_bytes - sent_bytes}
+
+def _prepare_monitor_request(monitor_name: str, task_description: str, context: PlannerContext) -> ExecutorRequest:
     """
-    获取监控视角对应的分析报告
+    构建监控执行器请求
     :param monitor_name: 监控名称
     :param task_description: 市民举报信息
-    :param runtime: 工具运行时上下文
-    :return: 监控视角分析报告
+    :param context: 工具调用上下文
+    :return: 监控执行器请求
     """
-    # print(f"get_monitor_report: {monitor_name}")
     # 提取相关的举报信息
-    type_name = runtime.context.type_name
-    type_id = str(runtime.context.id)
-
-    # 提取监控编号
-    monitor_id = monitor_name.split('_')[1]
-
-    # 获取项目根路径
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(os.path.dirname(current_dir))
-
-    # 构建两种可能的图片路径
-    # 优先路径：datasets/{type_name}/{type_id}/monitor/{monitor_id}.jpg
-    image_path_priority = os.path.join(
-        project_root, 'datasets', type_name, type_id, 'monitor', f"{monitor_id}.jpg"
-    )
-    # 备选路径：datasets/base/monitor/{monitor_id}.jpg
-    image_path_fallback = os.path.join(
-        project_root, 'datasets', 'base', 'monitor', f"{monitor_id}.jpg"
-    )
+    type_name = context.type_name
+    type_id = str(context.id)
 
-    # 优先检查新路径，不存在则使用备选路径
-    if os.path.exists(image_path_priority):
-        image_path = image_path_priority
-    elif os.path.exists(image_path_fallback):
-        image_path = image_path_fallback
-    else:
-        # 两个路径都不存在时抛出异常
-        raise FileNotFoundError(f"监控图片不存在: {image_path_priority} or {image_path_fallback}")
+    # 监控编号在加载城市地图时已解析
+    city_map = meta_registry.city_map
+    monitor_id = city_map.monitor_image_id(monitor_name)
 
-    # 读取图片并转换为 base64
-    with open(image_path, "rb") as image_file:
-        encoded_string = base64.b64encode(image_file.read()).decode("utf-8")
+    # 从图片缓存中获取监控画面（路径解析、读取与 base64 编码只在首次访问时进行）
+    image = image_store.get_monitor_image(type_name, type_id, monitor_id)
 
     # 智能体分析监控画面
     prompt = monitor_executor_sys_prompt.format(
-        monitor=monitors[monitor_name],
+        monitor=city_map.monitors[monitor_name],
         task_description=task_description
     )
 
+    # 图片、prompt 和模型都未变化时直接复用历史报告
+    cache_key = report_cache.make_key(visual_model, prompt.content, [image.digest])
+    cached_report = report_cache.get(cache_key, MonitorReport)
+
     message_content = [
         {"type": "text", "text": prompt.content},
-        {"type": "image", "source_type": "base64", "data": encoded_string, "mime_type": "image/jpeg"}
+        {"type": "image", "source_type": "base64", "data": image.data, "mime_type": "image/jpeg"}
     ]
 
     inputs = {"messages": [HumanMessage(content=message_content)]}
 
-    response = monitor_executor.invoke(inputs)
+    return ExecutorRequest(cache_key=cache_key, inputs=inputs, cached_report=cached_report, image_stats=_image_stats([image]))
 
-    return response["structured_response"]
-
-@tool
-def get_camera_report(camera_area: str, task_description: str, runtime: ToolRuntime[PlannerContext]) -> CameraReport:
+def _prepare_camera_request(camera_area: str, task_description: str, context: PlannerContext) -> ExecutorRequest:
     """
-    获取车载摄像头视角对应的分析报告
-    :param camera_area: 车载摄像头所在的区域，示例：area_1
+    构建车载摄像头执行器请求
+    :param camera_area: 车载摄像头所在的区域
     :param task_description: 市民举报信息
-    :param runtime: 工具运行时上下文
-    :return: 车载摄像头视角分析报告
+    :param context: 工具调用上下文
+    :return: 车载摄像头执行器请求
     """
-    # print(f"get_camera_report:{camera_area}")
     # 提取相关的举报信息
-    type_name = runtime.context.type_name
-    type_id = str(runtime.context.id)
+    type_name = context.type_name
+    type_id = str(context.id)
 
     # 拿到当前区域的摄像头列表
-    camera_lst = area_camera_dict[camera_area]
-    camera_content_lst = []
-
-    # 获取项目跟路径
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(os.path.dirname(current_dir))
+    city_map = meta_registry.city_map
+    camera_lst = city_map.cameras_in(camera_area)
+    camera_image_lst = []
 
     # 按顺序拿到摄像头视角
     for camera in camera_lst:
-        # 拿到区域编号和摄像头编号
-        split_camera_name = camera.camera_name.split('_')
-        area_id = split_camera_name[1]
-        camera_id = split_camera_name[3]
-
-        # 构建两种可嫩的图片路径
-        # 优先路径: datasets/{type_name}/{type_id}/cameras/{area_id}/{camera_id}.jpg
-        image_path_priority = os.path.join(
-            project_root, 'datasets', type_name, type_id, 'cameras', str(area_id), f"{camera_id}.jpg"
-        )
-        # 备选路径: datasets/base/cameras/{area_id}/{camera_id}.jpg
-        image_path_fallback = os.path.join(
-            project_root, 'datasets', 'base', 'cameras', str(area_id), f"{camera_id}.jpg"
-        )
-
-        # 优先检查新路径，不存在则使用备选路径
-        if os.path.exists(image_path_priority):
-            image_path = image_path_priority
-        elif os.path.exists(image_path_fallback):
-            image_path = image_path_fallback
-        else:
-            # 两个路径都不存在时抛出异常
-            raise FileNotFoundError(f"监控图片不存在: {image_path_priority} or {image_path_fallback}")
-
-        # 读取图片并转换为 base64
-        with open(image_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode("utf-8")
-            camera_content_lst.append(encoded_string)
+        # 区域编号和摄像头编号在加载城市地图时已解析
+        area_id, camera_id = city_map.camera_image_id(camera.camera_name)
+
+        # 从图片缓存中获取摄像头画面
+        camera_image_lst.append(image_store.get_camera_image(type_name, type_id, area_id, camera_id))
 
     # 智能体分析摄像头画面
     prompt = camera_executor_sys_prompt.format(
@@ -183,25 +150,101 @@ def get_camera_report(camera_area: str, task_description: str, runtime: ToolRunt
         task_description=task_description
     )
 
+    # 图片、prompt 和模型都未变化时直接复用历史报告
+    cache_key = report_cache.make_key(visual_model, prompt.content, [image.digest for image in camera_image_lst])
+    cached_report = report_cache.get(cache_key, CameraReport)
+
     # 初始化消息正文
     message_content = [
         {"type": "text", "text": prompt.content}
     ]
 
     # 插入图片消息
-    for camera_content in camera_content_lst:
+    for camera_image in camera_image_lst:
         message_content.append({
             "type": "image",
             "source_type": "base64",
-            "data": camera_content,
+            "data": camera_image.data,
             "mime_type": "image/jpeg"
         })
 
     inputs = {"messages": [HumanMessage(content=message_content)]}
 
-    response = camera_executor.invoke(inputs)
+    return ExecutorRequest(cache_key=cache_key, inputs=inputs, cached_report=cached_report,
+                           image_stats=_image_stats(camera_image_lst))
+
+def _finish_request(request: ExecutorRequest, response: dict) -> tuple[BaseModel, dict]:
+    """写入报告缓存并返回工具结果"""
+    report = response["structured_response"]
+    report_cache.put(request.cache_key, report)
+    return report, request.artifact(report, cache_hit=False)
+
+def _get_monitor_report(monitor_name: str, task_description: str, runtime: ToolRuntime[PlannerContext]) -> tuple[MonitorReport, dict]:
+    """
+    获取监控视角对应的分析报告
+    :param monitor_name: 监控名称
+    :param task_description: 市民举报信息
+    :param runtime: 工具运行时上下文
+    :return: 监控视角分析报告，以及是否命中报告缓存与图片字节统计
+    """
+    request = _prepare_monitor_request(monitor_name, task_description, runtime.context)
+    if request.cached_report is not None:
+        return request.cached_report, request.artifact(request.cached_report, cache_hit=True)
+
+    with visual_call_limiter:
+        response = get_monitor_executor().invoke(request.inputs)
+    return _finish_request(request, response)
+
+async def _aget_monitor_report(monitor_name: str, task_description: str, runtime: ToolRuntime[PlannerContext]) -> tuple[MonitorReport, dict]:
+    """get_monitor_report 的异步版本，磁盘与缓存读写放到线程中执行，避免阻塞事件循环"""
+    request = await asyncio.to_thread(_prepare_monitor_request, monitor_name, task_description, runtime.context)
+    if request.cached_report is not None:
+        return request.cached_report, request.artifact(request.cached_report, cache_hit=True)
+
+    async with visual_call_limiter:
+        response = await get_monitor_executor().ainvoke(request.inputs)
+    return await asyncio.to_thread(_finish_request, request, response)
+
+def _get_camera_report(camera_area: str, task_description: str, runtime: ToolRuntime[PlannerContext]) -> tuple[CameraReport, dict]:
+    """
+    获取车载摄像头视角对应的分析报告
+    :param camera_area: 车载摄像头所在的区域，示例：area_1
+    :param task_description: 市民举报信息
+    :param runtime: 工具运行时上下文
+    :return: 车载摄像头视角分析报告，以及是否命中报告缓存与图片字节统计
+    """
+    request = _prepare_camera_request(camera_area, task_description, runtime.context)
+    if request.cached_report is not None:
+        return request.cached_report, request.artifact(request.cached_report, cache_hit=True)
+
+    with visual_call_limiter:
+        response = get_camera_executor().invoke(request.inputs)
+    return _finish_request(request, response)
+
+async def _aget_camera_report(camera_area: str, task_description: str, runtime: ToolRuntime[PlannerContext]) -> tuple[CameraReport, dict]:
+    """get_camera_report 的异步版本，磁盘与缓存读写放到线程中执行，避免阻塞事件循环"""
+    request = await asyncio.to_thread(_prepare_camera_request, camera_area, task_description, runtime.context)
+    if request.cached_report is not None:
+        return request.cached_report, request.artifact(request.cached_report, cache_hit=True)
+
+    async with visual_call_limiter:
+        response = await get_camera_executor().ainvoke(request.inputs)
+    return await asyncio.to_thread(_finish_request, request, response)
+
+# 同时提供同步与异步实现：invoke / stream 走同步版本，ainvoke / astream 走异步版本
+get_monitor_report = StructuredTool.from_function(
+    func=_get_monitor_report,
+    coroutine=_aget_monitor_report,
+    name="get_monitor_report",
+    response_format="content_and_artifact"
+)
 
-    return response["structured_response"]
+get_camera_report = StructuredTool.from_function(
+    func=_get_camera_report,
+    coroutine=_aget_camera_report,
+    name="get_camera_report",
+    response_format="content_and_artifact"
+)
 
 if __name__ == '__main__':
-    print(root_analyze_info)
\ No newline at end of file
+    print(meta_registry.root_analyze_info)
\ No newline at end of file
@@ -1,14 +1,29 @@
+from functools import lru_cache
+
 from langchain.agents.structured_output import ToolStrategy
+from langgraph.graph.state import CompiledStateGraph
 
 from env_utils.llm_args import *
 
 from langchain.agents import create_agent
-from langchain_openai import ChatOpenAI
 
+from guard.agent.llm import get_chat_model
+from guard.agent.middleware import agent_middleware
 from guard.common.model import FinalReport
 
-generator = create_agent(
-    model=ChatOpenAI(model=visual_model, base_url=base_url, api_key=api_key),
-    tools=[],
-    response_format=ToolStrategy(FinalReport)
-)
\ No newline at end of file
+
+@lru_cache(maxsize=None)
+def get_generator() -> CompiledStateGraph:
+    """最终报告生成器，首次使用时创建"""
+    return create_agent(
+        model=get_chat_model(visual_model),
+        tools=[],
+        middleware=agent_middleware(),
+        response_format=ToolStrategy(FinalReport)
+    )
+
+def __getattr__(name: str):
+    """兼容旧的导入方式（from guard.agent.generator import generator）"""
+    if name == "generator":
+        return get_generator()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,313 @@
+import asyncio
+import threading
+import time
+
+from env_utils.llm_args import visual_max_concurrency, verify_requests_per_minute, llm_max_concurrency
+
+
+class ConcurrencyLimiter:
+    """
+    并发上限，同时支持线程（with）与协程（async with）两种用法，两侧共用同一个计数，上限对整个进程生效
+    线程在条件变量上等待；协程在各自事件循环的 future 上等待，名额释放时被唤醒，不占用线程池
+    """
+    def __init__(self, limit: int):
+        """
+        初始化
+        :param limit: 最大并发数，小于等于 0 表示不限制
+        """
+        self._limit: float = float(limit)
+        self._inflight: int = 0
+        self._condition = threading.Condition()
+        self._async_waiters: list[asyncio.Future] = []   # 等待名额的协程，可能来自不同的事件循环
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    def __enter__(self) -> "ConcurrencyLimiter":
+        with self._condition:
+            while not self._available():
+                self._condition.wait()
+            self._inflight += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._release()
+
+    async def __aenter__(self) -> "ConcurrencyLimiter":
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._available():
+                    self._inflight += 1
+                    return self
+                waiter = loop.create_future()
+                self._async_waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                with self._condition:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._release()
+
+    def _available(self) -> bool:
+        return self.limit <= 0 or self._inflight < self.limit
+
+    def _release(self) -> None:
+        with self._condition:
+            self._inflight -= 1
+            self._wake_all()
+
+    def _wake_all(self) -> None:
+        """唤醒所有等待者重新检查名额（需持有锁），协程等待者在各自的事件循环中唤醒"""
+        self._condition.notify_all()
+        for waiter in self._async_waiters:
+            waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+        self._async_waiters.clear()
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class RateLimiter:
+    """
+    速率限制，按固定间隔依次放行请求
+    同时支持线程（acquire）与协程（aacquire）两种用法
+    """
+    def __init__(self, requests_per_minute: float):
+        """
+        初始化
+        :param requests_per_minute: 每分钟最多放行的请求数，小于等于 0 表示不限制
+        """
+        self.interval: float = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_time: float = 0.0
+
+    def acquire(self) -> None:
+        """阻塞直到可以发起下一次请求"""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self) -> None:
+        """异步等待直到可以发起下一次请求"""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _reserve(self) -> float:
+        """预约下一个放行时间点，返回需要等待的秒数"""
+        if self.interval <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_time)
+            self._next_time = slot + self.interval
+            return slot - now
+
+
+class TokenBucket:
+    """
+    令牌桶，按每分钟配额匀速补充，最多积攒 burst_seconds 秒的额度
+    允许预约透支：单次请求超过桶容量时也能放行，之后的请求等待额度补回
+    同时支持线程（acquire）与协程（aacquire）两种用法
+    """
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        """
+        初始化
+        :param per_minute: 每分钟配额（请求数或 token 数），小于等于 0 表示不限制
+        :param burst_seconds: 桶容量对应的秒数
+        """
+        self.rate: float = per_minute / 60.0 if per_minute > 0 else 0.0
+        self.capacity: float = max(self.rate * burst_seconds, 1.0)
+        self._lock = threading.Lock()
+        self._tokens: float = self.capacity
+        self._updated: float = time.monotonic()
+
+    def acquire(self, amount: float = 1.0) -> None:
+        """阻塞直到额度足够"""
+        delay = self.reserve(amount)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, amount: float = 1.0) -> None:
+        """异步等待直到额度足够"""
+        delay = self.reserve(amount)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        预约额度
+        :param amount: 需要的额度
+        :return: 需要等待的秒数
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return max(-self._tokens / self.rate, 0.0)
+
+    def adjust(self, delta: float) -> None:
+        """
+        按实际用量修正预约，例如请求结束后用真实 token 数替换估算值
+        :param delta: 实际用量减去预约用量，正数表示补扣，负数表示返还
+        :return: 无
+        """
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens - delta, self.capacity)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._tokens + (now - self._updated) * self.rate, self.capacity)
+        self._updated = now
+
+
+class AdaptiveConcurrencyLimiter(ConcurrencyLimiter):
+    """
+    自适应并发上限（AIMD）：
+    1. 调用成功时缓慢增加上限（每轮约 +1）
+    2. 被限流或超时时上限减半
+    3. 近期延迟明显高于长期延迟时小幅下调，在服务端排队之前主动降速；延迟按模型分别统计，
+       规划器、视觉模型等耗时差异很大的调用交替进行时不会被误判为变慢
+    等待方式与 ConcurrencyLimiter 相同，上限提高时也会唤醒等待者
+    """
+    def __init__(self, initial: int, min_limit: int = 1, max_limit: int = 64, latency_tolerance: float = 2.0):
+        """
+        初始化
+        :param initial: 初始并发上限
+        :param min_limit: 并发上限下限
+        :param max_limit: 并发上限上限
+        :param latency_tolerance: 近期延迟超过长期延迟的倍数时下调，小于等于 0 表示不按延迟调整
+        """
+        self.min_limit: int = max(min_limit, 1)
+        self.max_limit: int = max(max_limit, self.min_limit)
+        self.latency_tolerance: float = latency_tolerance
+        super().__init__(min(max(initial, self.min_limit), self.max_limit))
+        self._latency: dict[str, tuple[float, float]] = {}  # 模型 -> (近期延迟 EWMA, 长期延迟 EWMA)
+
+    def on_success(self, latency: float, model: str = "") -> None:
+        """
+        记录一次成功调用
+        :param latency: 调用耗时（秒）
+        :param model: 模型名称，延迟按模型分别统计
+        :return: 无
+        """
+        with self._condition:
+            fast, slow = self._latency.get(model, (latency, latency))
+            fast += 0.3 * (latency - fast)
+            slow += 0.05 * (latency - slow)
+            self._latency[model] = (fast, slow)
+
+            if 0 < self.latency_tolerance and fast > self.latency_tolerance * slow:
+                self._limit = max(self._limit * 0.9, self.min_limit)
+            else:
+                self._limit = min(self._limit + 1.0 / self._limit, self.max_limit)
+                self._wake_all()
+
+    def on_throttle(self) -> None:
+        """记录一次限流或超时"""
+        with self._condition:
+            self._limit = max(self._limit / 2, self.min_limit)
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开期间拒绝调用"""
+    def __init__(self, retry_after: float):
+        super().__init__(f"大模型接口连续失败，熔断中，{retry_after:.1f}s 后重试")
+        self.retry_after: float = retry_after
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败达到阈值后打开，冷却期内直接拒绝调用；冷却结束后放行一个探测请求（半开），
+    探测成功则关闭，失败则重新打开
+    """
+    def __init__(self, failure_threshold: int, cooldown: float):
+        """
+        初始化
+        :param failure_threshold: 连续失败次数阈值，小于等于 0 表示不熔断
+        :param cooldown: 打开后的冷却时间（秒）
+        """
+        self.failure_threshold: int = failure_threshold
+        self.cooldown: float = cooldown
+        self.state: str = "closed"  # closed / open / half_open
+        self.opened: int = 0        # 累计打开次数
+        self._failures: int = 0
+        self._opened_at: float = 0.0
+        self._probe_at: float | None = None
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """调用前检查，熔断中抛出 CircuitOpenError"""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "open":
+                remaining = self._opened_at + self.cooldown - now
+                if remaining > 0:
+                    raise CircuitOpenError(remaining)
+                self.state = "half_open"
+            if self.state == "half_open":
+                # 只放行一个探测请求；探测请求被取消等原因没有回报结果时，超过冷却时间再放行下一个
+                if self._probe_at is not None and now - self._probe_at < self.cooldown:
+                    raise CircuitOpenError(min(self.cooldown, 1.0))
+                self._probe_at = now
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probe_at = None
+            self.state = "closed"
+
+    def on_failure(self) -> None:
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self._failures += 1
+            self._probe_at = None
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opened += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+# 视觉模型调用并发上限（按进程部署）
+visual_call_limiter = ConcurrencyLimiter(visual_max_concurrency)
+
+# 评估服务评分请求速率限制
+verify_rate_limiter = RateLimiter(verify_requests_per_minute)
+
+# 所有智能体大模型调用的全局并发上限（按进程部署），由 LLMConcurrencyMiddleware 在每次模型调用时使用
+llm_call_limiter = ConcurrencyLimiter(llm_max_concurrency)
+
+
+def get_llm_call_limiter() -> ConcurrencyLimiter:
+    """获取当前的全局大模型调用并发上限"""
+    return llm_call_limiter
+
+
+def set_llm_max_concurrency(limit: int) -> None:
+    """
+    调整全局大模型调用并发上限，例如批量实验按接口配额设置
+    正在进行的调用仍在旧的限制器上释放，之后的调用使用新的上限
+    :param limit: 最大并发数，小于等于 0 表示不限制
+    :return: 无
+    """
+    global llm_call_limiter
+    llm_call_limiter = ConcurrencyLimiter(limit)
@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import warnings
+import weakref
+from typing import TYPE_CHECKING
+
+import httpx
+
+from env_utils.llm_args import (
+    api_key,
+    base_url,
+    http_max_connections,
+    http_max_keepalive_connections,
+    http_keepalive_expiry,
+    http_connect_timeout,
+    http_read_timeout,
+    http2,
+    llm_retry_max_attempts,
+)
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+
+class LoopLocalTransport(httpx.AsyncBaseTransport):
+    """
+    按事件循环区分连接池的异步传输层
+    httpx 的异步连接绑定在创建它的事件循环上，服务、基准测试与实验线程各自运行事件循环，
+    共用一个连接池时，其他事件循环留下的连接会在请求时出错；这里为每个事件循环单独维护连接池
+    """
+    def __init__(self, limits: httpx.Limits, http2: bool = False):
+        """
+        初始化
+        :param limits: 每个事件循环连接池的连接数限制
+        :param http2: 是否启用 HTTP/2
+        """
+        self.limits: httpx.Limits = limits
+        self.http2: bool = http2
+
+        self._lock = threading.Lock()
+        # 事件循环被回收后，对应的连接池随之释放
+        self._transports: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport] = \
+            weakref.WeakKeyDictionary()
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        """当前事件循环的连接池，首次使用时创建"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2)
+                self._transports[loop] = transport
+            return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环的连接池，其他事件循环的连接池无法在这里关闭，直接丢弃"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.pop(loop, None)
+            self._transports.clear()
+        if transport is not None:
+            await transport.aclose()
+
+
+class ModelClientRegistry:
+    """
+    模型客户端注册表：
+    1. 按 (模型名称, base_url) 缓存 ChatOpenAI 实例，同一模型的所有智能体共用一个实例
+    2. 所有实例共享同一组 httpx 连接池，避免每个客户端各自握手、各自维护空闲连接
+       同步调用共用一个连接池；异步调用每个事件循环一个连接池（见 LoopLocalTransport）
+    """
+    def __init__(self,
+                 max_connections: int = http_max_connections,
+                 max_keepalive_connections: int = http_max_keepalive_connections,
+                 keepalive_expiry: float = http_keepalive_expiry,
+                 connect_timeout: float = http_connect_timeout,
+                 read_timeout: float = http_read_timeout,
+                 http2: bool = http2):
+        """
+        初始化
+        :param max_connections: 连接池最大连接数
+        :param max_keepalive_connections: 最多保留的空闲连接数
+        :param keepalive_expiry: 空闲连接保留时间（秒）
+        :param connect_timeout: 建立连接超时时间（秒）
+        :param read_timeout: 读取响应超时时间（秒）
+        :param http2: 是否启用 HTTP/2，未安装 h2 时回退到 HTTP/1.1
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.http2: bool = http2 and self._h2_available()
+
+        self._lock = threading.Lock()
+        self._http_client: httpx.Client | None = None
+        self._http_async_client: httpx.AsyncClient | None = None
+        self._models: dict[tuple[str, str | None], "ChatOpenAI"] = {}
+
+    def get(self, model_name: str, model_base_url: str | None = base_url) -> "ChatOpenAI":
+        """
+        获取共享的聊天模型实例
+        langchain_openai 导入较慢，延迟到第一次创建模型时再导入
+        :param model_name: 模型名称
+        :param model_base_url: 模型服务地址
+        :return: ChatOpenAI 实例
+        """
+        key = (model_name, model_base_url)
+        chat_model = self._models.get(key)
+        if chat_model is not None:
+            return chat_model
+
+        from langchain_openai import ChatOpenAI
+
+        with self._lock:
+            if key not in self._models:
+                if self._http_client is None:
+                    self._http_client = httpx.Client(limits=self.limits, timeout=self.timeout, http2=self.http2)
+                    self._http_async_client = httpx.AsyncClient(
+                        timeout=self.timeout, transport=LoopLocalTransport(self.limits, self.http2)
+                    )
+                self._models[key] = ChatOpenAI(
+                    model=model_name,
+                    base_url=model_base_url,
+                    api_key=api_key,
+                    timeout=self.timeout,
+                    # 重试由 LLMRateControlMiddleware 统一负责，避免 SDK 内部重试与之叠加
+                    max_retries=0 if llm_retry_max_attempts > 1 else 2,
+                    # 流式调用也返回用量（含命中前缀缓存的 token 数），用于限流修正与缓存统计
+                    stream_usage=True,
+                    http_client=self._http_client,
+                    http_async_client=self._http_async_client,
+                )
+            return self._models[key]
+
+    def close(self) -> None:
+        """关闭同步连接池；异步连接池随进程退出释放"""
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+            self._http_client = None
+            self._http_async_client = None
+            self._models.clear()
+
+    @staticmethod
+    def _h2_available() -> bool:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            warnings.warn("HTTP2 已开启但未安装 h2（pip install httpx[http2]），回退到 HTTP/1.1")
+            return False
+        return True
+
+
+# 全局模型客户端注册表实例
+model_clients = ModelClientRegistry()
+
+
+def get_chat_model(model_name: str) -> "ChatOpenAI":
+    """
+    获取共享的聊天模型实例（默认 base_url）
+    :param model_name: 模型名称
+    :return: ChatOpenAI 实例
+    """
+    return model_clients.get(model_name)
@@ -0,0 +1,509 @@
+import asyncio
+import hashlib
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+import httpx
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from env_utils.llm_args import (
+    llm_requests_per_minute,
+    llm_tokens_per_minute,
+    llm_adaptive_concurrency,
+    llm_initial_concurrency,
+    llm_min_concurrency,
+    llm_adaptive_max_concurrency,
+    llm_latency_tolerance,
+    llm_retry_max_attempts,
+    llm_retry_base_delay,
+    llm_retry_max_delay,
+    llm_circuit_failure_threshold,
+    llm_circuit_cooldown,
+    history_window_enabled,
+    history_keep_turns,
+    history_token_budget,
+    history_summary_field_chars,
+    prompt_cache_mode,
+    prompt_cache_key_prefix,
+)
+from guard.agent.limiter import (
+    get_llm_call_limiter,
+    ConcurrencyLimiter,
+    TokenBucket,
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+from guard.common.transcript import TranscriptCompactor
+
+# openai SDK 中可以重试的异常（按类名判断，避免为此提前导入 openai）
+RETRYABLE_ERROR_NAMES = {"APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError"}
+
+# 估算请求 token 数时每张图片计入的 token 数
+IMAGE_TOKEN_ESTIMATE = 1000
+
+
+def is_retryable(error: BaseException) -> bool:
+    """限流、超时、连接失败与服务端错误可以重试，请求本身的错误（参数、鉴权、结构化输出校验等）不重试"""
+    if isinstance(error, (CircuitOpenError, httpx.TimeoutException, httpx.TransportError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if status_code in (408, 409, 429) or (isinstance(status_code, int) and status_code >= 500):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def is_throttled(error: BaseException) -> bool:
+    """限流或超时，说明服务端已经过载，需要降低并发"""
+    if isinstance(error, httpx.TimeoutException) or getattr(error, "status_code", None) == 429:
+        return True
+    return any(cls.__name__ in ("RateLimitError", "APITimeoutError") for cls in type(error).__mro__)
+
+
+def retry_after(error: BaseException) -> float | None:
+    """读取响应头中的 Retry-After（秒）"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(request: ModelRequest) -> int:
+    """按字符数粗略估算请求的输入 token 数，请求结束后再用实际用量修正"""
+    messages: list[BaseMessage] = list(request.messages)
+    if request.system_message is not None:
+        messages.append(request.system_message)
+
+    chars, images = 0, 0
+    for message in messages:
+        content = message.content
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for block in content:
+            if isinstance(block, str):
+                chars += len(block)
+            elif block.get("type") == "text":
+                chars += len(block.get("text", ""))
+            else:
+                images += 1
+    return chars // 2 + images * IMAGE_TOKEN_ESTIMATE + 1
+
+
+def _usage_tokens(response: ModelResponse | AIMessage) -> int | None:
+    """读取响应中的实际 token 用量"""
+    messages = response.result if isinstance(response, ModelResponse) else [response]
+    for message in messages:
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            return usage.get("total_tokens")
+    return None
+
+
+def _model_name(request: ModelRequest) -> str:
+    """请求使用的模型名称"""
+    return getattr(request.model, "model_name", "")
+
+
+class LLMConcurrencyMiddleware(AgentMiddleware):
+    """
+    全局大模型调用并发上限：只包住模型调用本身，工具执行期间不占用名额
+    规划器的工具内部还会调用执行器智能体，这样嵌套调用不会互相等待造成死锁
+    """
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
+        with get_llm_call_limiter():
+            return handler(request)
+
+    async def awrap_model_call(self, request: ModelRequest,
+                               handler: Callable[[ModelRequest], Awaitable[ModelResponse]]) -> ModelResponse:
+        async with get_llm_call_limiter():
+            return await handler(request)
+
+
+class LLMRateControlMiddleware(AgentMiddleware):
+    """
+    大模型调用限流与重试，所有智能体共用同一组状态：
+    1. 令牌桶同时限制每分钟请求数与 token 数（先按估算值预约，结束后按实际用量修正）
+    2. 自适应并发：根据延迟与限流情况自动调整同时进行的调用数
+    3. 限流、超时与服务端错误按带抖动的指数退避重试，优先使用响应中的 Retry-After
+    4. 连续失败达到阈值后熔断，冷却期内的调用等待而不是继续打到接口上
+    """
+    def __init__(self,
+                 requests_per_minute: float = llm_requests_per_minute,
+                 tokens_per_minute: float = llm_tokens_per_minute,
+                 adaptive_concurrency: bool = llm_adaptive_concurrency,
+                 initial_concurrency: int = llm_initial_concurrency,
+                 min_concurrency: int = llm_min_concurrency,
+                 max_concurrency: int = llm_adaptive_max_concurrency,
+                 latency_tolerance: float = llm_latency_tolerance,
+                 max_attempts: int = llm_retry_max_attempts,
+                 base_delay: float = llm_retry_base_delay,
+                 max_delay: float = llm_retry_max_delay,
+                 failure_threshold: int = llm_circuit_failure_threshold,
+                 cooldown: float = llm_circuit_cooldown):
+        """
+        初始化
+        :param requests_per_minute: 每分钟请求数上限，小于等于 0 表示不限制
+        :param tokens_per_minute: 每分钟 token 数上限，小于等于 0 表示不限制
+        :param adaptive_concurrency: 是否启用自适应并发
+        :param initial_concurrency: 初始并发上限
+        :param min_concurrency: 并发上限下限
+        :param max_concurrency: 并发上限上限
+        :param latency_tolerance: 同一模型的近期延迟超过长期延迟的倍数时下调并发
+        :param max_attempts: 最多调用次数（包含第一次）
+        :param base_delay: 退避基础时间（秒）
+        :param max_delay: 单次退避最长时间（秒）
+        :param failure_threshold: 熔断的连续失败次数，小于等于 0 表示不熔断
+        :param cooldown: 熔断冷却时间（秒）
+        """
+        super().__init__()
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.concurrency: AdaptiveConcurrencyLimiter | ConcurrencyLimiter = (
+            AdaptiveConcurrencyLimiter(initial_concurrency, min_concurrency, max_concurrency, latency_tolerance)
+            if adaptive_concurrency else ConcurrencyLimiter(0)
+        )
+        self.breaker = CircuitBreaker(failure_threshold, cooldown)
+        self.max_attempts: int = max(max_attempts, 1)
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+
+        self._lock = threading.Lock()
+        self.calls: int = 0
+        self.retries: int = 0
+        self.throttled: int = 0
+        self.failures: int = 0
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
+        estimate = estimate_tokens(request)
+        for attempt in itertools.count(1):
+            try:
+                self.breaker.before_call()
+                delay = max(self.request_bucket.reserve(1), self.token_bucket.reserve(estimate))
+                if delay > 0:
+                    time.sleep(delay)
+                with self.concurrency:
+                    start = time.perf_counter()
+                    response = handler(request)
+                self._on_success(response, estimate, time.perf_counter() - start, _model_name(request))
+                return response
+            except Exception as e:
+                time.sleep(self._on_failure(e, attempt, estimate))
+
+    async def awrap_model_call(self, request: ModelRequest,
+                               handler: Callable[[ModelRequest], Awaitable[ModelResponse]]) -> ModelResponse:
+        estimate = estimate_tokens(request)
+        for attempt in itertools.count(1):
+            try:
+                self.breaker.before_call()
+                delay = max(self.request_bucket.reserve(1), self.token_bucket.reserve(estimate))
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                async with self.concurrency:
+                    start = time.perf_counter()
+                    response = await handler(request)
+                self._on_success(response, estimate, time.perf_counter() - start, _model_name(request))
+                return response
+            except Exception as e:
+                await asyncio.sleep(self._on_failure(e, attempt, estimate))
+
+    def stats(self) -> dict:
+        """限流与重试统计信息"""
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "concurrency_limit": getattr(self.concurrency, "limit", 0),
+            "inflight": getattr(self.concurrency, "inflight", 0),
+            "circuit_state": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+        }
+
+    def _on_success(self, response: ModelResponse | AIMessage, estimate: int, latency: float, model: str) -> None:
+        self.breaker.on_success()
+        if isinstance(self.concurrency, AdaptiveConcurrencyLimiter):
+            self.concurrency.on_success(latency, model)
+        usage = _usage_tokens(response)
+        if usage is not None:
+            self.token_bucket.adjust(usage - estimate)
+        with self._lock:
+            self.calls += 1
+
+    def _on_failure(self, error: Exception, attempt: int, estimate: int) -> float:
+        """
+        记录失败并计算重试等待时间；不可重试或已达到重试次数时重新抛出异常
+        :return: 重试前等待的秒数
+        """
+        if not isinstance(error, CircuitOpenError):
+            # 请求没有成功，返还预约的 token 额度
+            self.token_bucket.adjust(-estimate)
+
+        if not is_retryable(error):
+            # 请求本身的错误说明接口可达，不计入熔断
+            self.breaker.on_success()
+            with self._lock:
+                self.failures += 1
+            raise error
+
+        if not isinstance(error, CircuitOpenError):
+            self.breaker.on_failure()
+            if is_throttled(error):
+                with self._lock:
+                    self.throttled += 1
+                if isinstance(self.concurrency, AdaptiveConcurrencyLimiter):
+                    self.concurrency.on_throttle()
+
+        if attempt >= self.max_attempts:
+            with self._lock:
+                self.failures += 1
+            raise error
+
+        with self._lock:
+            self.retries += 1
+        # 全抖动指数退避，避免大量请求在同一时刻重试
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if isinstance(error, CircuitOpenError):
+            delay = error.retry_after + random.uniform(0, self.base_delay)
+        server_delay = retry_after(error)
+        if server_delay is not None:
+            delay = max(delay, min(server_delay, self.max_delay))
+        return delay
+
+
+class HistoryWindowMiddleware(AgentMiddleware):
+    """
+    规划器消息历史窗口，只改写发送给模型的消息，图状态与会话记忆中仍保留完整历史（最终报告生成器使用完整历史）
+    只有输入超出 token 预算时才改写，预算内的请求原样发送：
+    1. 系统提示与第一条模型回复之前的消息（市民举报）原样保留
+    2. 最近若干轮推理（模型回复及其工具结果）原样保留，工具调用与工具结果始终成对出现
+    3. 更早的轮次压缩为一条证据摘要：只保留推理文本、工具调用参数与截断后的报告字段，重复的观察结果只出现一次
+    4. 仍然超出预算时逐步缩小原样保留的轮数，只保留 1 轮仍然超出时从最早的摘要开始省略
+    摘要由消息内容确定性生成，不额外调用模型，窗口滑动时只在摘要末尾追加内容
+    """
+    summary_header = "以下是此前推理步骤的证据摘要（工具原始结果已压缩，仅保留关键信息）："
+
+    def __init__(self,
+                 keep_turns: int = history_keep_turns,
+                 token_budget: int = history_token_budget,
+                 summary_field_chars: int = history_summary_field_chars,
+                 enabled: bool = history_window_enabled):
+        """
+        初始化
+        :param keep_turns: 超出预算时原样保留的最近推理轮数，至少保留 1 轮
+        :param token_budget: 单次调用的输入 token 预算（估算），小于等于 0 表示不限制（不改写）
+        :param summary_field_chars: 证据摘要中单个字段的最大字符数
+        :param enabled: 是否启用，关闭时原样发送完整历史
+        """
+        super().__init__()
+        self.keep_turns: int = max(keep_turns, 1)
+        self.token_budget: int = token_budget
+        self.enabled: bool = enabled
+        self.compactor = TranscriptCompactor(max_field_chars=summary_field_chars, dedup=True, enabled=True)
+
+        self._lock = threading.Lock()
+        self.calls: int = 0
+        self.windowed: int = 0
+        self.tokens_before: int = 0
+        self.tokens_after: int = 0
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
+        return handler(self.window(request))
+
+    async def awrap_model_call(self, request: ModelRequest,
+                               handler: Callable[[ModelRequest], Awaitable[ModelResponse]]) -> ModelResponse:
+        return await handler(self.window(request))
+
+    def window(self, request: ModelRequest) -> ModelRequest:
+        """
+        输入超出 token 预算时按窗口改写请求中的消息
+        :param request: 模型请求
+        :return: 改写后的模型请求，不需要改写时返回原请求
+        """
+        if not self.enabled:
+            return request
+        before = estimate_tokens(request)
+        if not self._over_budget(before):
+            self._record(windowed=False, before=before, after=before)
+            return request
+
+        messages = list(request.messages)
+        head_end = next((i for i, message in enumerate(messages) if isinstance(message, AIMessage)), len(messages))
+        head, turns = messages[:head_end], self._split_turns(messages[head_end:])
+
+        windowed = request
+        for keep in range(min(self.keep_turns, len(turns)), 0, -1):
+            older, recent = turns[:-keep], turns[-keep:]
+            summary = [self._summary(older)] if older else []
+            windowed = request.override(messages=head + summary + [m for turn in recent for m in turn])
+            if not self._over_budget(estimate_tokens(windowed)):
+                break
+        else:
+            windowed = self._trim_summary(windowed, head)
+
+        self._record(windowed=windowed is not request, before=before, after=estimate_tokens(windowed))
+        return windowed
+
+    def stats(self) -> dict:
+        """窗口统计信息（token 数为估算值）"""
+        return {
+            "calls": self.calls,
+            "windowed": self.windowed,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": self.tokens_before - self.tokens_after,
+        }
+
+    @staticmethod
+    def _split_turns(messages: list[BaseMessage]) -> list[list[BaseMessage]]:
+        """按轮次切分：每轮以一条模型回复（或续接会话时新的用户消息）开始，后面跟随对应的工具结果"""
+        turns: list[list[BaseMessage]] = []
+        for message in messages:
+            if isinstance(message, (AIMessage, HumanMessage)) or not turns:
+                turns.append([message])
+            else:
+                turns[-1].append(message)
+        return turns
+
+    def _over_budget(self, tokens: int) -> bool:
+        return 0 < self.token_budget < tokens
+
+    def _record(self, windowed: bool, before: int, after: int) -> None:
+        with self._lock:
+            self.calls += 1
+            self.windowed += windowed
+            self.tokens_before += before
+            self.tokens_after += after
+
+    def _summary(self, turns: list[list[BaseMessage]]) -> HumanMessage:
+        transcript, _ = self.compactor.render([message for turn in turns for message in turn])
+        return HumanMessage(content=f"{self.summary_header}\n{transcript}")
+
+    def _trim_summary(self, request: ModelRequest, head: list[BaseMessage]) -> ModelRequest:
+        """只保留 1 轮仍然超出预算时，从最早的摘要行开始省略"""
+        summary = request.messages[len(head)] if len(request.messages) > len(head) else None
+        if not isinstance(summary, HumanMessage) or not summary.text.startswith(self.summary_header):
+            return request
+        lines = summary.text.split("\n")[1:]
+        excess_chars = (estimate_tokens(request) - self.token_budget) * 2
+        dropped = 0
+        while lines and excess_chars > 0:
+            excess_chars -= len(lines[0]) + 1
+            lines.pop(0)
+            dropped += 1
+        trimmed = HumanMessage(content="\n".join([self.summary_header, f"（更早的 {dropped} 行摘要已省略）", *lines]))
+        messages = list(request.messages)
+        messages[len(head)] = trimmed
+        return request.override(messages=messages)
+
+
+class PromptCacheMiddleware(AgentMiddleware):
+    """
+    服务端前缀缓存：
+    1. key 模式下为请求附带 prompt_cache_key，按模型名称与系统提示内容生成，相同前缀的请求共用同一缓存
+    2. 统计每次调用的输入 token 中命中缓存（cache_read）与未命中缓存的数量，保留最近若干次调用的明细
+    """
+    def __init__(self, mode: str = prompt_cache_mode, key_prefix: str = prompt_cache_key_prefix, recent_calls: int = 100):
+        """
+        初始化
+        :param mode: implicit / key，见 PROMPT_CACHE_MODE
+        :param key_prefix: prompt_cache_key 前缀
+        :param recent_calls: 保留明细的最近调用次数
+        """
+        super().__init__()
+        self.mode: str = mode
+        self.key_prefix: str = key_prefix
+
+        self._lock = threading.Lock()
+        self._keys: dict[str, str] = {}   # 系统提示 -> prompt_cache_key
+        self.calls: int = 0
+        self.calls_without_usage: int = 0
+        self.input_tokens: int = 0
+        self.cached_tokens: int = 0
+        self.recent: deque[dict] = deque(maxlen=recent_calls)
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
+        response = handler(self._with_cache_key(request))
+        self._record(request, response)
+        return response
+
+    async def awrap_model_call(self, request: ModelRequest,
+                               handler: Callable[[ModelRequest], Awaitable[ModelResponse]]) -> ModelResponse:
+        response = await handler(self._with_cache_key(request))
+        self._record(request, response)
+        return response
+
+    def cache_key(self, request: ModelRequest) -> str | None:
+        """按模型名称与系统提示内容生成 prompt_cache_key，没有系统提示时返回 None"""
+        if request.system_message is None:
+            return None
+        text = f"{_model_name(request)}\n{request.system_message.text}"
+        key = self._keys.get(text)
+        if key is None:
+            key = f"{self.key_prefix}-{hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]}"
+            with self._lock:
+                self._keys[text] = key
+        return key
+
+    def stats(self) -> dict:
+        """缓存统计信息：命中缓存与未命中缓存的输入 token 数"""
+        return {
+            "mode": self.mode,
+            "calls": self.calls,
+            "calls_without_usage": self.calls_without_usage,
+            "input_tokens": self.input_tokens,
+            "cached_tokens": self.cached_tokens,
+            "uncached_tokens": self.input_tokens - self.cached_tokens,
+            "cache_hit_rate": round(self.cached_tokens / self.input_tokens, 4) if self.input_tokens else 0.0,
+        }
+
+    def _with_cache_key(self, request: ModelRequest) -> ModelRequest:
+        if self.mode != "key" or (key := self.cache_key(request)) is None:
+            return request
+        return request.override(model_settings={**request.model_settings, "prompt_cache_key": key})
+
+    def _record(self, request: ModelRequest, response: ModelResponse | AIMessage) -> None:
+        usage = prompt_cache_usage(response)
+        with self._lock:
+            self.calls += 1
+            if usage is None:
+                self.calls_without_usage += 1
+                return
+            self.input_tokens += usage["input_tokens"]
+            self.cached_tokens += usage["cached_tokens"]
+            self.recent.append({"model": _model_name(request), **usage})
+
+
+def prompt_cache_usage(response: ModelResponse | AIMessage) -> dict | None:
+    """
+    读取一次调用的输入 token 缓存情况
+    :return: 输入 token 数、命中缓存与未命中缓存的 token 数；响应中没有用量信息时返回 None
+    """
+    messages = response.result if isinstance(response, ModelResponse) else [response]
+    for message in messages:
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            input_tokens = usage.get("input_tokens", 0)
+            cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0)
+            return {"input_tokens": input_tokens, "cached_tokens": cached_tokens, "uncached_tokens": input_tokens - cached_tokens}
+    return None
+
+
+# 全局中间件实例，所有智能体共用
+llm_rate_control_middleware = LLMRateControlMiddleware()
+llm_concurrency_middleware = LLMConcurrencyMiddleware()
+prompt_cache_middleware = PromptCacheMiddleware()
+# 全局消息历史窗口实例，规划器使用
+history_window_middleware = HistoryWindowMiddleware()
+
+
+def agent_middleware() -> list[AgentMiddleware]:
+    """所有智能体默认使用的中间件，列表中靠前的在外层：先限流与重试，再占用全局并发名额，最内层附带缓存 key 并统计缓存命中"""
+    return [llm_rate_control_middleware, llm_concurrency_middleware, prompt_cache_middleware]
@@ -1,38 +1,86 @@
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+import threading
+
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, SystemMessage
 from langgraph.graph.state import CompiledStateGraph
 
-from guard.agent.executor import monitors, get_monitor_report, get_camera_report, PlannerContext, root_analyze_info
-from langgraph.checkpoint.memory import InMemorySaver
+from guard.agent.executor import get_monitor_report, get_camera_report, PlannerContext
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
 from env_utils.llm_args import *
 from langchain.agents import create_agent
-from langchain_openai import ChatOpenAI
 
-from guard.agent.generator import generator
+from guard.agent.checkpoint import create_checkpointer
+from guard.agent.generator import get_generator
+from guard.agent.llm import get_chat_model
+from guard.agent.middleware import agent_middleware, history_window_middleware
+from guard.common.meta_registry import meta_registry
 from guard.common.model import FinalReport
-from guard.common.prompt import planner_sys_prompt, generator_sys_prompt
+from guard.common.prompt import planner_sys_prompt
+from guard.common.transcript import generator_prompt
+
+
+_planner_prompt_lock = threading.Lock()
+_planner_prompt: tuple[object, SystemMessage] | None = None  # (渲染时的城市地图, 系统提示)
+
+
+def planner_system_prompt() -> SystemMessage:
+    """
+    规划器默认系统提示：只渲染一次，所有规划器实例共用同一个对象，保证每次请求的前缀完全一致
+    元数据热加载后城市地图或监控信息变化时重新渲染
+    """
+    global _planner_prompt
+    city_map = meta_registry.city_map
+    cached = _planner_prompt
+    if cached is not None and cached[0] is city_map:
+        return cached[1]
+    with _planner_prompt_lock:
+        if _planner_prompt is None or _planner_prompt[0] is not city_map:
+            _planner_prompt = (city_map, planner_sys_prompt.format(
+                city_grid=city_map.render_grid(), monitor_info=city_map.monitors
+            ))
+        return _planner_prompt[1]
+
 
 class Planner:
     """智能体规划器，是主要的智能体实现"""
     def __init__(self,
                  type_name: str,
                  tools: list | None = [get_monitor_report, get_camera_report],
-                 system_prompt: str = planner_sys_prompt.format(monitor_info=monitors)):
+                 system_prompt: str | SystemMessage | None = None,
+                 checkpointer: BaseCheckpointSaver | None = None,
+                 history_window: bool = False):
         """
         智能体初始化
         :param type_name: 类型名称，用于查询监控信息和根因分析信息
         :param tools: 工具列表，默认包含监控执行器和车载摄像头执行器
-        :param system_prompt: 系统提示，默认包含监控信息和根因分析信息
+        :param system_prompt: 系统提示，默认为包含监控信息的 planner_sys_prompt（见 planner_system_prompt）
+        :param checkpointer: 智能体记忆，默认按 CHECKPOINT_BACKEND 配置创建
+        :param history_window: 是否使用消息历史窗口（仍受 HISTORY_WINDOW_ENABLED 控制），默认不使用，实验结果不受影响
         """
         self.type_name: str = type_name
         self.planner: CompiledStateGraph = create_agent(
-            model=ChatOpenAI(model=model, base_url=base_url, api_key=api_key),
+            model=get_chat_model(model),
             tools=tools,
-            system_prompt=system_prompt,
+            system_prompt=system_prompt or planner_system_prompt(),
+            # 消息历史窗口在最外层，限流按改写后的消息估算 token 数
+            middleware=[history_window_middleware, *agent_middleware()] if history_window else agent_middleware(),
             context_schema=PlannerContext,
-            checkpointer=InMemorySaver()  # 智能体记忆
+            checkpointer=checkpointer or create_checkpointer()  # 智能体记忆
         )
 
+    @staticmethod
+    def _config(task_uuid: str) -> dict:
+        """
+        构建智能体运行配置
+        同一步骤内的多个工具调用由图并行执行，max_concurrency 限制其并发数，结果仍按工具调用顺序写回消息历史
+        :param task_uuid: 任务 uuid，作为会话 thread_id
+        :return: 运行配置
+        """
+        return {
+            "configurable": {"thread_id": task_uuid},
+            "max_concurrency": tool_max_concurrency
+        }
+
     def run(self, task_uuid: str, user_prompt: str, type_id: int) -> str:
         """
         执行智能体规划流程
@@ -43,7 +91,7 @@ class Planner:
         """
         response = self.planner.invoke(
             {"messages": [HumanMessage(content=f"市民举报信息如下：{user_prompt}")]},
-            {"configurable": {"thread_id": task_uuid}},
+            self._config(task_uuid),
             context=PlannerContext(type_name=self.type_name, id=type_id)
         )
 
@@ -60,7 +108,7 @@ class Planner:
         """
         response = self.planner.invoke(
             {"messages": [HumanMessage(content=f"市民举报信息如下：{user_prompt}")]},
-            {"configurable": {"thread_id": task_uuid}},
+            self._config(task_uuid),
             context=PlannerContext(type_name=self.type_name, id=type_id)
         )
 
@@ -78,15 +126,15 @@ class Planner:
         """
         response = self.planner.invoke(
             {"messages": [HumanMessage(content=f"市民举报信息如下：{user_prompt}")]},
-            {"configurable": {"thread_id": task_uuid}},
+            self._config(task_uuid),
             context=PlannerContext(type_name=self.type_name, id=type_id)
         )
 
         messages = response["messages"]
 
         # 调用 generator 做总结，统一报告格式
-        prompt = generator_sys_prompt.format(user_prompt=user_prompt, agent_response=messages)
-        final_report = generator.invoke({"messages": [prompt]})
+        prompt, _ = generator_prompt(user_prompt, messages)
+        final_report = get_generator().invoke({"messages": [prompt]})
 
         return (messages[-1].content_blocks[-1]['text'],
                 len(messages),
@@ -102,7 +150,7 @@ class Planner:
         """
         response = self.planner.invoke(
             {"messages": [HumanMessage(content=f"市民举报信息如下：{user_prompt}")]},
-            {"configurable": {"thread_id": task_uuid}},
+            self._config(task_uuid),
             context=PlannerContext(type_name=self.type_name, id=type_id)
         )
 
@@ -121,7 +169,7 @@ class DefaultPlanner(Planner):
         初始化，默认运行 garbage 类型的第一个样例
         """
         super().__init__(type_name=type_name)
-        self.data = root_analyze_info[type_name][id]
+        self.data = meta_registry.root_analyze_info[type_name][id]
 
     def run_default(self) -> str:
         return self.run(task_uuid="uuid-1", user_prompt=self.data.user_prompt, type_id=self.data.id)
@@ -136,7 +184,7 @@ class DefaultPlanner(Planner):
         """流式打印到控制台"""
         for chunk in self.planner.stream(
             {"messages": [HumanMessage(content=f"市民举报信息如下：{self.data.user_prompt}")]},
-            {"configurable": {"thread_id": "uuid-1"}},
+            self._config("uuid-1"),
             context=PlannerContext(type_name=self.data.type_name, id=self.data.id),
             stream_mode="updates"
         ):
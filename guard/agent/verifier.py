@@ -1,37 +1,67 @@
+from functools import lru_cache
+
 from langchain.agents.structured_output import ToolStrategy
 from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
+from langgraph.graph.state import CompiledStateGraph
 
 from env_utils.llm_args import *
 from langchain.agents import create_agent
 
-from guard.agent.executor import root_analyze_info
+from guard.agent.llm import get_chat_model
+from guard.agent.middleware import agent_middleware
+from guard.common.meta_registry import meta_registry
 from guard.common.model import VerifyReport
 from guard.common.prompt import verifier_sys_prompt, server_verifier_sys_prompt
 
-verifier = create_agent(
-    model=ChatOpenAI(model=visual_model, base_url=base_url, api_key=api_key),
-    tools=[],
-    system_prompt=verifier_sys_prompt.format()
-)
+@lru_cache(maxsize=None)
+def get_verifier() -> CompiledStateGraph:
+    """实验评分器，首次使用时创建"""
+    return create_agent(
+        model=get_chat_model(visual_model),
+        tools=[],
+        middleware=agent_middleware(),
+        system_prompt=verifier_sys_prompt.format()
+    )
 
-server_verifier = create_agent(
-    model=ChatOpenAI(model=visual_model, base_url=base_url, api_key=api_key),
-    tools=[],
-    system_prompt=server_verifier_sys_prompt.format(),
-    response_format=ToolStrategy(VerifyReport)
-)
+@lru_cache(maxsize=None)
+def get_server_verifier() -> CompiledStateGraph:
+    """评估服务评分器，首次使用时创建"""
+    return create_agent(
+        model=get_chat_model(visual_model),
+        tools=[],
+        middleware=agent_middleware(),
+        system_prompt=server_verifier_sys_prompt.format(),
+        response_format=ToolStrategy(VerifyReport)
+    )
+
+def __getattr__(name: str):
+    """兼容旧的导入方式（from guard.agent.verifier import verifier / server_verifier）"""
+    if name == "verifier":
+        return get_verifier()
+    if name == "server_verifier":
+        return get_server_verifier()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def verify(report: str, answer: str) -> float:
-    response = verifier.invoke(
+    response = get_verifier().invoke(
         {"messages": [HumanMessage(content=f"智能体报告结果如下：{report}; 参考答案如下：{answer}")]},
     )
     return float(response["messages"][-1].content_blocks[-1]['text'])
 
 def server_verify(type_name: str, id: int, response: str) -> VerifyReport:
-    answer = root_analyze_info[type_name][id - 1].root_cause
+    answer = meta_registry.root_analyze_info[type_name][id - 1].root_cause
+
+    response = get_server_verifier().invoke(
+        {"messages": [HumanMessage(content=f"智能体报告结果如下：{response}; 参考答案如下：{answer}")]},
+    )
+
+    return response["structured_response"]
+
+async def aserver_verify(type_name: str, id: int, response: str) -> VerifyReport:
+    """server_verify 的异步版本"""
+    answer = meta_registry.root_analyze_info[type_name][id - 1].root_cause
 
-    response = server_verifier.invoke(
+    response = await get_server_verifier().ainvoke(
         {"messages": [HumanMessage(content=f"智能体报告结果如下：{response}; 参考答案如下：{answer}")]},
     )
 
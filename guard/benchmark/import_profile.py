@@ -0,0 +1,91 @@
+"""
+导入耗时分析：在子进程中以 python -X importtime 导入目标模块，汇总总耗时与最慢的模块
+
+用法：
+    python -m guard.benchmark.import_profile
+    python -m guard.benchmark.import_profile guard.server.main guard.experiment.solver --top 15 --max-seconds 1.0
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def profile_import(module: str) -> dict:
+    """
+    在干净的子进程中导入模块并解析 -X importtime 输出
+    :param module: 模块名，例如 guard.server.main
+    :return: 总耗时（秒）以及每个模块的自身耗时与累计耗时（秒）
+    """
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [project_root, os.environ.get("PYTHONPATH")]))}
+
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=project_root
+    )
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{completed.stderr[-2000:]}")
+
+    modules = []
+    for line in completed.stderr.splitlines():
+        # 格式：import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append({
+            "module": name.strip(),
+            "self_s": int(self_us) / 1e6,
+            "cumulative_s": int(cumulative_us) / 1e6,
+            "depth": (len(name) - len(name.lstrip())) // 2,
+        })
+
+    top_level = next((m for m in reversed(modules) if m["module"] == module), None)
+    return {
+        "module": module,
+        "wall_s": round(wall, 4),
+        "import_s": round(top_level["cumulative_s"], 4) if top_level else None,
+        "module_count": len(modules),
+        "modules": modules,
+    }
+
+
+def print_report(result: dict, top: int) -> None:
+    print(f"\n{result['module']}: 导入 {result['import_s']}s（进程总耗时 {result['wall_s']}s，共 {result['module_count']} 个模块）")
+    print(f"{'累计(s)':>10} {'自身(s)':>10}  模块")
+    for item in sorted(result["modules"], key=lambda m: m["self_s"], reverse=True)[:top]:
+        print(f"{item['cumulative_s']:>10.4f} {item['self_s']:>10.4f}  {item['module']}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="CityGuard 导入耗时分析")
+    parser.add_argument("modules", nargs="*", default=["guard.server.main"])
+    parser.add_argument("--top", type=int, default=20, help="列出自身耗时最长的模块数")
+    parser.add_argument("--max-seconds", type=float, default=None, help="任一模块导入超过该耗时时返回非零退出码")
+    parser.add_argument("--output", default=None, help="保存完整结果的 JSON 路径")
+    args = parser.parse_args()
+
+    results = [profile_import(module) for module in args.modules]
+    for result in results:
+        print_report(result, args.top)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.max_seconds is not None:
+        slow = [r for r in results if r["import_s"] is not None and r["import_s"] > args.max_seconds]
+        for result in slow:
+            print(f"导入过慢: {result['module']} {result['import_s']}s > {args.max_seconds}s")
+        if slow:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+# 结构化输出（ToolStrategy）对应的工具名称 -> 调用阶段
+STRUCTURED_STAGES = {
+    "MonitorReport": "executor",
+    "CameraReport": "executor",
+    "FinalReport": "generator",
+    "VerifyReport": "verifier",
+}
+
+# 规划器工具名称
+PLANNER_TOOLS = {"get_monitor_report", "get_camera_report"}
+
+# 规划器工具调用 id 中记录的调用轮次，例如 call_r2_xxx
+ROUND_ID_PATTERN = re.compile(r"^call_r(\d+)_")
+
+
+def classify_request(tool_names: list[str]) -> str:
+    """
+    根据请求携带的工具判断调用阶段
+    :param tool_names: 请求中的工具名称
+    :return: planner / executor / generator / verifier / text
+    """
+    for name in tool_names:
+        if name in STRUCTURED_STAGES:
+            return STRUCTURED_STAGES[name]
+    if PLANNER_TOOLS & set(tool_names):
+        return "planner"
+    return "text"
+
+
+class MockLLMServer:
+    """
+    本地 OpenAI 兼容的模拟服务，只实现 /chat/completions（支持 stream）：
+    1. 规划器请求：前 rounds 轮按脚本返回工具调用，之后返回最终回复
+    2. 结构化输出请求：按工具参数的 JSON Schema 生成占位参数
+    3. 每类请求按配置的延迟返回，用来模拟真实模型的响应时间
+    """
+    def __init__(self,
+                 latency: float = 0.2,
+                 stage_latency: dict[str, float] | None = None,
+                 monitor_names: tuple[str, ...] = ("monitor_1", "monitor_3"),
+                 camera_areas: tuple[str, ...] = ("area_1",),
+                 rounds: int = 1,
+                 host: str = "127.0.0.1",
+                 port: int = 0):
+        """
+        初始化
+        :param latency: 默认响应延迟（秒）
+        :param stage_latency: 按阶段覆盖的响应延迟，例如 {"executor": 0.5}
+        :param monitor_names: 规划器每轮调用的监控
+        :param camera_areas: 规划器每轮调用的车载摄像头区域
+        :param rounds: 规划器返回最终回复前的工具调用轮数
+        :param host: 监听地址
+        :param port: 监听端口，0 表示随机分配
+        """
+        self.latency: float = latency
+        self.stage_latency: dict[str, float] = stage_latency or {}
+        self.monitor_names: tuple[str, ...] = monitor_names
+        self.camera_areas: tuple[str, ...] = camera_areas
+        self.rounds: int = rounds
+        self.calls: Counter = Counter()
+        self._system_prompts: set[str] = set()  # 已出现过的系统提示，模拟服务端前缀缓存
+
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """停止服务"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def usage(self, body: dict) -> dict:
+        """
+        按字符数估算请求的 token 用量，并模拟服务端前缀缓存：系统提示与之前的请求完全一致时计为命中缓存
+        :param body: 请求体
+        :return: OpenAI 格式的 usage
+        """
+        def text_of(content) -> str:
+            if isinstance(content, list):
+                return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+            return content or ""
+
+        messages = body.get("messages") or []
+        prompt_tokens = sum(len(text_of(msg.get("content"))) for msg in messages) // 2 + 1
+        system = "".join(text_of(msg.get("content")) for msg in messages if msg.get("role") == "system")
+        with self._lock:
+            cached = system in self._system_prompts
+            self._system_prompts.add(system)
+        cached_tokens = min(len(system) // 2, prompt_tokens) if system and cached else 0
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": 20,
+            "total_tokens": prompt_tokens + 20,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+
+    def respond(self, body: dict) -> tuple[str, dict]:
+        """
+        生成一次 chat completion 的回复
+        :param body: 请求体
+        :return: 调用阶段，以及 assistant 消息
+        """
+        tools = [tool["function"] for tool in body.get("tools") or []]
+        stage = classify_request([tool["name"] for tool in tools])
+        message: dict = {"role": "assistant", "content": None}
+
+        if stage in ("executor", "generator", "verifier"):
+            function = next(tool for tool in tools if tool["name"] in STRUCTURED_STAGES)
+            message["tool_calls"] = [self._tool_call(function["name"], self._fake_arguments(function["parameters"]))]
+        elif stage == "planner":
+            # 已完成的轮数记录在最近一次规划器工具调用的 id 中，较早的消息被客户端省略或改写时也能正确计数
+            finished_rounds = 0
+            for msg in reversed(body["messages"]):
+                if msg["role"] == "user":
+                    break
+                if msg["role"] == "assistant" and msg.get("tool_calls"):
+                    match = ROUND_ID_PATTERN.match(msg["tool_calls"][0].get("id", ""))
+                    finished_rounds = int(match.group(1)) if match else 1
+                    break
+            if finished_rounds < self.rounds:
+                names = {tool["name"] for tool in tools}
+                tool_calls = []
+                if "get_monitor_report" in names:
+                    tool_calls += [self._tool_call("get_monitor_report", {"monitor_name": name, "task_description": "benchmark"},
+                                                   round_=finished_rounds + 1)
+                                   for name in self.monitor_names]
+                if "get_camera_report" in names:
+                    tool_calls += [self._tool_call("get_camera_report", {"camera_area": area, "task_description": "benchmark"},
+                                                   round_=finished_rounds + 1)
+                                   for area in self.camera_areas]
+                message["content"] = "先调取相关视角进行排查"
+                message["tool_calls"] = tool_calls
+            else:
+                message["content"] = "最终根因：area_1 内垃圾堆积"
+        else:
+            message["content"] = "7.5"
+
+        return stage, message
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stage, message = server.respond(body)
+                with server._lock:
+                    server.calls[stage] += 1
+                time.sleep(server.stage_latency.get(stage, server.latency))
+
+                finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+                usage = server.usage(body)
+                if body.get("stream"):
+                    self._write_stream(body["model"], message, finish_reason, usage)
+                else:
+                    self._write_json({
+                        "id": f"chatcmpl-{uuid.uuid4().hex}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": body["model"],
+                        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                        "usage": usage,
+                    })
+
+            def _write_json(self, payload: dict) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _write_stream(self, model: str, message: dict, finish_reason: str, usage: dict) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk",
+                        "created": int(time.time()), "model": model}
+
+                def write(choice: dict, **extra) -> None:
+                    chunk = {**base, "choices": [choice], **extra}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+                content = message.get("content") or ""
+                for i in range(0, len(content), 4):
+                    write({"index": 0, "delta": {"role": "assistant", "content": content[i:i + 4]}, "finish_reason": None})
+                for i, tool_call in enumerate(message.get("tool_calls") or []):
+                    write({"index": 0, "delta": {"tool_calls": [{"index": i, **tool_call}]}, "finish_reason": None})
+                write({"index": 0, "delta": {}, "finish_reason": finish_reason}, usage=usage)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
+
+    @staticmethod
+    def _tool_call(name: str, arguments: dict, round_: int | None = None) -> dict:
+        prefix = f"call_r{round_}_" if round_ is not None else "call_"
+        return {
+            "id": f"{prefix}{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments, ensure_ascii=False)},
+        }
+
+    @staticmethod
+    def _fake_arguments(schema: dict) -> dict:
+        """按 JSON Schema 生成占位参数"""
+        arguments = {}
+        for key, prop in schema.get("properties", {}).items():
+            if prop.get("type") == "array":
+                arguments[key] = [f"{key}-mock"]
+            elif "score" in key and not key.endswith("reason"):
+                arguments[key] = "5.0"
+            else:
+                arguments[key] = f"{key}-mock"
+        return arguments
+
+
+if __name__ == "__main__":
+    # 单独启动模拟服务，例如把 .env 中的 BASE_URL 指向它来手动压测 Web 服务
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容模拟服务")
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    mock_server = MockLLMServer(latency=args.latency, port=args.port)
+    print(f"模拟服务已启动: {mock_server.base_url}")
+    mock_server._server.serve_forever()
@@ -0,0 +1,392 @@
+"""
+端到端性能基准：启动本地模拟大模型服务，驱动规划器、流式服务与评估服务，统计延迟、吞吐与各阶段耗时
+同步场景（planner / stream / verify）在线程池中调用同步接口；
+异步场景（task / astream / averify）在一个事件循环中并发调用服务端实际使用的异步接口
+
+用法：
+    python -m guard.benchmark.run --tasks 20 --concurrency 4 --latency 0.2
+    python -m guard.benchmark.run --scenarios astream averify --baseline guard/benchmark/results/20260101-120000.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+from typing import Awaitable, Callable
+
+from PIL import Image
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+from guard.benchmark.mock_llm import MockLLMServer, classify_request
+
+SCENARIOS = ("planner", "stream", "verify", "task", "astream", "averify")
+
+
+class StageRecorder(BaseCallbackHandler):
+    """
+    记录每次大模型调用与工具调用的耗时，按阶段（planner / executor / generator / verifier / tool）归类
+    通过 configure hook 注入，覆盖各个智能体内部发起的调用，无需修改业务代码
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._starts: dict = {}
+        self.durations: dict[str, list[float]] = defaultdict(list)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        tools = (kwargs.get("invocation_params") or {}).get("tools") or []
+        stage = classify_request([tool.get("function", {}).get("name", "") for tool in tools])
+        self._start(run_id, stage)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        self._finish(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._finish(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+        self._start(run_id, "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        self._finish(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        self._finish(run_id)
+
+    def _start(self, run_id, stage: str) -> None:
+        with self._lock:
+            self._starts[run_id] = (stage, time.perf_counter())
+
+    def _finish(self, run_id) -> None:
+        with self._lock:
+            started = self._starts.pop(run_id, None)
+            if started is not None:
+                stage, start = started
+                self.durations[stage].append(time.perf_counter() - start)
+
+
+_stage_recorder: ContextVar[StageRecorder | None] = ContextVar("benchmark_stage_recorder", default=None)
+register_configure_hook(_stage_recorder, inheritable=True)
+
+
+def summarize(values: list[float]) -> dict:
+    """延迟分布统计（秒）"""
+    if not values:
+        return {"count": 0}
+    percentiles = statistics.quantiles(values, n=100, method="inclusive") if len(values) > 1 else values * 99
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values), 4),
+        "p50": round(percentiles[49], 4),
+        "p95": round(percentiles[94], 4),
+        "p99": round(percentiles[98], 4),
+        "max": round(max(values), 4),
+        "total": round(sum(values), 4),
+    }
+
+
+class ScenarioSamples:
+    """一个场景的延迟、额外计时指标与错误"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: list[float] = []
+        self.extra_metrics: dict[str, list[float]] = defaultdict(list)
+        self.errors: list[str] = []
+
+    def record(self, elapsed: float, metrics: dict) -> None:
+        with self._lock:
+            self.latencies.append(elapsed)
+            for key, value in metrics.items():
+                self.extra_metrics[key].append(value)
+
+    def error(self, e: Exception) -> None:
+        with self._lock:
+            self.errors.append(f"{type(e).__name__}: {e}")
+
+    def report(self, name: str, tasks: int, concurrency: int, wall: float, recorder: StageRecorder) -> dict:
+        """汇总场景统计结果并打印摘要"""
+        result = {
+            "tasks": tasks,
+            "concurrency": concurrency,
+            "wall_s": round(wall, 4),
+            "throughput_per_s": round(len(self.latencies) / wall, 4) if wall > 0 else 0.0,
+            "latency": summarize(self.latencies),
+            "stages": {stage: summarize(values) for stage, values in sorted(recorder.durations.items())},
+            "errors": len(self.errors),
+        }
+        result.update({key: summarize(values) for key, values in self.extra_metrics.items()})
+        if self.errors:
+            result["error_samples"] = self.errors[:5]
+        print(f"[{name}] p50={result['latency'].get('p50')}s p95={result['latency'].get('p95')}s "
+              f"throughput={result['throughput_per_s']}/s errors={len(self.errors)}")
+        return result
+
+
+def run_scenario(name: str, task: Callable[[int], dict | None], tasks: int, concurrency: int) -> dict:
+    """
+    以给定并发数执行 tasks 次任务并统计
+    :param name: 场景名称
+    :param task: 单次任务，参数为任务序号，可返回额外的计时指标（秒）
+    :param tasks: 任务总数
+    :param concurrency: 并发数
+    :return: 场景统计结果
+    """
+    recorder = StageRecorder()
+    samples = ScenarioSamples()
+
+    def timed(idx: int) -> None:
+        start = time.perf_counter()
+        try:
+            metrics = task(idx) or {}
+        except Exception as e:
+            samples.error(e)
+            return
+        samples.record(time.perf_counter() - start, metrics)
+
+    token = _stage_recorder.set(recorder)
+    try:
+        wall_start = time.perf_counter()
+        # 每个任务复制一份上下文，线程池中的调用才能被 StageRecorder 记录
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(copy_context().run, timed, idx) for idx in range(tasks)]
+            for future in futures:
+                future.result()
+        wall = time.perf_counter() - wall_start
+    finally:
+        _stage_recorder.reset(token)
+
+    return samples.report(name, tasks, concurrency, wall, recorder)
+
+
+def run_async_scenario(name: str, task: Callable[[int], Awaitable[dict | None]], tasks: int, concurrency: int) -> dict:
+    """
+    在一个事件循环中以给定并发数执行 tasks 次异步任务并统计，与服务端处理并发请求的方式一致
+    :param name: 场景名称
+    :param task: 单次异步任务，参数为任务序号，可返回额外的计时指标（秒）
+    :param tasks: 任务总数
+    :param concurrency: 同时进行的任务数
+    :return: 场景统计结果
+    """
+    recorder = StageRecorder()
+    samples = ScenarioSamples()
+
+    async def timed(idx: int, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                metrics = await task(idx) or {}
+            except Exception as e:
+                samples.error(e)
+                return
+            samples.record(time.perf_counter() - start, metrics)
+
+    async def run_all() -> None:
+        semaphore = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(timed(idx, semaphore) for idx in range(tasks)))
+
+    token = _stage_recorder.set(recorder)
+    try:
+        wall_start = time.perf_counter()
+        asyncio.run(run_all())
+        wall = time.perf_counter() - wall_start
+    finally:
+        _stage_recorder.reset(token)
+
+    return samples.report(name, tasks, concurrency, wall, recorder)
+
+
+def placeholder_jpeg(index: int, size: tuple[int, int] = (64, 48)) -> bytes:
+    """
+    生成一张可以正常解码的小 JPG，颜色随序号变化，不同图片的内容摘要互不相同
+    :param index: 图片序号
+    :param size: 图片尺寸
+    :return: JPG 字节
+    """
+    buffer = io.BytesIO()
+    Image.new("RGB", size, ((index * 37) % 256, (index * 71) % 256, (index * 113) % 256)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def prepare_datasets(city_map) -> str:
+    """生成占位图片，模拟服务不解析图片内容，但图片缓存与预处理会按真实 JPG 解码"""
+    root = tempfile.mkdtemp(prefix="cityguard-bench-")
+    os.makedirs(os.path.join(root, "base", "monitor"))
+    index = 0
+    for monitor_name in city_map.monitors:
+        with open(os.path.join(root, "base", "monitor", f"{city_map.monitor_image_id(monitor_name)}.jpg"), "wb") as f:
+            f.write(placeholder_jpeg(index))
+        index += 1
+    for camera_name in city_map.cameras:
+        area_id, camera_id = city_map.camera_image_id(camera_name)
+        os.makedirs(os.path.join(root, "base", "cameras", area_id), exist_ok=True)
+        with open(os.path.join(root, "base", "cameras", area_id, f"{camera_id}.jpg"), "wb") as f:
+            f.write(placeholder_jpeg(index))
+        index += 1
+    return root
+
+
+def compare(result: dict, baseline_path: str, tolerance: float) -> list[str]:
+    """
+    与基线结果对比 p95 延迟与吞吐
+    :return: 超出容忍范围的退化项
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for name, current in result["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        old_p95, new_p95 = previous["latency"].get("p95"), current["latency"].get("p95")
+        if old_p95 and new_p95 and new_p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{name}: p95 {old_p95}s -> {new_p95}s")
+        old_tp, new_tp = previous["throughput_per_s"], current["throughput_per_s"]
+        if old_tp and new_tp < old_tp * (1 - tolerance):
+            regressions.append(f"{name}: throughput {old_tp}/s -> {new_tp}/s")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="CityGuard 端到端性能基准")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--tasks", type=int, default=20, help="每个场景的任务数")
+    parser.add_argument("--concurrency", type=int, default=4, help="并发任务数")
+    parser.add_argument("--latency", type=float, default=0.2, help="模拟大模型的默认响应延迟（秒）")
+    parser.add_argument("--executor-latency", type=float, default=None, help="视觉执行器的响应延迟（秒），默认同 --latency")
+    parser.add_argument("--rounds", type=int, default=1, help="规划器给出最终回复前的工具调用轮数")
+    parser.add_argument("--verify-rows", type=int, default=10, help="verify / averify 场景每个任务评估的行数")
+    parser.add_argument("--verify-workers", type=int, default=None, help="averify 场景并发评分的工作协程数，默认 VERIFY_MAX_WORKERS")
+    parser.add_argument("--type-name", default="garbage")
+    parser.add_argument("--report-cache", action="store_true", help="启用视觉执行器报告缓存（默认关闭，保证每次都调用执行器）")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认保存到 本目录 / results / 时间戳.json")
+    parser.add_argument("--baseline", default=None, help="基线结果 JSON，p95 或吞吐退化超出容忍范围时返回非零退出码")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="与基线对比的容忍比例")
+    args = parser.parse_args()
+
+    stage_latency = {"executor": args.executor_latency} if args.executor_latency is not None else {}
+    server = MockLLMServer(latency=args.latency, stage_latency=stage_latency, rounds=args.rounds).start()
+
+    # 配置在导入智能体模块时读取，必须在导入之前设置
+    os.environ.update({
+        "API_KEY": "benchmark",
+        "BASE_URL": server.base_url,
+        "MODEL": "mock-planner",
+        "VISUAL_MODEL": "mock-visual",
+        "REPORT_CACHE_ENABLED": "true" if args.report_cache else "false",
+        "TASK_CACHE_ENABLED": "false",
+        "CHECKPOINT_BACKEND": "memory",
+    })
+
+    from guard.agent.planner import Planner
+    from guard.common.image_store import image_store
+    from guard.common.meta_registry import meta_registry
+    from guard.server.service import PlannerService, VerifierService
+
+    image_store.datasets_root = prepare_datasets(meta_registry.city_map)
+    image_store.clear()
+
+    cases = meta_registry.root_analyze_info[args.type_name]
+
+    def planner_task(idx: int) -> None:
+        case = cases[idx % len(cases)]
+        planner.run_with_reasoning(task_uuid=str(uuid.uuid4()), user_prompt=case.user_prompt, type_id=case.id)
+
+    def stream_task(idx: int) -> dict:
+        case = cases[idx % len(cases)]
+        start = time.perf_counter()
+        first_step = None
+        # 第一个事件是任务开始事件，第二个事件对应规划器的第一个输出（逐 token 输出时为第一段推理增量）
+        for i, _ in enumerate(planner_service.run_stream(case.user_prompt, args.type_name, case.id)):
+            if i == 1:
+                first_step = time.perf_counter() - start
+        return {"first_step": first_step}
+
+    def verify_rows(idx: int) -> list[dict]:
+        return [
+            {"type_name": args.type_name, "id": cases[(idx + i) % len(cases)].id, "response": "benchmark"}
+            for i in range(args.verify_rows)
+        ]
+
+    def verify_task(idx: int) -> None:
+        for _ in verifier_service.run_stream(verify_rows(idx)):
+            pass
+
+    async def atask_task(idx: int) -> None:
+        # 对应 /task，TASK_CACHE_ENABLED=false 时每次都实际执行
+        case = cases[idx % len(cases)]
+        await planner_service.arun_cached(case.user_prompt, args.type_name, case.id)
+
+    async def astream_task(idx: int) -> dict:
+        # 对应 /task/stream
+        case = cases[idx % len(cases)]
+        start = time.perf_counter()
+        first_step = None
+        i = 0
+        async for _ in planner_service.arun_stream(case.user_prompt, args.type_name, case.id):
+            if i == 1:
+                first_step = time.perf_counter() - start
+            i += 1
+        return {"first_step": first_step}
+
+    async def averify_task(idx: int) -> None:
+        # 对应 /verify/stream
+        workers = {"workers": args.verify_workers} if args.verify_workers is not None else {}
+        async for _ in verifier_service.arun_stream(verify_rows(idx), **workers):
+            pass
+
+    scenarios = {}
+    try:
+        if "planner" in args.scenarios:
+            planner = Planner(type_name=args.type_name)
+            scenarios["planner"] = run_scenario("planner", planner_task, args.tasks, args.concurrency)
+        planner_service = PlannerService(type_name=args.type_name)
+        verifier_service = VerifierService()
+        if "stream" in args.scenarios:
+            scenarios["stream"] = run_scenario("stream", stream_task, args.tasks, args.concurrency)
+        if "verify" in args.scenarios:
+            scenarios["verify"] = run_scenario("verify", verify_task, args.tasks, args.concurrency)
+        if "task" in args.scenarios:
+            scenarios["task"] = run_async_scenario("task", atask_task, args.tasks, args.concurrency)
+        if "astream" in args.scenarios:
+            scenarios["astream"] = run_async_scenario("astream", astream_task, args.tasks, args.concurrency)
+        if "averify" in args.scenarios:
+            scenarios["averify"] = run_async_scenario("averify", averify_task, args.tasks, args.concurrency)
+    finally:
+        server.stop()
+
+    result = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "mock_calls": dict(server.calls),
+        "scenarios": scenarios,
+    }
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "results", f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到 {output}")
+
+    if args.baseline:
+        regressions = compare(result, args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"性能退化: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import json
+import os
+
+from guard.common.model import Monitor, Camera
+
+
+class CityMap:
+    """
+    城市地图索引：
+    1. 二维俯瞰矩阵是地图的唯一来源，prompt 中的地图信息由 render_grid 渲染
+    2. area -> 区域内的车载摄像头在加载时预计算，监控区域与摄像头区域都必须是矩阵中的格子
+    3. 监控与摄像头名称只在加载时解析一次，得到图片路径所需的编号
+    所有查询都是字典查找，与城市规模无关
+    """
+    def __init__(self, grid: list[list[str]], monitors: dict[str, Monitor], cameras: dict[str, Camera]):
+        """
+        初始化并构建索引
+        :param grid: 城市地图的二维俯瞰矩阵，按行排列的格子名称
+        :param monitors: 监控名称 -> 监控信息
+        :param cameras: 摄像头名称 -> 摄像头信息
+        """
+        self.grid: list[list[str]] = grid
+        self.monitors: dict[str, Monitor] = monitors
+        self.cameras: dict[str, Camera] = cameras
+
+        # 矩阵中的格子
+        self._cells: set[str] = set()
+        for cells in grid:
+            for cell in cells:
+                if cell in self._cells:
+                    raise ValueError(f"城市地图中存在重复的格子: {cell}")
+                self._cells.add(cell)
+
+        # 监控名称 -> 图片编号
+        self._monitor_ids: dict[str, str] = {}
+        for monitor_name, monitor in monitors.items():
+            for road in monitor.monitor_area:
+                self._check_cell(road, monitor_name)
+            self._monitor_ids[monitor_name] = self._parse_id(monitor_name, "monitor_{}")
+
+        # area -> 区域内的摄像头（保持原始顺序），摄像头名称 -> (区域编号, 摄像头编号)
+        self._area_cameras: dict[str, list[Camera]] = {}
+        self._camera_ids: dict[str, tuple[str, str]] = {}
+        for camera_name, camera in cameras.items():
+            self._check_cell(camera.camera_area, camera_name)
+            self._area_cameras.setdefault(camera.camera_area, []).append(camera)
+            self._camera_ids[camera_name] = (
+                self._parse_id(camera.camera_area, "area_{}"),
+                self._parse_id(camera_name, f"{camera.camera_area}_camera_{{}}"),
+            )
+
+    @classmethod
+    def from_meta(cls, meta_dir: str) -> "CityMap":
+        """
+        从 meta 目录加载城市地图
+        :param meta_dir: 包含 city_grid.json、monitor_info.json、camera_info.json 的目录
+        :return: 城市地图
+        """
+        with open(os.path.join(meta_dir, 'city_grid.json'), 'r', encoding='utf-8') as f:
+            grid = json.load(f)["grid"]
+        with open(os.path.join(meta_dir, 'monitor_info.json'), 'r', encoding='utf-8') as f:
+            monitors = {key: Monitor(**monitor_dict) for key, monitor_dict in json.load(f).items()}
+        with open(os.path.join(meta_dir, 'camera_info.json'), 'r', encoding='utf-8') as f:
+            cameras = {key: Camera(**camera_dict) for key, camera_dict in json.load(f).items()}
+        return cls(grid, monitors, cameras)
+
+    def cameras_in(self, area: str) -> list[Camera]:
+        """area 里的车载摄像头，未知区域返回空列表"""
+        return self._area_cameras.get(area, [])
+
+    def monitor_image_id(self, monitor_name: str) -> str:
+        """监控画面的图片编号，对应 monitor/{编号}.jpg"""
+        return self._monitor_ids[monitor_name]
+
+    def camera_image_id(self, camera_name: str) -> tuple[str, str]:
+        """摄像头画面的 (区域编号, 摄像头编号)，对应 cameras/{区域编号}/{摄像头编号}.jpg"""
+        return self._camera_ids[camera_name]
+
+    def render_grid(self) -> str:
+        """按 prompt 中的格式渲染二维俯瞰矩阵"""
+        return "\n".join(", ".join(cells) + ";" for cells in self.grid)
+
+    def _check_cell(self, cell: str, owner: str) -> None:
+        if cell not in self._cells:
+            raise ValueError(f"{owner} 引用了城市地图中不存在的格子: {cell}")
+
+    @staticmethod
+    def _parse_id(name: str, pattern: str) -> str:
+        """按 pattern（例如 monitor_{}）解析名称中的编号"""
+        prefix, suffix = pattern.split("{}")
+        if not (name.startswith(prefix) and name.endswith(suffix)) or len(name) == len(prefix) + len(suffix):
+            raise ValueError(f"无法从名称中解析编号: {name}")
+        return name[len(prefix):len(name) - len(suffix)]
@@ -0,0 +1,219 @@
+"""
+数据集图片批量压缩（多进程、增量）：
+1. PNG 转为 JPG 并删除原文件，JPG 原地重新压缩（压缩后没有变小则保留原图）
+2. 清单文件记录每张图片压缩后的内容摘要、大小与修改时间，未变化的图片直接跳过，不会重复压缩损失画质
+3. 所有写入都先写临时文件再重命名
+
+用法：
+    python -m guard.common.compress datasets --quality 85 --workers 8
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+
+from PIL import Image
+from tqdm import tqdm
+
+from guard.common.tool import write_bytes_atomic
+
+MANIFEST_NAME = ".compress_manifest.json"
+MANIFEST_VERSION = 1
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg")
+
+
+@dataclass
+class ManifestEntry:
+    """清单中的一条记录，对应压缩后的图片"""
+    sha256: str
+    size: int
+    mtime_ns: int
+    quality: int
+
+
+@dataclass
+class CompressResult:
+    """单张图片的处理结果"""
+    source: str                     # 原图相对路径
+    target: str                     # 压缩后图片相对路径（PNG 会变为 JPG）
+    status: str                     # compressed / kept（压缩后没有变小）/ unchanged（内容未变化）/ failed
+    input_bytes: int = 0
+    output_bytes: int = 0
+    entry: ManifestEntry | None = None
+    error: str | None = None
+
+
+def _entry_for(path: str, data: bytes, quality: int) -> ManifestEntry:
+    stat = os.stat(path)
+    return ManifestEntry(sha256=hashlib.sha256(data).hexdigest(), size=stat.st_size, mtime_ns=stat.st_mtime_ns, quality=quality)
+
+
+def compress_file(root: str, relative_path: str, quality: int, previous: ManifestEntry | None) -> CompressResult:
+    """
+    压缩单张图片（在工作进程中执行）
+    :param root: 数据集根目录
+    :param relative_path: 图片相对路径
+    :param quality: JPG 压缩质量 (1-100)
+    :param previous: 清单中的历史记录，文件属性变化但内容未变时据此跳过
+    :return: 处理结果
+    """
+    path = os.path.join(root, relative_path)
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+
+        # 只是修改时间变化（例如被复制或 touch），内容仍是之前压缩的结果
+        if previous is not None and hashlib.sha256(raw).hexdigest() == previous.sha256:
+            return CompressResult(relative_path, relative_path, "unchanged", len(raw), len(raw),
+                                  _entry_for(path, raw, previous.quality))
+
+        buffer = io.BytesIO()
+        Image.open(io.BytesIO(raw)).convert("RGB").save(buffer, "JPEG", quality=quality)
+        compressed = buffer.getvalue()
+
+        if relative_path.lower().endswith(".png"):
+            target = os.path.splitext(relative_path)[0] + ".jpg"
+            target_path = os.path.join(root, target)
+            write_bytes_atomic(target_path, compressed)
+            os.remove(path)
+            return CompressResult(relative_path, target, "compressed", len(raw), len(compressed),
+                                  _entry_for(target_path, compressed, quality))
+
+        if len(compressed) >= len(raw):
+            return CompressResult(relative_path, relative_path, "kept", len(raw), len(raw),
+                                  _entry_for(path, raw, quality))
+
+        write_bytes_atomic(path, compressed)
+        return CompressResult(relative_path, relative_path, "compressed", len(raw), len(compressed),
+                              _entry_for(path, compressed, quality))
+    except Exception as e:
+        return CompressResult(relative_path, relative_path, "failed", error=f"{type(e).__name__}: {e}")
+
+
+class DatasetCompressor:
+    """多进程、增量的数据集图片压缩"""
+    def __init__(self, root: str, quality: int = 85, workers: int | None = None, manifest_path: str | None = None):
+        """
+        初始化
+        :param root: 数据集根目录
+        :param quality: JPG 压缩质量 (1-100)，默认 85
+        :param workers: 工作进程数，默认为 CPU 核数
+        :param manifest_path: 清单文件路径，默认为 根目录 / .compress_manifest.json
+        """
+        self.root: str = os.path.abspath(root)
+        self.quality: int = quality
+        self.workers: int = workers or os.cpu_count() or 1
+        self.manifest_path: str = manifest_path or os.path.join(self.root, MANIFEST_NAME)
+        self.manifest: dict[str, ManifestEntry] = self._load_manifest()
+
+    def scan(self) -> tuple[list[str], int]:
+        """
+        遍历数据集，只用 stat 判断文件是否与清单一致
+        :return: 需要处理的相对路径，以及直接跳过的文件数
+        """
+        pending, skipped = [], 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if not name.lower().endswith(IMAGE_SUFFIXES):
+                    continue
+                path = os.path.join(directory, name)
+                relative_path = os.path.relpath(path, self.root)
+                entry = self.manifest.get(relative_path)
+                if entry is not None and entry.quality <= self.quality:
+                    stat = os.stat(path)
+                    if stat.st_size == entry.size and stat.st_mtime_ns == entry.mtime_ns:
+                        skipped += 1
+                        continue
+                pending.append(relative_path)
+        return pending, skipped
+
+    def run(self, save_every: int = 500) -> dict:
+        """
+        执行压缩
+        :param save_every: 每处理多少张图片保存一次清单，中断后已处理的图片不会重复压缩
+        :return: 统计信息
+        """
+        start = time.perf_counter()
+        pending, skipped = self.scan()
+        counts = {"compressed": 0, "kept": 0, "unchanged": 0, "failed": 0}
+        input_bytes = output_bytes = 0
+        errors = []
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(compress_file, self.root, relative_path, self.quality, self._reusable_entry(relative_path))
+                for relative_path in pending
+            ]
+            for i, future in enumerate(tqdm(as_completed(futures), total=len(futures), desc="压缩图片"), start=1):
+                result = future.result()
+                counts[result.status] += 1
+                input_bytes += result.input_bytes
+                output_bytes += result.output_bytes
+                if result.status == "failed":
+                    errors.append(f"{result.source}: {result.error}")
+                else:
+                    if result.target != result.source:
+                        self.manifest.pop(result.source, None)
+                    self.manifest[result.target] = result.entry
+                if i % save_every == 0:
+                    self._save_manifest()
+
+        self._save_manifest()
+        elapsed = time.perf_counter() - start
+        scanned = len(pending) + skipped
+        return {
+            "scanned": scanned,
+            "skipped": skipped,
+            **counts,
+            "input_mb": round(input_bytes / 1024 / 1024, 2),
+            "output_mb": round(output_bytes / 1024 / 1024, 2),
+            "saved_mb": round((input_bytes - output_bytes) / 1024 / 1024, 2),
+            "elapsed_s": round(elapsed, 2),
+            "files_per_s": round(scanned / elapsed, 1) if elapsed > 0 else 0.0,
+            "mb_per_s": round(input_bytes / 1024 / 1024 / elapsed, 2) if elapsed > 0 else 0.0,
+            "errors": errors,
+        }
+
+    def _reusable_entry(self, relative_path: str) -> ManifestEntry | None:
+        """历史记录的压缩质量不低于本次要求时，内容未变即可跳过"""
+        entry = self.manifest.get(relative_path)
+        return entry if entry is not None and entry.quality <= self.quality else None
+
+    def _load_manifest(self) -> dict[str, ManifestEntry]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            return {}
+        return {path: ManifestEntry(**entry) for path, entry in data["files"].items()}
+
+    def _save_manifest(self) -> None:
+        data = {"version": MANIFEST_VERSION, "files": {path: asdict(entry) for path, entry in sorted(self.manifest.items())}}
+        write_bytes_atomic(self.manifest_path, json.dumps(data, ensure_ascii=False, indent=1).encode("utf-8"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="数据集图片批量压缩（多进程、增量）")
+    parser.add_argument("root", help="数据集根目录，例如 datasets")
+    parser.add_argument("--quality", type=int, default=85, help="JPG 压缩质量 (1-100)，默认 85")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数，默认为 CPU 核数")
+    parser.add_argument("--manifest", default=None, help="清单文件路径，默认为 根目录 / .compress_manifest.json")
+    args = parser.parse_args()
+
+    stats = DatasetCompressor(args.root, quality=args.quality, workers=args.workers, manifest_path=args.manifest).run()
+    errors = stats.pop("errors")
+    print(f"扫描 {stats['scanned']} 张，跳过 {stats['skipped']} 张，压缩 {stats['compressed']} 张，"
+          f"保留原图 {stats['kept']} 张，内容未变 {stats['unchanged']} 张，失败 {stats['failed']} 张")
+    print(f"读取 {stats['input_mb']} MB，写出 {stats['output_mb']} MB，节省 {stats['saved_mb']} MB")
+    print(f"耗时 {stats['elapsed_s']}s，{stats['files_per_s']} 张/s，{stats['mb_per_s']} MB/s")
+    for error in errors[:20]:
+        print(f"处理出错: {error}")
+
+
+if __name__ == "__main__":
+    main()
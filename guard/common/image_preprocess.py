@@ -0,0 +1,78 @@
+import os
+import warnings
+
+from env_utils.runtime_args import (
+    image_preprocess_enabled,
+    image_max_edge,
+    image_jpeg_quality,
+    image_grayscale,
+    image_variant_cache_dir,
+)
+from guard.common.tool import downscale_image_bytes, write_bytes_atomic
+
+
+class ImagePreprocessor:
+    """
+    发送给视觉模型前的图片预处理：按最长边缩放、重新编码 JPG、可选灰度
+    处理结果按 (原图内容摘要, 参数) 缓存到磁盘，同一张图片在进程重启后也只处理一次
+    """
+    def __init__(self,
+                 max_edge: int = image_max_edge,
+                 quality: int = image_jpeg_quality,
+                 grayscale: bool = image_grayscale,
+                 cache_dir: str | None = image_variant_cache_dir,
+                 enabled: bool = image_preprocess_enabled):
+        """
+        初始化
+        :param max_edge: 最长边上限（像素），小于等于 0 表示不缩放
+        :param quality: JPG 压缩质量 (1-100)
+        :param grayscale: 是否转换为灰度图
+        :param cache_dir: 处理结果的磁盘缓存目录，None 表示不缓存
+        :param enabled: 是否启用预处理，关闭时原样发送
+        """
+        self.max_edge: int = max_edge
+        self.quality: int = quality
+        self.grayscale: bool = grayscale
+        self.cache_dir: str | None = cache_dir
+        self.enabled: bool = enabled
+
+    def settings(self) -> dict:
+        """预处理参数，记录到实验运行配置中，便于区分不同预处理条件下的结果"""
+        return {"enabled": self.enabled, "max_edge": self.max_edge, "quality": self.quality, "grayscale": self.grayscale}
+
+    @property
+    def variant(self) -> str:
+        """处理参数标识，参数变化后使用新的缓存文件"""
+        return f"e{self.max_edge}_q{self.quality}_{'gray' if self.grayscale else 'rgb'}"
+
+    def process(self, raw: bytes, digest: str) -> bytes:
+        """
+        获取图片的处理结果
+        :param raw: 原始图片字节
+        :param digest: 原始图片内容摘要
+        :return: 处理后的图片字节；未启用、无法解码或处理后没有变小时返回原图
+        """
+        if not self.enabled:
+            return raw
+
+        cache_path = os.path.join(self.cache_dir, digest[:2], f"{digest}_{self.variant}.jpg") if self.cache_dir else None
+        if cache_path is not None and os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                return f.read()
+
+        try:
+            processed, resized = downscale_image_bytes(raw, self.max_edge, self.quality, self.grayscale)
+        except OSError as e:
+            warnings.warn(f"图片预处理失败，发送原图: {e}")
+            return raw
+
+        # 尺寸与颜色都没有变化时，重新编码反而变大就保留原图
+        if not resized and not self.grayscale and len(processed) >= len(raw):
+            processed = raw
+
+        if cache_path is not None:
+            try:
+                write_bytes_atomic(cache_path, processed)
+            except OSError as e:
+                warnings.warn(f"图片预处理结果写入缓存失败: {e}")
+        return processed
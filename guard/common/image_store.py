@@ -0,0 +1,162 @@
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from env_utils.runtime_args import image_cache_max_bytes
+from guard.common.image_preprocess import ImagePreprocessor
+
+
+@dataclass(frozen=True)
+class EncodedImage:
+    """已编码的图片"""
+    path: str            # 图片实际路径
+    digest: str          # 发送给模型的图片字节的 sha256
+    data: str            # base64 编码内容
+    size: int            # base64 编码后的字节数
+    original_bytes: int  # 原图字节数
+    sent_bytes: int      # 预处理后发送的字节数
+
+    @property
+    def bytes_saved(self) -> int:
+        """预处理节省的字节数"""
+        return self.original_bytes - self.sent_bytes
+
+
+class ImageStore:
+    """
+    进程级图片缓存：
+    1. 按 (类型, type_name, type_id, 视角编号) 解析一次图片路径（优先路径 / base 备选路径）
+    2. 经过预处理（缩放、重新编码）后按内容摘要缓存 base64 编码结果，多个路径指向相同内容时只保存一份
+    3. 超过字节预算时按 LRU 淘汰
+    """
+    def __init__(self,
+                 datasets_root: str | None = None,
+                 max_bytes: int = image_cache_max_bytes,
+                 preprocessor: ImagePreprocessor | None = None):
+        """
+        初始化
+        :param datasets_root: 数据集根目录，默认为 项目根目录 / datasets
+        :param max_bytes: 编码结果的字节预算
+        :param preprocessor: 图片预处理器，默认按环境变量配置创建
+        """
+        if datasets_root is None:
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            project_root = os.path.dirname(os.path.dirname(current_dir))
+            datasets_root = os.path.join(project_root, 'datasets')
+        self.datasets_root: str = datasets_root
+        self.max_bytes: int = max_bytes
+        self.preprocessor: ImagePreprocessor = preprocessor or ImagePreprocessor()
+
+        self._lock = threading.Lock()
+        self._paths: dict[tuple, str] = {}                            # 视角 key -> 图片路径
+        self._digests: dict[str, str] = {}                            # 图片路径 -> 内容摘要
+        self._images: OrderedDict[str, EncodedImage] = OrderedDict()  # 内容摘要 -> 编码结果（LRU）
+        self._current_bytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get_monitor_image(self, type_name: str, type_id: str, monitor_id: str) -> EncodedImage:
+        """
+        获取监控画面
+        :param type_name: 类型名称
+        :param type_id: 类型下的案例 id
+        :param monitor_id: 监控编号
+        :return: 已编码的图片
+        """
+        key = ('monitor', type_name, type_id, monitor_id)
+        return self._get(key, ('monitor', f"{monitor_id}.jpg"))
+
+    def get_camera_image(self, type_name: str, type_id: str, area_id: str, camera_id: str) -> EncodedImage:
+        """
+        获取车载摄像头画面
+        :param type_name: 类型名称
+        :param type_id: 类型下的案例 id
+        :param area_id: 区域编号
+        :param camera_id: 摄像头编号
+        :return: 已编码的图片
+        """
+        key = ('camera', type_name, type_id, area_id, camera_id)
+        return self._get(key, ('cameras', str(area_id), f"{camera_id}.jpg"))
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._images),
+                "bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self) -> None:
+        """清空缓存（数据集文件变更后调用）"""
+        with self._lock:
+            self._paths.clear()
+            self._digests.clear()
+            self._images.clear()
+            self._current_bytes = 0
+
+    def _get(self, key: tuple, relative_parts: tuple[str, ...]) -> EncodedImage:
+        """按 key 获取图片，未命中时读取磁盘并编码"""
+        with self._lock:
+            path = self._paths.get(key)
+            digest = self._digests.get(path) if path is not None else None
+            if digest is not None and digest in self._images:
+                self._images.move_to_end(digest)
+                self.hits += 1
+                return self._images[digest]
+            self.misses += 1
+
+        if path is None:
+            path = self._resolve_path(key[1], key[2], relative_parts)
+
+        # 读取、预处理图片并转换为 base64（放在锁外，避免阻塞其他线程）
+        with open(path, "rb") as image_file:
+            raw = image_file.read()
+        processed = self.preprocessor.process(raw, hashlib.sha256(raw).hexdigest())
+        digest = hashlib.sha256(processed).hexdigest()
+        data = base64.b64encode(processed).decode("utf-8")
+        image = EncodedImage(path=path, digest=digest, data=data, size=len(data),
+                             original_bytes=len(raw), sent_bytes=len(processed))
+
+        with self._lock:
+            self._paths[key] = path
+            self._digests[path] = digest
+            if digest not in self._images:
+                self._images[digest] = image
+                self._current_bytes += image.size
+                self._evict()
+            else:
+                image = self._images[digest]
+                self._images.move_to_end(digest)
+        return image
+
+    def _resolve_path(self, type_name: str, type_id: str, relative_parts: tuple[str, ...]) -> str:
+        """
+        解析图片路径
+        优先路径：datasets/{type_name}/{type_id}/...
+        备选路径：datasets/base/...
+        """
+        image_path_priority = os.path.join(self.datasets_root, type_name, type_id, *relative_parts)
+        image_path_fallback = os.path.join(self.datasets_root, 'base', *relative_parts)
+
+        if os.path.exists(image_path_priority):
+            return image_path_priority
+        if os.path.exists(image_path_fallback):
+            return image_path_fallback
+        # 两个路径都不存在时抛出异常
+        raise FileNotFoundError(f"监控图片不存在: {image_path_priority} or {image_path_fallback}")
+
+    def _evict(self) -> None:
+        """超过字节预算时淘汰最久未使用的图片（至少保留最新的一张）"""
+        while self._current_bytes > self.max_bytes and len(self._images) > 1:
+            _, evicted = self._images.popitem(last=False)
+            self._current_bytes -= evicted.size
+
+
+# 全局图片缓存实例
+image_store = ImageStore()
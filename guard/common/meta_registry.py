@@ -0,0 +1,137 @@
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+from env_utils.runtime_args import meta_root, meta_snapshot_enabled, meta_snapshot_path, meta_reload_interval
+from guard.common.city_map import CityMap
+from guard.common.model import Monitor, Camera, RootAnalyzeData
+
+# 元数据文件，任何一个发生变化都会重新加载
+META_FILES = ("city_grid.json", "monitor_info.json", "camera_info.json", "root_analyze_info.json")
+
+# 快照格式版本，数据结构变化时递增，使旧快照失效
+SNAPSHOT_VERSION = 2
+
+
+@dataclass
+class MetaData:
+    """一次加载得到的全部元数据"""
+    city_map: CityMap
+    root_analyze_info: dict[str, list[RootAnalyzeData]]
+    fingerprint: tuple  # 各元数据文件的 (路径, 修改时间, 大小)
+
+
+class MetaRegistry:
+    """
+    元数据注册表：
+    1. 首次访问时才加载，路径相对于配置的数据根目录（默认为包内 guard/meta），与当前工作目录无关
+    2. 加载结果写入校验过的 pickle 快照，JSON 未变化时直接读取快照，跳过解析与 Pydantic 校验
+    3. 可选热加载：按间隔检查 JSON 文件的修改时间，变化后重新加载
+    """
+    def __init__(self,
+                 root: str = meta_root,
+                 snapshot_path: str | None = meta_snapshot_path if meta_snapshot_enabled else None,
+                 reload_interval: float = meta_reload_interval):
+        """
+        初始化
+        :param root: 元数据目录
+        :param snapshot_path: 快照文件路径，None 表示不使用快照
+        :param reload_interval: 检查 JSON 变更的间隔（秒），小于等于 0 表示不热加载
+        """
+        self.root: str = os.path.abspath(root)
+        self.snapshot_path: str | None = snapshot_path
+        self.reload_interval: float = reload_interval
+
+        self._lock = threading.Lock()
+        self._data: MetaData | None = None
+        self._last_check: float = 0.0
+
+    @property
+    def city_map(self) -> CityMap:
+        return self._get().city_map
+
+    @property
+    def monitors(self) -> dict[str, Monitor]:
+        return self._get().city_map.monitors
+
+    @property
+    def cameras(self) -> dict[str, Camera]:
+        return self._get().city_map.cameras
+
+    @property
+    def root_analyze_info(self) -> dict[str, list[RootAnalyzeData]]:
+        return self._get().root_analyze_info
+
+    def reload(self) -> None:
+        """强制从 JSON 重新加载并刷新快照"""
+        with self._lock:
+            self._data = self._load_json(self._fingerprint())
+            self._last_check = time.monotonic()
+
+    def _get(self) -> MetaData:
+        data = self._data
+        if data is not None and (self.reload_interval <= 0 or time.monotonic() - self._last_check < self.reload_interval):
+            return data
+
+        with self._lock:
+            if self._data is None:
+                self._data = self._load(self._fingerprint())
+            elif 0 < self.reload_interval <= time.monotonic() - self._last_check:
+                fingerprint = self._fingerprint()
+                if fingerprint != self._data.fingerprint:
+                    self._data = self._load_json(fingerprint)
+            self._last_check = time.monotonic()
+            return self._data
+
+    def _fingerprint(self) -> tuple:
+        fingerprint = []
+        for name in META_FILES:
+            stat = os.stat(os.path.join(self.root, name))
+            fingerprint.append((os.path.join(self.root, name), stat.st_mtime_ns, stat.st_size))
+        return tuple(fingerprint)
+
+    def _load(self, fingerprint: tuple) -> MetaData:
+        """优先读取与当前文件一致的快照，否则解析 JSON"""
+        if self.snapshot_path is not None and os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, "rb") as f:
+                    version, data = pickle.load(f)
+                if version == SNAPSHOT_VERSION and data.fingerprint == fingerprint:
+                    return data
+            except Exception:
+                pass  # 快照损坏或不兼容时回退到 JSON
+        return self._load_json(fingerprint)
+
+    def _load_json(self, fingerprint: tuple) -> MetaData:
+        """解析并校验 JSON，写入新的快照"""
+        with open(os.path.join(self.root, 'root_analyze_info.json'), 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+        data = MetaData(
+            city_map=CityMap.from_meta(self.root),
+            root_analyze_info={key: [RootAnalyzeData(**item) for item in items] for key, items in raw.items()},
+            fingerprint=fingerprint,
+        )
+        if self.snapshot_path is not None:
+            self._write_snapshot(data)
+        return data
+
+    def _write_snapshot(self, data: MetaData) -> None:
+        """原子写入快照，多个进程同时写入时不会产生半个文件"""
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((SNAPSHOT_VERSION, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+# 全局元数据注册表实例
+meta_registry = MetaRegistry()
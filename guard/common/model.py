@@ -60,4 +60,5 @@ class RootAnalyzeReport(BaseModel):
     reasoning: list = Field(description="推理过程")
     response: str = Field(description="智能体报告")
     step: int = Field(description="推理步数")
-    score: float = Field(description="推理得分")
\ No newline at end of file
+    score: float = Field(description="推理得分")
+    timings: dict[str, float] = Field(default_factory=dict, description="各阶段耗时（秒）")
\ No newline at end of file
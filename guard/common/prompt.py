@@ -29,11 +29,7 @@ planner_sys_prompt = SystemMessagePromptTemplate.from_template("""
 ## 城市地图信息
 城市由区域（area）和道路（road）组成，道路与道路的交汇点为十字路口（cross），
 地图信息以二维俯瞰矩阵形式展示如下：
-area_1, road_1_1, area_2, road_2_1, area_3;
-road_3_1, cross_1, road_3_2, cross_2, road_3_3;
-area_4, road_1_2, area_5, road_2_2, area_6;
-road_4_1, cross_3, road_4_2, cross_4, road_4_3;
-area_7, road_1_3, area_8, road_2_3, area_9;
+{city_grid}
 
 在四个十字路口（cross）里布置了一些监控（Monitor），可以大致查看城市的道路情况，对应的监控信息如下：
 {monitor_info};
@@ -141,11 +137,7 @@ baseline_sys_prompt = SystemMessagePromptTemplate.from_template("""
 ## 城市地图信息
 城市由区域（area）和道路（road）组成，道路与道路的交汇点为十字路口（cross），
 地图信息以二维俯瞰矩阵形式展示如下：
-area_1, road_1_1, area_2, road_2_1, area_3;
-road_3_1, cross_1, road_3_2, cross_2, road_3_3;
-area_4, road_1_2, area_5, road_2_2, area_6;
-road_4_1, cross_3, road_4_2, cross_4, road_4_3;
-area_7, road_1_3, area_8, road_2_3, area_9;
+{city_grid}
 
 在四个十字路口（cross）里布置了一些监控（Monitor），可以大致查看城市的道路情况，对应的监控信息如下：
 {monitor_info};
@@ -177,11 +169,7 @@ counterfactual_only_sys_prompt = SystemMessagePromptTemplate.from_template("""
 ## 城市地图信息
 城市由区域（area）和道路（road）组成，道路与道路的交汇点为十字路口（cross），
 地图信息以二维俯瞰矩阵形式展示如下：
-area_1, road_1_1, area_2, road_2_1, area_3;
-road_3_1, cross_1, road_3_2, cross_2, road_3_3;
-area_4, road_1_2, area_5, road_2_2, area_6;
-road_4_1, cross_3, road_4_2, cross_4, road_4_3;
-area_7, road_1_3, area_8, road_2_3, area_9;
+{city_grid}
 
 在四个十字路口（cross）里布置了一些监控（Monitor），可以大致查看城市的道路情况，对应的监控信息如下：
 {monitor_info};
@@ -223,11 +211,7 @@ delayed_decision_only_sys_prompt = SystemMessagePromptTemplate.from_template("""
 ## 城市地图信息
 城市由区域（area）和道路（road）组成，道路与道路的交汇点为十字路口（cross），
 地图信息以二维俯瞰矩阵形式展示如下：
-area_1, road_1_1, area_2, road_2_1, area_3;
-road_3_1, cross_1, road_3_2, cross_2, road_3_3;
-area_4, road_1_2, area_5, road_2_2, area_6;
-road_4_1, cross_3, road_4_2, cross_4, road_4_3;
-area_7, road_1_3, area_8, road_2_3, area_9;
+{city_grid}
 
 在四个十字路口（cross）里布置了一些监控（Monitor），可以大致查看城市的道路情况，对应的监控信息如下：
 {monitor_info};
@@ -282,11 +266,7 @@ ablation_monitor_sys_prompt = SystemMessagePromptTemplate.from_template("""
 ## 城市地图信息
 城市由区域（area）和道路（road）组成，道路与道路的交汇点为十字路口（cross），
 地图信息以二维俯瞰矩阵形式展示如下：
-area_1, road_1_1, area_2, road_2_1, area_3;
-road_3_1, cross_1, road_3_2, cross_2, road_3_3;
-area_4, road_1_2, area_5, road_2_2, area_6;
-road_4_1, cross_3, road_4_2, cross_4, road_4_3;
-area_7, road_1_3, area_8, road_2_3, area_9;
+{city_grid}
 
 在四个十字路口（cross）里布置了一些监控（Monitor），可以大致查看城市的道路情况，监控只能够显示道路（road）发生的事情，无法显示道路（road）以外的区域（area）发生的事情。
 
@@ -310,11 +290,7 @@ ablation_camera_sys_prompt = SystemMessagePromptTemplate.from_template("""
 ## 城市地图信息
 城市由区域（area）和道路（road）组成，道路与道路的交汇点为十字路口（cross），
 地图信息以二维俯瞰矩阵形式展示如下：
-area_1, road_1_1, area_2, road_2_1, area_3;
-road_3_1, cross_1, road_3_2, cross_2, road_3_3;
-area_4, road_1_2, area_5, road_2_2, area_6;
-road_4_1, cross_3, road_4_2, cross_4, road_4_3;
-area_7, road_1_3, area_8, road_2_3, area_9;
+{city_grid}
 
 在四个十字路口（cross）里布置了一些监控（Monitor），可以大致查看城市的道路情况，对应的监控信息如下：
 {monitor_info};
@@ -340,11 +316,7 @@ ablation_random_sys_prompt = SystemMessagePromptTemplate.from_template("""
 ## 城市地图信息
 城市由区域（area）和道路（road）组成，道路与道路的交汇点为十字路口（cross），
 地图信息以二维俯瞰矩阵形式展示如下：
-area_1, road_1_1, area_2, road_2_1, area_3;
-road_3_1, cross_1, road_3_2, cross_2, road_3_3;
-area_4, road_1_2, area_5, road_2_2, area_6;
-road_4_1, cross_3, road_4_2, cross_4, road_4_3;
-area_7, road_1_3, area_8, road_2_3, area_9;
+{city_grid}
 
 在四个十字路口（cross）里布置了一些监控（Monitor），可以大致查看城市的道路情况，对应的监控信息如下：
 {monitor_info};
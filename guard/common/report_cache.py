@@ -0,0 +1,162 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import TypeVar
+
+from pydantic import BaseModel
+
+from env_utils.runtime_args import report_cache_enabled, report_cache_path, report_cache_ttl, report_cache_max_entries
+
+ReportT = TypeVar("ReportT", bound=BaseModel)
+
+
+class ReportCache:
+    """
+    视觉执行器报告的持久化缓存（SQLite）
+    key 由图片内容摘要、渲染后的执行器 prompt 与模型名称共同决定，输入不变时直接复用报告，跳过大模型调用
+    """
+    def __init__(self,
+                 db_path: str = report_cache_path,
+                 ttl: float = report_cache_ttl,
+                 max_entries: int = report_cache_max_entries,
+                 enabled: bool = report_cache_enabled):
+        """
+        初始化
+        :param db_path: SQLite 文件路径
+        :param ttl: 缓存有效期（秒），小于等于 0 表示永不过期
+        :param max_entries: 最大缓存条数，超过后按最近访问时间淘汰
+        :param enabled: 是否启用缓存
+        """
+        self.db_path: str = db_path
+        self.ttl: float = ttl
+        self.max_entries: int = max_entries
+        self.enabled: bool = enabled
+        self.hits: int = 0
+        self.misses: int = 0
+
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def settings(self) -> dict:
+        """缓存配置，记录到实验运行配置中：开启缓存时重复实验会复用之前的视觉模型输出"""
+        return {"enabled": self.enabled, "ttl": self.ttl}
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, image_digests: list[str]) -> str:
+        """
+        计算缓存 key
+        :param model_name: 视觉模型名称
+        :param prompt: 渲染后的执行器 prompt
+        :param image_digests: 按顺序排列的图片内容摘要
+        :return: sha256 十六进制字符串
+        """
+        hasher = hashlib.sha256()
+        for part in (model_name, prompt, *image_digests):
+            hasher.update(part.encode("utf-8"))
+            hasher.update(b"\x00")
+        return hasher.hexdigest()
+
+    def get(self, key: str, report_cls: type[ReportT]) -> ReportT | None:
+        """
+        读取缓存的报告
+        :param key: 缓存 key
+        :param report_cls: 报告类型，例如 MonitorReport / CameraReport
+        :return: 命中时返回报告，否则返回 None
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT payload, created_at FROM report_cache WHERE key = ? AND kind = ?",
+                (key, report_cls.__name__)
+            ).fetchone()
+            if row is None or self._expired(row[1], now):
+                if row is not None:
+                    conn.execute("DELETE FROM report_cache WHERE key = ?", (key,))
+                    conn.commit()
+                self.misses += 1
+                return None
+
+            conn.execute("UPDATE report_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+        return report_cls.model_validate_json(row[0])
+
+    def put(self, key: str, report: BaseModel) -> None:
+        """
+        写入报告
+        :param key: 缓存 key
+        :param report: 报告对象
+        :return: 无
+        """
+        if not self.enabled:
+            return
+
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO report_cache (key, kind, payload, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, type(report).__name__, report.model_dump_json(), now, now)
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        entries = 0
+        if self.enabled:
+            with self._lock:
+                entries = self._connect().execute("SELECT COUNT(*) FROM report_cache").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def clear(self) -> None:
+        """清空缓存"""
+        if not self.enabled:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM report_cache")
+            conn.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return 0 < self.ttl < now - created_at
+
+    def _connect(self) -> sqlite3.Connection:
+        """延迟建立连接并建表，调用方需持有锁"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS report_cache (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_report_cache_accessed ON report_cache (accessed_at)")
+            self._conn.commit()
+        return self._conn
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """淘汰过期条目，以及超出条数上限的最久未访问条目"""
+        if self.ttl > 0:
+            conn.execute("DELETE FROM report_cache WHERE created_at < ?", (now - self.ttl,))
+        overflow = conn.execute("SELECT COUNT(*) FROM report_cache").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM report_cache WHERE key IN (SELECT key FROM report_cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,)
+            )
+
+
+# 全局报告缓存实例
+report_cache = ReportCache()
@@ -1,4 +1,6 @@
+import io
 import os
+import tempfile
 from pathlib import Path
 from PIL import Image
 
@@ -26,6 +28,40 @@ def create_folder_structure(type_name: str, num: int, base_path: str = ".") -> N
         (sub_dir / "monitor").mkdir(exist_ok=True)
 
 
+def write_bytes_atomic(path: str, data: bytes) -> None:
+    """
+    先写入同目录下的临时文件再重命名，中途失败不会留下损坏的文件
+    :param path: 目标路径
+    :param data: 文件内容
+    :return: 无
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_jpg_atomic(img: Image.Image, path: str, quality: int = 85) -> int:
+    """
+    将图片编码为 JPG 并原子写入
+    :param img: 图片对象
+    :param path: 目标路径
+    :param quality: 压缩质量 (1-100)，默认 85
+    :return: 写入的字节数
+    """
+    buffer = io.BytesIO()
+    img.convert('RGB').save(buffer, 'JPEG', quality=quality)
+    write_bytes_atomic(path, buffer.getvalue())
+    return buffer.tell()
+
+
 def compress_png_to_jpg(png_path: str, quality: int = 85) -> None:
     """
     将PNG图片压缩为 JPG 格式并替换原文件
@@ -44,7 +80,7 @@ def compress_png_to_jpg(png_path: str, quality: int = 85) -> None:
     jpg_path = png_path.with_suffix('.jpg')
 
     # 保存为JPG格式
-    img.save(jpg_path, 'JPEG', quality=quality)
+    save_jpg_atomic(img, str(jpg_path), quality)
 
     # 删除原始PNG文件
     png_path.unlink()
@@ -79,11 +115,32 @@ def compress_jpg_in_place(folder_path: str, quality: int = 50) -> None:
             # 打开图片
             img = Image.open(file_path)
             # 原地保存（覆盖原文件）
-            img.save(file_path, 'JPEG', quality=quality)
+            save_jpg_atomic(img, str(file_path), quality)
             print(f"已压缩: {file_path}")
         except Exception as e:
             print(f"处理 {file_path} 时出错: {str(e)}")
 
+def downscale_image_bytes(raw: bytes, max_edge: int = 0, quality: int = 85, grayscale: bool = False) -> tuple[bytes, bool]:
+    """
+    在内存中缩放并重新编码图片为 JPG
+    :param raw: 原始图片字节
+    :param max_edge: 最长边上限（像素），小于等于 0 表示不缩放
+    :param quality: JPG 压缩质量 (1-100)，默认 85
+    :param grayscale: 是否转换为灰度图
+    :return: JPG 字节，以及图片尺寸是否被缩小
+    """
+    img = Image.open(io.BytesIO(raw))
+    img = img.convert('L' if grayscale else 'RGB')
+
+    resized = 0 < max_edge < max(img.size)
+    if resized:
+        # thumbnail 保持宽高比，最长边不超过 max_edge
+        img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=quality, optimize=True)
+    return buffer.getvalue(), resized
+
 if __name__ == "__main__":
     compress_pngs_in_folder("D:\Pycharm\pycharm\Pyspace\CityGuard\datasets\\tmp")
     # create_folder_structure(type_name="water", num=10)
\ No newline at end of file
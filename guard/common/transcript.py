@@ -0,0 +1,168 @@
+import json
+from dataclasses import dataclass
+
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage, SystemMessage
+
+from env_utils.runtime_args import transcript_compact, transcript_max_field_chars, transcript_dedup
+from guard.common.prompt import generator_sys_prompt
+
+# 报告字段的显示名称
+FIELD_LABELS = {
+    "monitor_content": "画面",
+    "monitor_report": "分析",
+    "camera_content_lst": "画面",
+    "camera_report_lst": "分析",
+}
+
+
+def estimate_text_tokens(text: str) -> int:
+    """按字符数粗略估算 token 数（与限流中间件的估算方式一致）"""
+    return len(text) // 2 + 1
+
+
+@dataclass
+class TranscriptStats:
+    """一次序列化的统计信息"""
+    messages: int = 0
+    raw_tokens: int = 0       # 直接插入消息列表 repr 时的估算 token 数
+    compact_tokens: int = 0   # 精简后的估算 token 数
+    truncated: int = 0        # 被截断的字段数
+    deduplicated: int = 0     # 与之前重复、只保留引用的观察结果数
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(self.raw_tokens - self.compact_tokens, 0)
+
+
+class TranscriptCompactor:
+    """
+    将规划器的消息历史序列化为生成器使用的精简文本：
+    1. 只保留推理文本、工具调用（名称与参数）和工具结果，去掉消息 id、元数据、用量与重复的原始工具调用 JSON
+    2. 监控 / 车载摄像头报告按字段逐行输出，报告取自工具产物中的结构化结果
+    3. 可选截断过长字段，内容完全相同的观察结果只输出一次，之后引用首次出现的编号
+    输出只依赖消息内容，相同的消息历史总是得到相同的文本
+    """
+    def __init__(self,
+                 max_field_chars: int = transcript_max_field_chars,
+                 dedup: bool = transcript_dedup,
+                 enabled: bool = transcript_compact):
+        """
+        初始化
+        :param max_field_chars: 单个字段的最大字符数，小于等于 0 表示不截断
+        :param dedup: 是否合并重复的观察结果
+        :param enabled: 是否启用精简序列化，关闭时与之前一样直接使用消息列表的 repr
+        """
+        self.max_field_chars: int = max_field_chars
+        self.dedup: bool = dedup
+        self.enabled: bool = enabled
+
+    def settings(self) -> dict:
+        """序列化参数，记录到实验运行配置中，便于区分不同生成器输入下的结果"""
+        return {"enabled": self.enabled, "max_field_chars": self.max_field_chars, "dedup": self.dedup}
+
+    def render(self, messages: list[BaseMessage]) -> tuple[str, TranscriptStats]:
+        """
+        序列化消息历史
+        :param messages: 规划器的消息历史
+        :return: 序列化后的文本与统计信息
+        """
+        raw = str(messages)
+        stats = TranscriptStats(messages=len(messages), raw_tokens=estimate_text_tokens(raw))
+        if not self.enabled:
+            stats.compact_tokens = stats.raw_tokens
+            return raw, stats
+
+        lines: list[str] = []
+        calls: dict[str, tuple[int, str]] = {}   # tool_call_id -> (调用编号, 调用文本)
+        observations: dict[str, int] = {}        # 观察结果内容 -> 首次出现的调用编号
+        for index, message in enumerate(messages, start=1):
+            if isinstance(message, SystemMessage):
+                continue
+            if isinstance(message, HumanMessage):
+                lines.append(f"[{index}] 用户: {self._field(message.text, stats)}")
+            elif isinstance(message, AIMessage):
+                text = message.text.strip()
+                lines.append(f"[{index}] 规划器: {self._field(text, stats)}" if text else f"[{index}] 规划器:")
+                for tool_call in message.tool_calls:
+                    number = len(calls) + 1
+                    call = f"{tool_call['name']}({self._args(tool_call.get('args') or {}, stats)})"
+                    calls[tool_call.get("id") or f"call_{number}"] = (number, call)
+                    lines.append(f"  调用#{number} {call}")
+            elif isinstance(message, ToolMessage):
+                number, call = calls.get(message.tool_call_id, (0, message.name or "tool"))
+                header = f"[{index}] 结果#{number} {message.name or call}"
+                body = self._observation(message, stats)
+                first = observations.get(body)
+                if self.dedup and first is not None:
+                    stats.deduplicated += 1
+                    lines.append(f"{header}: 同结果#{first}")
+                    continue
+                observations.setdefault(body, number)
+                lines.append(f"{header}:\n{body}")
+
+        transcript = "\n".join(lines)
+        stats.compact_tokens = estimate_text_tokens(transcript)
+        return transcript, stats
+
+    def _field(self, text: str, stats: TranscriptStats) -> str:
+        """截断过长字段，并把换行合并为空格，保证一个字段只占一行"""
+        text = " ".join(str(text).split())
+        if self.max_field_chars <= 0:
+            return text
+        truncated = f"{text[:self.max_field_chars]}…（截断 {len(text) - self.max_field_chars} 字）"
+        # 截断标记比截掉的内容还长时保留原文
+        if len(truncated) >= len(text):
+            return text
+        stats.truncated += 1
+        return truncated
+
+    def _args(self, args: dict, stats: TranscriptStats) -> str:
+        values = []
+        for key in sorted(args):
+            value = args[key] if isinstance(args[key], str) else json.dumps(args[key], ensure_ascii=False, sort_keys=True)
+            values.append(f"{key}={self._field(value, stats)}")
+        return ", ".join(values)
+
+    def _observation(self, message: ToolMessage, stats: TranscriptStats) -> str:
+        """工具结果：优先使用产物中的结构化报告，旧的会话历史中没有时使用消息文本"""
+        artifact = message.artifact if isinstance(message.artifact, dict) else {}
+        report = artifact.get("report")
+        if isinstance(report, dict):
+            if "monitor_name" in report:
+                return self._monitor_report(report, stats)
+            if "camera_name_lst" in report:
+                return self._camera_report(report, stats)
+            return "\n".join(f"  {key}: {self._field(value, stats)}" for key, value in report.items())
+        return f"  {self._field(message.text, stats)}"
+
+    def _monitor_report(self, report: dict, stats: TranscriptStats) -> str:
+        lines = [f"  监控 {report['monitor_name']}（区域: {', '.join(report.get('monitor_area') or [])}）"]
+        for key in ("monitor_content", "monitor_report"):
+            lines.append(f"  {FIELD_LABELS[key]}: {self._field(report.get(key, ''), stats)}")
+        return "\n".join(lines)
+
+    def _camera_report(self, report: dict, stats: TranscriptStats) -> str:
+        lines = []
+        columns = zip(report.get("camera_name_lst") or [], report.get("camera_area_lst") or [],
+                      report.get("camera_location_lst") or [], report.get("camera_content_lst") or [],
+                      report.get("camera_report_lst") or [])
+        for name, area, location, content, analysis in columns:
+            lines.append(f"  摄像头 {name}（{area}，{location}）")
+            lines.append(f"    {FIELD_LABELS['camera_content_lst']}: {self._field(content, stats)}")
+            lines.append(f"    {FIELD_LABELS['camera_report_lst']}: {self._field(analysis, stats)}")
+        return "\n".join(lines) or "  （无车载摄像头结果）"
+
+
+# 全局消息历史序列化实例
+transcript_compactor = TranscriptCompactor()
+
+
+def generator_prompt(user_prompt: str, messages: list[BaseMessage]) -> tuple[HumanMessage, TranscriptStats]:
+    """
+    构建最终报告生成器的输入提示
+    :param user_prompt: 用户举报信息
+    :param messages: 规划器的消息历史
+    :return: 生成器输入提示，以及消息历史序列化的统计信息
+    """
+    transcript, stats = transcript_compactor.render(messages)
+    return generator_sys_prompt.format(user_prompt=user_prompt, agent_response=transcript), stats
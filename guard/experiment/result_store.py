@@ -0,0 +1,434 @@
+"""
+实验结果存储（SQLite），取代 results/<experiment>/<type_name>.csv：
+1. 按 (experiment, type_name, id, run_id) 幂等写入，重复运行同一 run_id 会覆盖旧结果而不是追加重复行
+2. 推理过程拆分为 steps / tool_calls 两张表，不再把整个消息列表转成字符串塞进一个单元格
+3. 得分按指标名称单独存储（verify 打分、重新打分等），耗时按阶段单独存储
+4. 分析脚本通过带索引的查询读取，聚合统计直接在 SQL 中完成
+5. 读取时默认只取每个实验最近一次运行的结果，不同批次（导入的 CSV、重复实验）不会混在一起
+
+用法：
+    python -m guard.experiment.result_store import guard/experiment/results   # 导入历史 CSV
+    python -m guard.experiment.result_store summary
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from env_utils.runtime_args import result_store_path
+from guard.common.model import RootAnalyzeReport
+
+# 默认运行批次与默认得分指标
+DEFAULT_RUN_ID = "default"
+DEFAULT_METRIC = "score"
+# 读取时表示实验最近一次运行的批次（见 ExperimentResultStore.latest_run）
+LATEST_RUN = ":latest"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    experiment TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    config TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (experiment, run_id)
+);
+CREATE TABLE IF NOT EXISTS cases (
+    experiment TEXT NOT NULL,
+    type_name TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    run_id TEXT NOT NULL,
+    response TEXT NOT NULL,
+    step INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (experiment, type_name, id, run_id)
+);
+CREATE TABLE IF NOT EXISTS steps (
+    experiment TEXT NOT NULL,
+    type_name TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    run_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (experiment, type_name, id, run_id, seq)
+);
+CREATE TABLE IF NOT EXISTS tool_calls (
+    experiment TEXT NOT NULL,
+    type_name TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    run_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    call_index INTEGER NOT NULL,
+    call_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    args TEXT NOT NULL,
+    output TEXT,
+    PRIMARY KEY (experiment, type_name, id, run_id, seq, call_index)
+);
+CREATE TABLE IF NOT EXISTS scores (
+    experiment TEXT NOT NULL,
+    type_name TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    run_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (experiment, type_name, id, run_id, metric)
+);
+CREATE TABLE IF NOT EXISTS timings (
+    experiment TEXT NOT NULL,
+    type_name TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    run_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (experiment, type_name, id, run_id, stage)
+);
+CREATE INDEX IF NOT EXISTS idx_cases_run ON cases (experiment, run_id);
+CREATE INDEX IF NOT EXISTS idx_scores_metric ON scores (metric, experiment, type_name);
+CREATE INDEX IF NOT EXISTS idx_tool_calls_name ON tool_calls (name, experiment);
+"""
+
+# 导入历史 CSV 结果的命令，分析脚本找不到数据时提示
+IMPORT_COMMAND = "python -m guard.experiment.result_store import guard/experiment/results"
+
+# 单个样例在各子表中的主键前缀
+_CASE_WHERE = "experiment = ? AND type_name = ? AND id = ? AND run_id = ?"
+
+
+def _text(content) -> str:
+    """消息内容转为文本，多模态内容块序列化为 JSON"""
+    if isinstance(content, str):
+        return content
+    return json.dumps(content, ensure_ascii=False, default=str)
+
+
+def _message_fields(message) -> tuple[str, str, list[dict], str | None]:
+    """
+    兼容 LangChain 消息对象与字典
+    :return: 角色、内容、工具调用列表、对应的工具调用 id（仅工具消息）
+    """
+    if isinstance(message, dict):
+        return (message.get("type") or message.get("role") or "unknown", _text(message.get("content", "")),
+                message.get("tool_calls") or [], message.get("tool_call_id"))
+    return (getattr(message, "type", type(message).__name__), _text(getattr(message, "content", str(message))),
+            getattr(message, "tool_calls", None) or [], getattr(message, "tool_call_id", None))
+
+
+class MissingResultsError(LookupError):
+    """实验结果存储中没有分析脚本需要的数据"""
+    def __init__(self, what: str, db_path: str, hint: str | None = None):
+        """
+        初始化
+        :param what: 缺少的数据，例如实验名称
+        :param db_path: 读取的 SQLite 文件路径
+        :param hint: 生成数据的方式，默认提示导入历史 CSV 结果
+        """
+        super().__init__(f"实验结果存储 {db_path} 中没有 {what} 的结果。"
+                         f"{hint or f'历史 CSV 结果需要先导入: {IMPORT_COMMAND}'}")
+
+
+class ExperimentResultStore:
+    """实验结果存储"""
+    def __init__(self, db_path: str = result_store_path):
+        """
+        初始化
+        :param db_path: SQLite 文件路径
+        """
+        self.db_path: str = db_path
+
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def start_run(self, experiment: str, run_id: str = DEFAULT_RUN_ID, config: dict | None = None) -> None:
+        """
+        登记一次运行，同一 (experiment, run_id) 重复登记时合并配置
+        :param experiment: 实验名称
+        :param run_id: 运行批次
+        :param config: 运行配置（类型、样例范围、模型等）
+        :return: 无
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT config FROM runs WHERE experiment = ? AND run_id = ?", (experiment, run_id)).fetchone()
+            merged = {**(json.loads(row[0]) if row else {}), **(config or {})}
+            with conn:
+                conn.execute(
+                    "INSERT INTO runs (experiment, run_id, config, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (experiment, run_id) DO UPDATE SET config = excluded.config, updated_at = excluded.updated_at",
+                    (experiment, run_id, json.dumps(merged, ensure_ascii=False, default=str), now, now)
+                )
+
+    def save_report(self, experiment: str, report: RootAnalyzeReport, run_id: str = DEFAULT_RUN_ID,
+                    metric: str | None = DEFAULT_METRIC) -> None:
+        """
+        幂等写入单个样例的报告：推理步骤、工具调用、得分与耗时，整体在一个事务中替换
+        旧报告的所有得分随旧报告一并删除，不会留给新报告
+        :param experiment: 实验名称
+        :param report: 根因分析报告
+        :param run_id: 运行批次
+        :param metric: 报告得分对应的指标名称，None 表示报告尚未打分，只写入报告本身（续跑时会重新打分）
+        :return: 无
+        """
+        key = (experiment, report.type_name, report.id, run_id)
+        steps, tool_calls, outputs = [], [], {}
+        for seq, message in enumerate(report.reasoning):
+            role, content, calls, tool_call_id = _message_fields(message)
+            steps.append((*key, seq, role, content))
+            if tool_call_id is not None:
+                outputs[tool_call_id] = content
+            for call_index, call in enumerate(calls):
+                tool_calls.append([*key, seq, call_index, call.get("id") or "", call.get("name", ""),
+                                   json.dumps(call.get("args", {}), ensure_ascii=False, default=str)])
+        for call in tool_calls:
+            call.append(outputs.get(call[6]))
+
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT INTO cases (experiment, type_name, id, run_id, response, step, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (experiment, type_name, id, run_id) DO UPDATE SET "
+                    "response = excluded.response, step = excluded.step, updated_at = excluded.updated_at",
+                    (*key, report.response, report.step, time.time())
+                )
+                for table in ("steps", "tool_calls", "scores", "timings"):
+                    conn.execute(f"DELETE FROM {table} WHERE {_CASE_WHERE}", key)
+                conn.executemany("INSERT INTO steps VALUES (?, ?, ?, ?, ?, ?, ?)", steps)
+                conn.executemany("INSERT INTO tool_calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", tool_calls)
+                conn.executemany("INSERT INTO timings VALUES (?, ?, ?, ?, ?, ?)",
+                                 [(*key, stage, seconds) for stage, seconds in report.timings.items()])
+                if metric is not None:
+                    self._upsert_score(conn, key, metric, report.score)
+
+    def save_score(self, experiment: str, type_name: str, id: int, score: float, run_id: str = DEFAULT_RUN_ID,
+                   metric: str = DEFAULT_METRIC, timings: dict[str, float] | None = None) -> None:
+        """
+        幂等写入单个得分，例如对已保存的报告打分或重新打分
+        :param experiment: 实验名称
+        :param type_name: 类型名称
+        :param id: 样例 id
+        :param score: 得分
+        :param run_id: 运行批次
+        :param metric: 指标名称
+        :param timings: 同时写入的阶段耗时（秒），例如 {"verify": 1.2}
+        :return: 无
+        """
+        key = (experiment, type_name, id, run_id)
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                self._upsert_score(conn, key, metric, score)
+                conn.executemany(
+                    "INSERT INTO timings VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT "
+                    "(experiment, type_name, id, run_id, stage) DO UPDATE SET seconds = excluded.seconds",
+                    [(*key, stage, seconds) for stage, seconds in (timings or {}).items()]
+                )
+
+    def latest_run(self, experiment: str) -> str | None:
+        """
+        实验最近一次运行的批次：按 start_run 登记的时间，没有登记的批次（例如导入的 CSV）按最后写入的时间
+        :param experiment: 实验名称
+        :return: 运行批次，没有任何结果时返回 None
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT c.run_id FROM cases c LEFT JOIN runs r ON r.experiment = c.experiment AND r.run_id = c.run_id "
+                "WHERE c.experiment = ? GROUP BY c.run_id "
+                "ORDER BY COALESCE(MAX(r.created_at), MAX(c.updated_at)) DESC LIMIT 1",
+                (experiment,)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def cases(self, experiment: str, type_name: str | None = None, run_id: str | None = LATEST_RUN,
+              metric: str = DEFAULT_METRIC) -> list[dict]:
+        """
+        读取样例结果，按 (type_name, id, run_id) 排序
+        :param experiment: 实验名称
+        :param type_name: 类型名称，None 表示全部类型
+        :param run_id: 运行批次，默认最近一次运行，None 表示全部批次
+        :param metric: 附带的得分指标
+        :return: 字典列表，字段为 experiment, type_name, id, run_id, response, step, score（未打分时为 None）
+        """
+        where, params = self._filters(experiment, type_name, self._resolve_run(experiment, run_id), prefix="c.")
+        with self._lock:
+            cursor = self._connect().execute(
+                "SELECT c.experiment, c.type_name, c.id, c.run_id, c.response, c.step, s.score FROM cases c "
+                "LEFT JOIN scores s ON s.experiment = c.experiment AND s.type_name = c.type_name AND s.id = c.id "
+                f"AND s.run_id = c.run_id AND s.metric = ? WHERE {where} ORDER BY c.type_name, c.id, c.run_id",
+                (metric, *params)
+            )
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def scores(self, experiment: str, type_name: str | None = None, run_id: str | None = LATEST_RUN,
+               metric: str = DEFAULT_METRIC) -> list[float]:
+        """
+        读取得分列表
+        :param experiment: 实验名称
+        :param type_name: 类型名称，None 表示全部类型
+        :param run_id: 运行批次，默认最近一次运行，None 表示全部批次
+        :param metric: 指标名称
+        :return: 按 (type_name, id, run_id) 排序的得分
+        """
+        where, params = self._filters(experiment, type_name, self._resolve_run(experiment, run_id))
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT score FROM scores WHERE metric = ? AND {where} ORDER BY type_name, id, run_id",
+                (metric, *params)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def steps(self, experiment: str, type_name: str | None = None, run_id: str | None = LATEST_RUN) -> list[int]:
+        """
+        读取推理步数列表
+        :param experiment: 实验名称
+        :param type_name: 类型名称，None 表示全部类型
+        :param run_id: 运行批次，默认最近一次运行，None 表示全部批次
+        :return: 按 (type_name, id, run_id) 排序的步数
+        """
+        where, params = self._filters(experiment, type_name, self._resolve_run(experiment, run_id))
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT step FROM cases WHERE {where} ORDER BY type_name, id, run_id", params
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def summary(self, metric: str = DEFAULT_METRIC, run_id: str | None = None) -> list[dict]:
+        """
+        按 (experiment, type_name, run_id) 聚合：样例数、平均分、标准差（总体）、平均步数、平均工具调用次数
+        不同批次分别统计，不会合并
+        :param metric: 得分指标
+        :param run_id: 运行批次，None 表示全部批次
+        :return: 字典列表
+        """
+        run_filter = "" if run_id is None else "WHERE c.run_id = ?"
+        with self._lock:
+            cursor = self._connect().execute(
+                "SELECT c.experiment, c.type_name, c.run_id, COUNT(*) AS cases, AVG(s.score) AS mean_score, "
+                "AVG(s.score * s.score) AS mean_square, AVG(c.step) AS mean_step, "
+                "AVG((SELECT COUNT(*) FROM tool_calls t WHERE t.experiment = c.experiment AND t.type_name = c.type_name "
+                "AND t.id = c.id AND t.run_id = c.run_id)) AS mean_tool_calls FROM cases c "
+                "LEFT JOIN scores s ON s.experiment = c.experiment AND s.type_name = c.type_name AND s.id = c.id "
+                f"AND s.run_id = c.run_id AND s.metric = ? {run_filter} "
+                "GROUP BY c.experiment, c.type_name, c.run_id ORDER BY c.experiment, c.type_name, c.run_id",
+                (metric,) if run_id is None else (metric, run_id)
+            )
+            columns = [d[0] for d in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for row in rows:
+            mean_square = row.pop("mean_square")
+            mean = row["mean_score"]
+            row["std_score"] = max(mean_square - mean * mean, 0.0) ** 0.5 if mean is not None else None
+        return rows
+
+    def import_csv(self, experiment: str, csv_path: str, run_id: str = "csv") -> int:
+        """
+        导入旧版 CSV 结果（reasoning 列是字符串化的消息列表，无法还原，只导入报告、步数与得分）
+        同一 id 出现多次时保留最后一行
+        :param experiment: 实验名称
+        :param csv_path: CSV 文件路径
+        :param run_id: 导入使用的运行批次
+        :return: 导入的样例数
+        """
+        with open(csv_path, "r", encoding="utf-8") as f:
+            rows = {int(row["id"]): row for row in csv.DictReader(f)}
+        for row in rows.values():
+            self.save_report(experiment, RootAnalyzeReport(
+                type_name=row["type_name"],
+                id=int(row["id"]),
+                reasoning=[],
+                response=row["response"],
+                step=int(row["step"]),
+                score=float(row["score"])
+            ), run_id=run_id)
+        return len(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+
+    def _resolve_run(self, experiment: str, run_id: str | None) -> str | None:
+        """把 LATEST_RUN 换成实际的批次；实验没有任何结果时保留 LATEST_RUN，查询结果为空"""
+        if run_id != LATEST_RUN:
+            return run_id
+        return self.latest_run(experiment) or LATEST_RUN
+
+    @staticmethod
+    def _filters(experiment: str, type_name: str | None, run_id: str | None, prefix: str = "") -> tuple[str, tuple]:
+        clauses, params = [f"{prefix}experiment = ?"], [experiment]
+        if type_name is not None:
+            clauses.append(f"{prefix}type_name = ?")
+            params.append(type_name)
+        if run_id is not None:
+            clauses.append(f"{prefix}run_id = ?")
+            params.append(run_id)
+        return " AND ".join(clauses), tuple(params)
+
+    @staticmethod
+    def _upsert_score(conn: sqlite3.Connection, key: tuple, metric: str, score: float) -> None:
+        conn.execute(
+            "INSERT INTO scores (experiment, type_name, id, run_id, metric, score) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (experiment, type_name, id, run_id, metric) DO UPDATE SET score = excluded.score",
+            (*key, metric, score)
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """延迟建立连接并建表，调用方需持有锁"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+        return self._conn
+
+
+# 全局实验结果存储实例
+result_store = ExperimentResultStore()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="实验结果存储")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="导入旧版 results/<experiment>/<type_name>.csv")
+    import_parser.add_argument("results_dir", help="旧版结果目录，例如 guard/experiment/results")
+    import_parser.add_argument("--run-id", default="csv", help="导入使用的运行批次，默认 csv")
+
+    summary_parser = subparsers.add_parser("summary", help="按实验与类型汇总得分")
+    summary_parser.add_argument("--metric", default=DEFAULT_METRIC)
+    summary_parser.add_argument("--run-id", default=None)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        for experiment in sorted(os.listdir(args.results_dir)):
+            experiment_dir = os.path.join(args.results_dir, experiment)
+            if not os.path.isdir(experiment_dir):
+                continue
+            for name in sorted(os.listdir(experiment_dir)):
+                if name.endswith(".csv"):
+                    count = result_store.import_csv(experiment, os.path.join(experiment_dir, name), run_id=args.run_id)
+                    print(f"{experiment}/{name}: 导入 {count} 条")
+        return
+
+    start = time.perf_counter()
+    rows = result_store.summary(metric=args.metric, run_id=args.run_id)
+    print(f"{'experiment':<24} {'type':<10} {'run':<16} {'cases':>6} {'mean':>7} {'std':>7} {'steps':>7} {'tools':>7}")
+    for row in rows:
+        mean = "-" if row["mean_score"] is None else f"{row['mean_score']:.2f}"
+        std = "-" if row["std_score"] is None else f"{row['std_score']:.2f}"
+        print(f"{row['experiment']:<24} {row['type_name']:<10} {row['run_id']:<16} {row['cases']:>6} {mean:>7} {std:>7} "
+              f"{row['mean_step']:>7.1f} {row['mean_tool_calls']:>7.1f}")
+    print(f"查询耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,21 @@
 import os
-import csv
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.stats import gaussian_kde
 
+from guard.experiment.result_store import result_store, MissingResultsError
+
 # ---------- 路径配置 ----------
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 RESULTS_DIR = os.path.join(THIS_DIR, "results")
 OUTPUT_DIR = os.path.join(RESULTS_DIR, "visual", "score_comparison")
 
+# 方法名称 -> 实验名称
 METHODS = {
-    "Baseline": os.path.join(RESULTS_DIR, "baseline"),
-    "Counterfactual": os.path.join(RESULTS_DIR, "counterfactual_only"),
-    "Delayed Decision": os.path.join(RESULTS_DIR, "delayed_decision_only"),
-    "CityGuard": os.path.join(RESULTS_DIR, "cityguard"),
+    "Baseline": "baseline",
+    "Counterfactual": "counterfactual_only",
+    "Delayed Decision": "delayed_decision_only",
+    "CityGuard": "cityguard",
 }
 
 TYPE_NAMES = ["accident", "garbage", "noise", "water"]
@@ -28,19 +30,9 @@ COLORS = ["#5B8FF9", "#5AD8A6", "#F6BD16", "#E8684A"]
 
 
 # ---------- 数据加载 ----------
-def load_scores(csv_path: str) -> list[float]:
-    """从 CSV 文件中读取 score 列"""
-    scores = []
-    with open(csv_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            scores.append(float(row["score"]))
-    return scores
-
-
 def build_data() -> dict:
     """
-    构建数据字典，结构为:
+    从实验结果存储构建数据字典，结构为:
     {
         type_name: {
             method_name: [score, score, ...]
@@ -50,10 +42,12 @@ def build_data() -> dict:
     data = {}
     for tn in TYPE_NAMES:
         data[tn] = {}
-        for mname, mdir in METHODS.items():
-            csv_path = os.path.join(mdir, f"{tn}.csv")
-            if os.path.exists(csv_path):
-                data[tn][mname] = load_scores(csv_path)
+        for mname, experiment in METHODS.items():
+            scores = result_store.scores(experiment, type_name=tn)
+            if scores:
+                data[tn][mname] = scores
+    if not any(data.values()):
+        raise MissingResultsError(" / ".join(METHODS.values()), result_store.db_path)
     return data
 
 
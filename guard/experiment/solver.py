@@ -1,16 +1,21 @@
-import os
-import csv
+import time
+import uuid
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
 
 from tqdm import tqdm
 
-from guard.agent.executor import root_analyze_info, get_camera_report, get_monitor_report, monitors
+from env_utils.llm_args import verify_max_workers
+from guard.agent.executor import root_analyze_info, get_camera_report, get_monitor_report, monitors, city_map
 from guard.agent.planner import Planner
 from guard.agent.verifier import verify
+from guard.common.image_store import image_store
 from guard.common.model import RootAnalyzeReport, RootAnalyzeData
+from guard.common.report_cache import report_cache
+from guard.common.transcript import transcript_compactor
 from guard.common.prompt import ablation_monitor_sys_prompt, ablation_camera_sys_prompt, ablation_random_sys_prompt, \
     counterfactual_only_sys_prompt, baseline_sys_prompt, delayed_decision_only_sys_prompt
+from guard.experiment.result_store import result_store, DEFAULT_RUN_ID
 
 
 class ExperimentSolver:
@@ -27,14 +32,16 @@ class ExperimentSolver:
         self.experiment_name: str = experiment_name
         self.data: list[RootAnalyzeData] = root_analyze_info[planner.type_name]
 
-    def _process_single_task(self, idx: int) -> tuple[int, RootAnalyzeReport]:
+    def _process_single_task(self, idx: int, task_uuid: str | None = None) -> tuple[int, RootAnalyzeReport]:
         """
         处理单个任务
         :param idx: 样例索引
+        :param task_uuid: 智能体会话 id，默认 uuid-{idx}
         :return: 索引，报告
         """
+        start = time.perf_counter()
         reasoning, step, result = self.planner.run_with_reasoning(
-            task_uuid=f"uuid-{idx}",
+            task_uuid=task_uuid or f"uuid-{idx}",
             user_prompt=self.data[idx].user_prompt,
             type_id=self.data[idx].id
         )
@@ -44,7 +51,8 @@ class ExperimentSolver:
             reasoning=reasoning,
             response=result,
             step=step,
-            score=0.0
+            score=0.0,
+            timings={"planner": time.perf_counter() - start}
         )
 
     def _simple_planner_execute(self, id: int) -> RootAnalyzeReport:
@@ -56,52 +64,20 @@ class ExperimentSolver:
         _, report = self._process_single_task(id)
         return report
 
-    def _planner_execute(self, start_id: int, end_id: int) -> list[RootAnalyzeReport]:
+    def _verify_single_report(self, report: RootAnalyzeReport) -> RootAnalyzeReport:
         """
-        执行规划器，串行执行
-        :param start_id: 样例起始 id
-        :param end_id: 样例结束 id
-        :return: 根因分析报告列表
-        """
-        start_idx = start_id - 1
-        end_idx = end_id
-        if end_id == -1:
-            end_idx = len(self.data)
-        reports = []
-        for i in tqdm(range(start_idx, end_idx), desc='planner_execute'):
-            _, report = self._process_single_task(i)
-            reports.append(report)
-        return reports
-
-    def _planner_execute_multi(self, start_id: int, end_id: int, max_workers: int = 5) -> list[RootAnalyzeReport]:
-        """
-        执行规划器（线程池并行执行）
-        :param start_id: 样例起始 id
-        :param end_id: 样例结束 id
-        :param max_workers: 线程池最大工作线程数，默认 5
-        :return: 根因分析报告列表
+        验证单个报告
+        :param report: 根因分析报告
+        :return: 对得分字段与验证耗时赋值后的报告
         """
-        start_idx = start_id - 1
-        end_idx = end_id
-        # 收集所有需要处理的索引
-        if end_id == -1:
-            end_idx = len(self.data)
-        indices = list(range(start_idx, end_idx))
-
-        # 使用线程池并行执行
-        results: dict[int, RootAnalyzeReport] = {}
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务
-            future_to_idx = {executor.submit(self._process_single_task, i): i for i in indices}
+        # 拿到对应的根因
+        root_cause = self.data[report.id - 1].root_cause
 
-            # 收集结果
-            for future in tqdm(as_completed(future_to_idx), total=len(indices), desc='planner_execute_multi'):
-                idx, report = future.result()
-                results[idx] = report
-
-        # 按原始顺序返回报告
-        reports = [results[i] for i in indices]
-        return reports
+        # 验证报告
+        start = time.perf_counter()
+        report.score = verify(report=report.response, answer=root_cause)
+        report.timings["verify"] = time.perf_counter() - start
+        return report
 
     def _report_verify(self, reports: list[RootAnalyzeReport]) -> None:
         """
@@ -111,57 +87,131 @@ class ExperimentSolver:
         """
         # 这里因为大模型打分很快，就直接串行执行了:D
         for report in tqdm(reports, desc='report_verify'):
-            data_idx = report.id - 1
-            # 拿到对应的根因
-            root_cause = self.data[data_idx].root_cause
-
-            # 验证报告
-            score = verify(report=report.response, answer=root_cause)
-            report.score = score
+            self._verify_single_report(report)
 
-    def _save_report_as_csv(self, reports: list[RootAnalyzeReport]) -> None:
+    def _plan_single_task(self, idx: int, run_id: str) -> RootAnalyzeReport:
         """
-        将报告保存到 csv 文件
-        :param reports: 报告对象列表
-        :return: 默认保存到 本目录 / results / experiment_name / type_name.csv
+        执行规划器并立即保存报告（尚未打分）
+        规划器结果在打分前就已落盘，打分失败或进程中断时不会丢失已经完成的规划
+        :param idx: 样例索引
+        :param run_id: 运行批次
+        :return: 未打分的报告
         """
-        # 构建目录路径
-        dir_path = os.path.join(
-            os.path.dirname(os.path.abspath(__file__)),
-            "results",
-            self.experiment_name
-        )
-
-        # 创建目录（如果不存在）
-        os.makedirs(dir_path, exist_ok=True)
-
-        # 构建文件路径
-        file_path = os.path.join(dir_path, f"{self.planner.type_name}.csv")
-
-        # 定义 CSV 表头
-        fieldnames = ["type_name", "id", "reasoning", "response", "step", "score"]
-
-        # 检查文件是否存在以确定是否写入表头
-        file_exists = os.path.exists(file_path)
+        # 每次执行使用独立的会话，重复运行、续跑或多个实验共用检查点存储时不会带上之前的对话历史
+        task_uuid = f"{self.experiment_name}-{run_id}-{idx}-{uuid.uuid4().hex[:8]}"
+        _, report = self._process_single_task(idx, task_uuid=task_uuid)
+        result_store.save_report(self.experiment_name, report, run_id=run_id, metric=None)
+        return report
 
-        # 写入报告到 CSV
-        with open(file_path, "a", newline="", encoding="utf-8") as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+    def _verify_and_save(self, report: RootAnalyzeReport, run_id: str) -> RootAnalyzeReport:
+        """
+        打分并保存得分
+        :param report: 已保存但尚未打分的报告
+        :param run_id: 运行批次
+        :return: 打分后的报告
+        """
+        self._verify_single_report(report)
+        result_store.save_score(self.experiment_name, report.type_name, report.id, report.score, run_id=run_id,
+                                timings={"verify": report.timings["verify"]})
+        return report
 
-            # 如果文件不存在，写入表头
-            if not file_exists:
-                writer.writeheader()
+    def _solve_single_task(self, idx: int, run_id: str, report: RootAnalyzeReport | None = None) -> RootAnalyzeReport:
+        """
+        串行处理单个样例：执行规划器、保存报告，再打分并保存得分
+        :param idx: 样例索引
+        :param run_id: 运行批次
+        :param report: 已保存但尚未打分的报告，传入时跳过规划器只打分
+        :return: 打分后的报告
+        """
+        if report is None:
+            report = self._plan_single_task(idx, run_id)
+        return self._verify_and_save(report, run_id)
 
-            # 写入每条报告记录
-            for report in reports:
-                writer.writerow({
-                    "type_name": report.type_name,
-                    "id": report.id,
-                    "reasoning": str(report.reasoning),
-                    "response": report.response,
-                    "step": str(report.step),  # 将步骤列表转换为字符串
-                    "score": str(report.score)
-                })
+    def _solve_pipeline(self, tasks: list[tuple[int, RootAnalyzeReport | None]], run_id: str,
+                        max_workers: int, verify_workers: int) -> list[tuple[int, Exception]]:
+        """
+        规划与打分两级流水线：规划器线程池每完成一个样例，报告立即进入打分线程池，两个阶段重叠执行
+        :param tasks: (样例索引, 已保存但未打分的报告) 列表
+        :param run_id: 运行批次
+        :param max_workers: 规划器线程数
+        :param verify_workers: 打分线程数
+        :return: 失败的 (样例索引, 异常) 列表
+        """
+        failures: list[tuple[int, Exception]] = []
+        plan_bar = tqdm(total=sum(report is None for _, report in tasks), desc='planner', position=0)
+        verify_bar = tqdm(total=len(tasks), desc='verify', position=1)
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='planner') as planners, \
+                ThreadPoolExecutor(max_workers=verify_workers, thread_name_prefix='verify') as verifiers:
+            # future -> (阶段, 样例索引)
+            stages: dict[Future, tuple[str, int]] = {}
+            for i, report in tasks:
+                if report is None:
+                    stages[planners.submit(self._plan_single_task, i, run_id)] = ('planner', i)
+                else:
+                    stages[verifiers.submit(self._verify_and_save, report, run_id)] = ('verify', i)
+
+            pending = set(stages)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, i = stages.pop(future)
+                    try:
+                        report = future.result()
+                    except Exception as e:
+                        failures.append((i, e))
+                        if stage == 'planner':
+                            plan_bar.update()
+                            verify_bar.total -= 1
+                            verify_bar.refresh()
+                        else:
+                            verify_bar.update()
+                        continue
+
+                    if stage == 'planner':
+                        plan_bar.update()
+                        verify_future = verifiers.submit(self._verify_and_save, report, run_id)
+                        stages[verify_future] = ('verify', i)
+                        pending.add(verify_future)
+                    else:
+                        verify_bar.update()
+
+        plan_bar.close()
+        verify_bar.close()
+        return failures
+
+    def _pending_tasks(self, start_id: int, end_id: int, run_id: str,
+                       resume: bool) -> list[tuple[int, RootAnalyzeReport | None]]:
+        """
+        计算需要处理的样例
+        :param start_id: 样例起始 id
+        :param end_id: 样例结束 id
+        :param run_id: 运行批次
+        :param resume: 是否续跑，续跑时跳过本批次已打分的样例，已保存但未打分的样例只补打分
+        :return: (样例索引, 已保存但未打分的报告) 列表
+        """
+        start_idx = start_id - 1
+        end_idx = len(self.data) if end_id == -1 else end_id
+        indices = list(range(start_idx, end_idx))
+        if not resume:
+            return [(i, None) for i in indices]
+
+        stored = {row["id"]: row for row in result_store.cases(self.experiment_name, type_name=self.planner.type_name, run_id=run_id)}
+        tasks = []
+        for i in indices:
+            row = stored.get(self.data[i].id)
+            if row is None:
+                tasks.append((i, None))
+            elif row["score"] is None:
+                tasks.append((i, RootAnalyzeReport(
+                    type_name=row["type_name"],
+                    id=row["id"],
+                    reasoning=[],
+                    response=row["response"],
+                    step=row["step"],
+                    score=0.0
+                )))
+        return tasks
 
     def simple_solve(self, id: int) -> None:
         """
@@ -174,26 +224,43 @@ class ExperimentSolver:
         self._report_verify(reports=reports)
         print(reports)
 
-    def solve(self, start_id: int = 1, end_id: int = -1, max_workers: int = 5, is_multi: bool = True) -> None:
+    def solve(self, start_id: int = 1, end_id: int = -1, max_workers: int = 5, is_multi: bool = True,
+              run_id: str = DEFAULT_RUN_ID, resume: bool = False, verify_workers: int = verify_max_workers) -> None:
         """
-        处理实验
+        处理实验，规划与打分流水线执行：每个样例完成规划后立即保存并进入打分，不等待整批完成
         :param start_id: 样例起始 id
         :param end_id: 样例结束 id
-        :param max_workers: 线程池最大工作线程数，默认 5
+        :param max_workers: 规划器线程池最大工作线程数，默认 5
         :param is_multi: 是否使用多线程执行，默认 True
+        :param run_id: 运行批次，默认 default；需要保留多次运行结果时使用不同的 run_id
+        :param resume: 是否续跑，跳过本批次已完成的样例，默认 False（重新执行并覆盖）
+        :param verify_workers: 打分线程池最大工作线程数，默认 VERIFY_MAX_WORKERS
         :return: 无
         """
-        # 1. 执行规划器
-        if is_multi:
-            reports = self._planner_execute_multi(start_id=start_id, end_id=end_id, max_workers=max_workers)
-        else:
-            reports = self._planner_execute(start_id=start_id, end_id=end_id)
+        result_store.start_run(self.experiment_name, run_id=run_id, config={
+            self.planner.type_name: {"start_id": start_id, "end_id": end_id, "max_workers": max_workers, "is_multi": is_multi},
+            "image_preprocess": image_store.preprocessor.settings(),
+            "report_cache": report_cache.settings(),
+            "transcript": transcript_compactor.settings(),
+        })
 
-        # 2. 验证报告，拿到得分
-        self._report_verify(reports=reports)
+        tasks = self._pending_tasks(start_id=start_id, end_id=end_id, run_id=run_id, resume=resume)
 
-        # 3. 保存报告到 csv 文件
-        self._save_report_as_csv(reports=reports)
+        if is_multi:
+            failures = self._solve_pipeline(tasks, run_id=run_id, max_workers=max_workers, verify_workers=verify_workers)
+        else:
+            failures = []
+            for i, report in tqdm(tasks, desc='solve'):
+                try:
+                    self._solve_single_task(i, run_id, report)
+                except Exception as e:
+                    failures.append((i, e))
+
+        # 单个样例失败不影响其他样例，已完成的结果均已保存，可以 resume=True 续跑
+        for i, e in sorted(failures, key=lambda item: item[0]):
+            print(f"[{self.experiment_name}] {self.planner.type_name} #{self.data[i].id} 执行失败: {type(e).__name__}: {e}")
+        if failures:
+            print(f"[{self.experiment_name}] 共 {len(failures)} 个样例失败，可使用 resume=True 续跑 run_id={run_id}")
 
 class CityGuardSolver(ExperimentSolver):
     """CityGuard 实验代码"""
@@ -209,7 +276,7 @@ class BaselineSolver(ExperimentSolver):
         super().__init__(
             planner=Planner(
                 type_name=type_name,
-                system_prompt=baseline_sys_prompt.format(monitor_info=monitors)
+                system_prompt=baseline_sys_prompt.format(city_grid=city_map.render_grid(), monitor_info=monitors)
             ),
             experiment_name="baseline"
         )
@@ -221,7 +288,7 @@ class AblationMonitorSolver(ExperimentSolver):
             planner=Planner(
                 type_name=type_name,
                 tools=[get_camera_report],
-                system_prompt=ablation_monitor_sys_prompt.format()
+                system_prompt=ablation_monitor_sys_prompt.format(city_grid=city_map.render_grid())
             ),
             experiment_name="ablation_monitor"
         )
@@ -233,7 +300,7 @@ class AblationCameraSolver(ExperimentSolver):
             planner=Planner(
                 type_name=type_name,
                 tools=[get_monitor_report],
-                system_prompt=ablation_camera_sys_prompt.format(monitor_info=monitors)
+                system_prompt=ablation_camera_sys_prompt.format(city_grid=city_map.render_grid(), monitor_info=monitors)
             ),
             experiment_name="ablation_camera"
         )
@@ -244,7 +311,7 @@ class AblationRandomSolver(ExperimentSolver):
         super().__init__(
             planner=Planner(
                 type_name=type_name,
-                system_prompt=ablation_random_sys_prompt.format(monitor_info=monitors)
+                system_prompt=ablation_random_sys_prompt.format(city_grid=city_map.render_grid(), monitor_info=monitors)
             ),
             experiment_name="ablation_random"
         )
@@ -255,7 +322,7 @@ class CounterfactualOnlySolver(ExperimentSolver):
         super().__init__(
             planner=Planner(
                 type_name=type_name,
-                system_prompt=counterfactual_only_sys_prompt.format(monitor_info=monitors)
+                system_prompt=counterfactual_only_sys_prompt.format(city_grid=city_map.render_grid(), monitor_info=monitors)
             ),
             experiment_name="counterfactual_only"
         )
@@ -266,7 +333,7 @@ class DelayedDecisionOnlySolver(ExperimentSolver):
         super().__init__(
             planner=Planner(
                 type_name=type_name,
-                system_prompt=delayed_decision_only_sys_prompt.format(monitor_info=monitors)
+                system_prompt=delayed_decision_only_sys_prompt.format(city_grid=city_map.render_grid(), monitor_info=monitors)
             ),
             experiment_name="delayed_decision_only"
         )
@@ -1,19 +1,21 @@
 import os
-import csv
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.stats import gaussian_kde
 
+from guard.experiment.result_store import result_store, MissingResultsError
+
 # ---------- 路径配置 ----------
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 RESULTS_DIR = os.path.join(THIS_DIR, "results")
 OUTPUT_DIR = os.path.join(RESULTS_DIR, "visual", "step_comparison")
 
+# 方法名称 -> 实验名称
 METHODS = {
-    "Baseline": os.path.join(RESULTS_DIR, "baseline"),
-    "Counterfactual": os.path.join(RESULTS_DIR, "counterfactual_only"),
-    "Delayed Decision": os.path.join(RESULTS_DIR, "delayed_decision_only"),
-    "CityGuard": os.path.join(RESULTS_DIR, "cityguard"),
+    "Baseline": "baseline",
+    "Counterfactual": "counterfactual_only",
+    "Delayed Decision": "delayed_decision_only",
+    "CityGuard": "cityguard",
 }
 
 TYPE_NAMES = ["accident", "garbage", "noise", "water"]
@@ -28,19 +30,9 @@ COLORS = ["#5B8FF9", "#5AD8A6", "#F6BD16", "#E8684A"]
 
 
 # ---------- 数据加载 ----------
-def load_steps(csv_path: str) -> list[int]:
-    """从 CSV 文件中读取 step 列"""
-    steps = []
-    with open(csv_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            steps.append(int(row["step"]))
-    return steps
-
-
 def build_data() -> dict:
     """
-    构建数据字典，结构为:
+    从实验结果存储构建数据字典，结构为:
     {
         type_name: {
             method_name: [step, step, ...]
@@ -50,10 +42,12 @@ def build_data() -> dict:
     data = {}
     for tn in TYPE_NAMES:
         data[tn] = {}
-        for mname, mdir in METHODS.items():
-            csv_path = os.path.join(mdir, f"{tn}.csv")
-            if os.path.exists(csv_path):
-                data[tn][mname] = load_steps(csv_path)
+        for mname, experiment in METHODS.items():
+            steps = result_store.steps(experiment, type_name=tn)
+            if steps:
+                data[tn][mname] = steps
+    if not any(data.values()):
+        raise MissingResultsError(" / ".join(METHODS.values()), result_store.db_path)
     return data
 
 
@@ -355,16 +349,14 @@ def plot_step_score_scatter(data: dict):
 
     # 同时加载 scores
     score_data = {}
-    for mname, mdir in METHODS.items():
+    for mname, experiment in METHODS.items():
         for tn in TYPE_NAMES:
-            csv_path = os.path.join(mdir, f"{tn}.csv")
-            if not os.path.exists(csv_path):
+            # 未打分的样例不参与绘图
+            rows = [r for r in result_store.cases(experiment, type_name=tn) if r["score"] is not None]
+            if not rows:
                 continue
-            with open(csv_path, "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                rows = list(reader)
-            steps = [int(r["step"]) for r in rows]
-            scores = [float(r["score"]) for r in rows]
+            steps = [r["step"] for r in rows]
+            scores = [r["score"] for r in rows]
             if mname not in score_data:
                 score_data[mname] = {"steps": [], "scores": []}
             score_data[mname]["steps"].extend(steps)
@@ -376,11 +368,9 @@ def plot_step_score_scatter(data: dict):
     for i, tn in enumerate(TYPE_NAMES):
         ax = axes[i]
         for j, mname in enumerate(method_names):
-            csv_path = os.path.join(METHODS[mname], f"{tn}.csv")
-            with open(csv_path, "r", encoding="utf-8") as f:
-                rows = list(csv.DictReader(f))
-            steps = [int(r["step"]) for r in rows]
-            scores = [float(r["score"]) for r in rows]
+            rows = [r for r in result_store.cases(METHODS[mname], type_name=tn) if r["score"] is not None]
+            steps = [r["step"] for r in rows]
+            scores = [r["score"] for r in rows]
             ax.scatter(steps, scores, color=COLORS[j], alpha=0.7,
                        s=50, edgecolors="white", linewidth=0.5, label=mname)
 
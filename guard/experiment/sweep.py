@@ -0,0 +1,234 @@
+"""
+批量实验调度：按 (实验 x 类型 x 样例范围 x 重复次数) 展开所有样例，在同一个线程池中调度
+1. 所有实验共用一个工作线程池，并通过全局大模型并发上限控制对接口的总压力
+2. 公平调度：优先派发正在执行数最少的实验，避免某个实验占满线程池
+3. 已完成规划的样例优先打分，结果写入同一个实验结果存储；默认续跑，跳过已完成的样例
+
+用法：
+    python -m guard.experiment.sweep --experiments cityguard baseline --types accident noise --repeats 3 \
+        --workers 16 --llm-concurrency 8 --run-id sweep
+"""
+import argparse
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+
+from tqdm import tqdm
+
+from env_utils.llm_args import llm_max_concurrency
+from guard.agent.limiter import set_llm_max_concurrency
+from guard.common.image_store import image_store
+from guard.common.model import RootAnalyzeReport
+from guard.common.report_cache import report_cache
+from guard.common.transcript import transcript_compactor
+from guard.experiment.result_store import result_store
+from guard.experiment.solver import ExperimentSolver, CityGuardSolver, BaselineSolver, AblationMonitorSolver, \
+    AblationCameraSolver, AblationRandomSolver, CounterfactualOnlySolver, DelayedDecisionOnlySolver
+
+# 实验名称 -> 实验代码
+SOLVERS: dict[str, type[ExperimentSolver]] = {
+    "cityguard": CityGuardSolver,
+    "baseline": BaselineSolver,
+    "ablation_monitor": AblationMonitorSolver,
+    "ablation_camera": AblationCameraSolver,
+    "ablation_random": AblationRandomSolver,
+    "counterfactual_only": CounterfactualOnlySolver,
+    "delayed_decision_only": DelayedDecisionOnlySolver,
+}
+
+TYPE_NAMES = ["accident", "garbage", "noise", "water"]
+
+
+@dataclass
+class SweepJob:
+    """调度中的单个样例"""
+    solver: ExperimentSolver
+    idx: int                                # 样例索引
+    run_id: str
+    report: RootAnalyzeReport | None = None  # 规划完成后（或续跑时已保存但未打分）的报告
+
+    @property
+    def experiment(self) -> str:
+        return self.solver.experiment_name
+
+
+class SweepRunner:
+    """批量实验调度器"""
+    def __init__(self,
+                 experiments: list[str],
+                 type_names: list[str] = TYPE_NAMES,
+                 start_id: int = 1,
+                 end_id: int = -1,
+                 repeats: int = 1,
+                 run_id: str = "sweep",
+                 max_workers: int = 16,
+                 resume: bool = True):
+        """
+        初始化
+        :param experiments: 实验名称列表，见 SOLVERS
+        :param type_names: 类型名称列表
+        :param start_id: 样例起始 id
+        :param end_id: 样例结束 id，-1 表示到最后一个
+        :param repeats: 每个样例重复运行的次数，第 r 次的运行批次为 {run_id}-r{r}
+        :param run_id: 运行批次前缀
+        :param max_workers: 全局工作线程数（规划与打分共用）
+        :param resume: 是否续跑，跳过已完成的样例
+        """
+        unknown = [name for name in experiments if name not in SOLVERS]
+        if unknown:
+            raise ValueError(f"未知的实验: {unknown}，可选: {list(SOLVERS)}")
+
+        self.experiments: list[str] = experiments
+        self.type_names: list[str] = type_names
+        self.start_id: int = start_id
+        self.end_id: int = end_id
+        self.repeats: int = repeats
+        self.run_id: str = run_id
+        self.max_workers: int = max_workers
+        self.resume: bool = resume
+
+    def run_ids(self) -> list[str]:
+        return [f"{self.run_id}-r{r}" for r in range(1, self.repeats + 1)]
+
+    def build_jobs(self) -> tuple[dict[str, deque[SweepJob]], deque[SweepJob]]:
+        """
+        展开实验矩阵，登记运行批次
+        :return: 实验名称 -> 待规划样例队列，以及续跑时已保存但未打分、直接进入打分的样例
+        """
+        queues: dict[str, deque[SweepJob]] = {name: deque() for name in self.experiments}
+        verify_ready: deque[SweepJob] = deque()
+        for name in self.experiments:
+            for type_name in self.type_names:
+                solver = SOLVERS[name](type_name=type_name)
+                for run_id in self.run_ids():
+                    result_store.start_run(solver.experiment_name, run_id=run_id, config={
+                        type_name: {"start_id": self.start_id, "end_id": self.end_id, "sweep": self.run_id},
+                        "image_preprocess": image_store.preprocessor.settings(),
+                        "report_cache": report_cache.settings(),
+                        "transcript": transcript_compactor.settings(),
+                    })
+                    tasks = solver._pending_tasks(start_id=self.start_id, end_id=self.end_id, run_id=run_id, resume=self.resume)
+                    for idx, report in tasks:
+                        (queues[name] if report is None else verify_ready).append(SweepJob(solver, idx, run_id, report))
+        return queues, verify_ready
+
+    def run(self) -> dict:
+        """
+        执行调度
+        :return: 每个实验的统计信息与总耗时
+        """
+        start = time.perf_counter()
+        queues, verify_ready = self.build_jobs()
+
+        inflight: Counter[str] = Counter()   # 各实验正在执行的任务数
+        served: Counter[str] = Counter()     # 各实验已派发的规划任务数，用于轮询
+        stats = {name: Counter() for name in self.experiments}
+        failures: list[tuple[SweepJob, str, Exception]] = []
+
+        total = sum(len(queue) for queue in queues.values())
+        plan_bar = tqdm(total=total, desc='planner', position=0)
+        verify_bar = tqdm(total=total + len(verify_ready), desc='verify', position=1)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='sweep') as pool:
+            stages: dict[Future, tuple[str, SweepJob]] = {}
+
+            def dispatch() -> None:
+                """补满线程池：已规划的样例优先打分，其次派发正在执行数最少的实验的规划任务"""
+                while len(stages) < self.max_workers:
+                    if verify_ready:
+                        job, stage = verify_ready.popleft(), 'verify'
+                        future = pool.submit(job.solver._verify_and_save, job.report, job.run_id)
+                    else:
+                        candidates = [name for name in self.experiments if queues[name]]
+                        if not candidates:
+                            return
+                        name = min(candidates, key=lambda n: (inflight[n], served[n]))
+                        job, stage = queues[name].popleft(), 'planner'
+                        served[name] += 1
+                        future = pool.submit(job.solver._plan_single_task, job.idx, job.run_id)
+                    inflight[job.experiment] += 1
+                    stages[future] = (stage, job)
+
+            dispatch()
+            while stages:
+                done, _ = wait(stages, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, job = stages.pop(future)
+                    inflight[job.experiment] -= 1
+                    try:
+                        report = future.result()
+                    except Exception as e:
+                        failures.append((job, stage, e))
+                        stats[job.experiment]["failed"] += 1
+                        if stage == 'planner':
+                            plan_bar.update()
+                            verify_bar.total -= 1
+                            verify_bar.refresh()
+                        else:
+                            verify_bar.update()
+                        continue
+
+                    stats[job.experiment][stage] += 1
+                    if stage == 'planner':
+                        plan_bar.update()
+                        job.report = report
+                        verify_ready.append(job)
+                    else:
+                        verify_bar.update()
+                dispatch()
+
+        plan_bar.close()
+        verify_bar.close()
+
+        for job, stage, e in failures:
+            print(f"[{job.experiment}] {job.solver.planner.type_name} #{job.solver.data[job.idx].id} ({job.run_id}) "
+                  f"{stage} 失败: {type(e).__name__}: {e}")
+        if failures:
+            print(f"共 {len(failures)} 个样例失败，重新执行相同命令即可续跑")
+
+        return {
+            "elapsed_s": round(time.perf_counter() - start, 2),
+            "experiments": {name: dict(counter) for name, counter in stats.items()},
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量实验调度")
+    parser.add_argument("--experiments", nargs="+", default=list(SOLVERS), choices=list(SOLVERS))
+    parser.add_argument("--types", nargs="+", default=TYPE_NAMES, choices=TYPE_NAMES)
+    parser.add_argument("--start-id", type=int, default=1)
+    parser.add_argument("--end-id", type=int, default=-1)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--run-id", default="sweep", help="运行批次前缀，第 r 次重复为 {run-id}-r{r}")
+    parser.add_argument("--workers", type=int, default=16, help="全局工作线程数")
+    parser.add_argument("--llm-concurrency", type=int, default=llm_max_concurrency,
+                        help="全局大模型调用并发上限，小于等于 0 表示不限制，默认 LLM_MAX_CONCURRENCY")
+    parser.add_argument("--no-resume", action="store_true", help="重新执行所有样例并覆盖已有结果")
+    args = parser.parse_args()
+
+    set_llm_max_concurrency(args.llm_concurrency)
+    runner = SweepRunner(
+        experiments=args.experiments,
+        type_names=args.types,
+        start_id=args.start_id,
+        end_id=args.end_id,
+        repeats=args.repeats,
+        run_id=args.run_id,
+        max_workers=args.workers,
+        resume=not args.no_resume,
+    )
+    result = runner.run()
+
+    print(f"总耗时 {result['elapsed_s']}s")
+    for name, counter in result["experiments"].items():
+        print(f"{name:<24} 规划 {counter.get('planner', 0):>5}  打分 {counter.get('verify', 0):>5}  失败 {counter.get('failed', 0):>5}")
+    for run_id in runner.run_ids():
+        for row in result_store.summary(run_id=run_id):
+            if row["experiment"] in runner.experiments and row["type_name"] in runner.type_names:
+                mean = "-" if row["mean_score"] is None else f"{row['mean_score']:.2f}"
+                print(f"{run_id:<16} {row['experiment']:<24} {row['type_name']:<10} {row['cases']:>4} 样例  平均分 {mean}")
+
+
+if __name__ == "__main__":
+    main()
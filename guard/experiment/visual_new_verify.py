@@ -2,20 +2,24 @@
 仅作测试用
 """
 import os
-import csv
 import numpy as np
 import matplotlib.pyplot as plt
 
+from guard.experiment.result_store import result_store, MissingResultsError
+
 # ---------- 路径配置 ----------
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
-RESULTS_DIR = os.path.join(THIS_DIR, "results", "new_verify")
 OUTPUT_DIR = os.path.join(THIS_DIR, "results", "visual", "new_score_comparison")
 
+# new_verify_test 重新打分写入的指标名称
+METRIC = "new_verify"
+
+# 方法名称 -> 实验名称
 METHODS = {
-    "Baseline": os.path.join(RESULTS_DIR, "baseline.csv"),
-    "Counterfactual": os.path.join(RESULTS_DIR, "counterfactual_only.csv"),
-    "Delayed Decision": os.path.join(RESULTS_DIR, "delayed_decision_only.csv"),
-    "CityGuard": os.path.join(RESULTS_DIR, "cityguard.csv"),
+    "Baseline": "baseline",
+    "Counterfactual": "counterfactual_only",
+    "Delayed Decision": "delayed_decision_only",
+    "CityGuard": "cityguard",
 }
 
 TYPE_NAMES = ["accident", "garbage", "noise", "water"]
@@ -32,7 +36,7 @@ COLORS = ["#5B8FF9", "#5AD8A6", "#F6BD16", "#E8684A"]
 # ---------- 数据加载 ----------
 def build_data() -> dict:
     """
-    从 new_verify 目录读取数据，结构为:
+    从实验结果存储读取重新打分的数据，结构为:
     {
         type_name: {
             method_name: [score, score, ...]
@@ -42,13 +46,13 @@ def build_data() -> dict:
     data = {}
     for tn in TYPE_NAMES:
         data[tn] = {}
-        for mname, csv_path in METHODS.items():
-            if not os.path.exists(csv_path):
-                continue
-            with open(csv_path, "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                scores = [float(row[tn]) for row in reader if row[tn]]
-            data[tn][mname] = scores
+        for mname, experiment in METHODS.items():
+            scores = result_store.scores(experiment, type_name=tn, metric=METRIC)
+            if scores:
+                data[tn][mname] = scores
+    if not any(data.values()):
+        raise MissingResultsError(f"{METRIC} 得分", result_store.db_path,
+                                  hint="请先运行 python -m guard.experiment.new_verify_test 重新打分")
     return data
 
 
@@ -5,6 +5,8 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
 
+from guard.experiment.result_store import result_store, MissingResultsError
+
 # 使用 __file__ 获取当前脚本所在目录，动态计算路径
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)  # guard/experiment 的父目录是 guard
@@ -17,22 +19,23 @@ plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
 
 
 def load_experiment_data(base_path):
-    """加载实验数据并合并"""
+    """从实验结果存储加载实验数据并合并"""
     experiment_groups = {
-        "Full Workflow": os.path.join(base_path, "cityguard"),
-        "Ablation: Camera": os.path.join(base_path, "ablation_camera"),
-        "Ablation: Monitor": os.path.join(base_path, "ablation_monitor")
+        "Full Workflow": "cityguard",
+        "Ablation: Camera": "ablation_camera",
+        "Ablation: Monitor": "ablation_monitor"
     }
 
     all_data = []
-    for exp_name, exp_path in experiment_groups.items():
-        for file in os.listdir(exp_path):
-            if file.endswith(".csv"):
-                file_path = os.path.join(exp_path, file)
-                df = pd.read_csv(file_path)
-                df['Experiment'] = exp_name  # 添加实验组标签
-                all_data.append(df)
-
+    for exp_name, experiment in experiment_groups.items():
+        rows = result_store.cases(experiment)
+        if rows:
+            df = pd.DataFrame(rows)
+            df['Experiment'] = exp_name  # 添加实验组标签
+            all_data.append(df)
+
+    if not all_data:
+        raise MissingResultsError(" / ".join(experiment_groups.values()), result_store.db_path)
     combined_df = pd.concat(all_data, ignore_index=True)
     combined_df['Response Length'] = combined_df['response'].apply(len)
     combined_df.dropna(subset=['score', 'step'], inplace=True)
@@ -40,25 +43,27 @@ def load_experiment_data(base_path):
 
 
 def load_category_data(base_path):
-    """加载分类别实验数据"""
+    """从实验结果存储加载分类别实验数据"""
     experiment_groups = {
-        "Full Workflow": os.path.join(base_path, "cityguard"),
-        "Ablation: Camera": os.path.join(base_path, "ablation_camera"),
-        "Ablation: Monitor": os.path.join(base_path, "ablation_monitor")
+        "Full Workflow": "cityguard",
+        "Ablation: Camera": "ablation_camera",
+        "Ablation: Monitor": "ablation_monitor"
     }
 
     categories = ['accident', 'garbage', 'noise', 'water']
     all_data = []
 
-    for exp_name, exp_path in experiment_groups.items():
+    for exp_name, experiment in experiment_groups.items():
         for cat in categories:
-            file_path = os.path.join(exp_path, f"{cat}.csv")
-            if os.path.exists(file_path):
-                df = pd.read_csv(file_path)
+            rows = result_store.cases(experiment, type_name=cat)
+            if rows:
+                df = pd.DataFrame(rows)
                 df['Experiment'] = exp_name
                 df['Category'] = cat.capitalize()
                 all_data.append(df)
 
+    if not all_data:
+        raise MissingResultsError(" / ".join(experiment_groups.values()), result_store.db_path)
     combined_df = pd.concat(all_data, ignore_index=True)
     combined_df['Response Length'] = combined_df['response'].apply(len)
     combined_df.dropna(subset=['score', 'step'], inplace=True)
@@ -0,0 +1,140 @@
+import asyncio
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from env_utils.runtime_args import task_cache_enabled, task_cache_ttl, task_cache_max_entries
+from guard.common.model import FinalReport
+
+
+@dataclass
+class TaskResult:
+    """一次完整任务的执行结果"""
+    task_uuid: str | None     # 实际执行时使用的会话 uuid，复用其他请求的结果时为 None
+    reasoning_process: str    # 推理过程（规划器最终回复）
+    final_report: FinalReport
+    steps: int
+    prompt_tokens_saved: int = 0  # 精简消息历史节省的生成器输入 token 数（估算）
+
+
+class TaskResultCache:
+    """
+    /task 结果缓存：
+    1. 按 (规范化后的举报内容, type_name, type_id) 缓存结果，支持 TTL 与容量上限（LRU）
+    2. 请求合并：相同 key 的并发请求只执行一次，其余请求等待并共享结果
+       任务在独立的 asyncio 任务中执行，发起请求被取消（例如客户端断开）时，只要还有其他请求在等待就继续执行
+    """
+    def __init__(self,
+                 ttl: float = task_cache_ttl,
+                 max_entries: int = task_cache_max_entries,
+                 enabled: bool = task_cache_enabled):
+        """
+        初始化
+        :param ttl: 缓存有效期（秒），小于等于 0 表示永不过期
+        :param max_entries: 最大缓存条数
+        :param enabled: 是否启用缓存，关闭时仍会合并并发的相同请求
+        """
+        self.ttl: float = ttl
+        self.max_entries: int = max_entries
+        self.enabled: bool = enabled
+        self.hits: int = 0
+        self.misses: int = 0
+        self.coalesced: int = 0
+
+        self._entries: OrderedDict[tuple, tuple[float, TaskResult]] = OrderedDict()
+        self._inflight: dict[tuple, asyncio.Task[TaskResult]] = {}
+        self._waiters: dict[asyncio.Task[TaskResult], int] = {}  # 正在等待各任务结果的请求数
+
+    @staticmethod
+    def make_key(user_prompt: str, type_name: str, type_id: int) -> tuple:
+        """
+        构建缓存 key，举报内容做 NFKC 归一化、大小写折叠并合并空白
+        :param user_prompt: 市民举报信息
+        :param type_name: 异常类型名称
+        :param type_id: 类型下的案例ID
+        :return: 缓存 key
+        """
+        normalized = unicodedata.normalize("NFKC", user_prompt).casefold()
+        normalized = re.sub(r"\s+", " ", normalized).strip()
+        return normalized, type_name, type_id
+
+    def get(self, key: tuple) -> TaskResult | None:
+        """读取未过期的缓存结果"""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created_at, result = entry
+        if 0 < self.ttl < time.monotonic() - created_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: tuple, result: TaskResult) -> None:
+        """写入结果并按 LRU 淘汰超出容量的条目"""
+        if not self.enabled:
+            return
+        self._entries[key] = (time.monotonic(), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_run(self, key: tuple, run: Callable[[], Awaitable[TaskResult]]) -> tuple[TaskResult, bool]:
+        """
+        命中缓存时直接返回；已有相同请求在执行时等待其结果；否则执行并写入缓存
+        :param key: 缓存 key
+        :param run: 实际执行任务的协程函数
+        :return: 任务结果，以及是否复用了其他请求的结果
+        """
+        if (result := self.get(key)) is not None:
+            self.hits += 1
+            return result, True
+
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._run(key, run))
+            self._inflight[key] = task
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            # 最后一个等待者被取消时才取消任务，不再把它作为进行中的请求提供给后续请求
+            if self._waiters[task] == 1 and not task.done():
+                task.cancel()
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    async def _run(self, key: tuple, run: Callable[[], Awaitable[TaskResult]]) -> TaskResult:
+        """执行任务并写入缓存"""
+        try:
+            result = await run()
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+        self.put(key, result)
+        return result
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+        }
@@ -1,11 +1,10 @@
-import uuid
-
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from typing import AsyncGenerator
 
+from env_utils.llm_args import verify_max_workers
 from guard.server.schemas import TaskRequest, TaskResponse
-from guard.server.service import PlannerService, get_planner_service, VerifierService, get_verifier_service
+from guard.server.service import PlannerService, get_planner_service, VerifierService, get_verifier_service, CsvRowStream
 
 
 router = APIRouter(prefix="/api/v1", tags=["planner"])
@@ -20,19 +19,20 @@ async def create_task(
     创建任务（非流式）
     返回推理过程和最终格式化报告
     """
-    task_uuid = request.task_uuid or str(uuid.uuid4())
-    reasoning_process, final_report, steps = service.run(
+    result, cache_hit = await service.arun_cached(
         user_prompt=request.user_prompt,
         type_name=request.type_name,
         type_id=request.type_id,
-        task_uuid=task_uuid,
+        task_uuid=request.task_uuid,
     )
 
     return TaskResponse(
-        task_uuid=task_uuid,
-        reasoning_process=reasoning_process,
-        final_report=final_report,
-        steps=steps
+        task_uuid=result.task_uuid,
+        reasoning_process=result.reasoning_process,
+        final_report=result.final_report.model_dump(),
+        steps=result.steps,
+        cache_hit=cache_hit,
+        prompt_tokens_saved=result.prompt_tokens_saved,
     )
 
 
@@ -44,16 +44,16 @@ async def create_task_stream(
     """
     创建任务（流式响应）
     使用 Server-Sent Events (SSE) 进行流式输出
+    开启逐 token 输出时，推理过程与最终报告的增量以 reasoning_delta / final_report_delta 事件按固定间隔合并发送
     """
-    task_uuid = request.task_uuid or str(uuid.uuid4())
-
     async def event_generator() -> AsyncGenerator[str, None]:
-        for event in service.run_stream(
+        async for event in service.arun_stream(
             user_prompt=request.user_prompt,
             type_name=request.type_name,
             type_id=request.type_id,
-            task_uuid=task_uuid,
-        ):
+            task_uuid=request.task_uuid,
+            stream_tokens=request.stream_tokens,
+            ):
             yield event
 
     return StreamingResponse(
@@ -70,28 +70,31 @@ async def create_task_stream(
 @router.post("/verify/stream")
 async def verify_stream(
     file: UploadFile = File(..., description="CSV 文件"),
+    workers: int = Query(default=verify_max_workers, ge=1, le=64, description="并发评分的工作协程数"),
+    ordered: bool = Query(default=False, description="是否按原始行顺序返回结果"),
     service: VerifierService = Depends(get_verifier_service),
 ) -> StreamingResponse:
     """
     评估验证（流式响应）
-    上传 CSV 文件，串行调用验证模型，通过 SSE 逐条返回评估结果
+    上传 CSV 文件，并发调用验证模型，每条评估完成后立即通过 SSE 返回结果
     """
     if not file.filename or not file.filename.endswith(".csv"):
         raise HTTPException(status_code=400, detail="请上传 CSV 文件")
 
-    content = await file.read()
+    # 只读取并校验表头和第一条数据，其余数据行在评分过程中增量读取
+    rows = CsvRowStream(file)
     try:
-        rows = service.parse_csv(content)
+        has_rows = await rows.open()
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"CSV 解析失败: {str(e)}")
 
-    if not rows:
+    if not has_rows:
         raise HTTPException(status_code=400, detail="CSV 文件内容为空")
 
     async def event_generator() -> AsyncGenerator[str, None]:
-        for event in service.run_stream(rows):
+        async for event in service.arun_stream(rows, workers=workers, ordered=ordered):
             yield event
 
     return StreamingResponse(
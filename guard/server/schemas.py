@@ -7,19 +7,22 @@ class TaskRequest(BaseModel):
     type_name: str = Field(default="garbage", description="异常类型名称")
     type_id: int = Field(default=1, description="类型下的具体案例ID")
     task_uuid: str | None = Field(default=None, description="任务UUID，用于会话追踪")
+    stream_tokens: bool | None = Field(default=None, description="流式接口是否逐 token 输出增量事件，默认使用 STREAM_TOKENS 配置")
 
 
 class TaskResponse(BaseModel):
     """任务响应模型（非流式）"""
-    task_uuid: str
+    task_uuid: str | None = Field(..., description="会话UUID，可用于续接会话；复用缓存或并发相同请求的结果时为 None")
     reasoning_process: str = Field(..., description="推理过程")
     final_report: dict = Field(..., description="最终格式化报告")
     steps: int
+    cache_hit: bool = Field(default=False, description="是否复用了缓存或并发相同请求的结果")
+    prompt_tokens_saved: int = Field(default=0, description="精简消息历史节省的生成器输入 token 数（估算）")
 
 
 class StreamEvent(BaseModel):
     """流式事件模型"""
-    event: str = Field(..., description="事件类型: reasoning, tool_call, tool_message, final_report")
+    event: str = Field(..., description="事件类型: reasoning, reasoning_delta, tool_call, tool_message, final_report_delta, final_report")
     data: dict = Field(..., description="事件数据")
     step: int | None = Field(default=None, description="当前步骤数")
     event_type: str = Field(..., description="渲染类型: reasoning=推理过程(蓝色), final_report=最终报告(绿色)")
@@ -1,22 +1,101 @@
+import asyncio
+import dataclasses
 import uuid
-from typing import Generator
+from collections import deque
+from typing import Generator, AsyncGenerator, AsyncIterable, Callable
+import codecs
 import json
 import csv
 import io
+import threading
+import time
 
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+from fastapi import UploadFile
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, ToolMessage
+from langchain_core.utils.json import parse_partial_json
 
-from guard.agent.planner import Planner
+from env_utils.llm_args import verify_max_workers
+from env_utils.runtime_args import (
+    stream_tokens as default_stream_tokens,
+    stream_coalesce_interval,
+)
+from guard.agent.planner import Planner, planner_system_prompt
 from guard.agent.executor import (
     get_monitor_report,
     get_camera_report,
     PlannerContext,
-    monitors,
 )
-from guard.agent.generator import generator as final_report_generator
-from guard.agent.verifier import server_verify
-from guard.common.prompt import planner_sys_prompt, generator_sys_prompt
+from guard.agent.generator import get_generator
+from guard.agent.limiter import verify_rate_limiter
+from guard.agent.middleware import prompt_cache_usage
+from guard.agent.verifier import server_verify, aserver_verify
 from guard.common.model import FinalReport, VerifyReport
+from guard.common.transcript import generator_prompt
+from guard.server.cache import TaskResult, TaskResultCache
+from guard.server.schemas import VerifyCsvRow
+
+
+class DeltaCoalescer:
+    """
+    将逐 token 的增量合并为帧：距上一帧超过间隔才发送，控制 SSE 事件频率
+    第一段增量立即发送，保证首字节时间；剩余内容在其他事件之前或流结束时通过 flush 发送
+    """
+    def __init__(self, interval: float = stream_coalesce_interval):
+        """
+        初始化
+        :param interval: 两帧之间的最短间隔（秒），小于等于 0 表示逐块发送
+        """
+        self.interval: float = interval
+        self._buffer: list[str] = []
+        self._last_flush: float = float("-inf")
+
+    def push(self, text: str) -> str | None:
+        """
+        追加一段增量
+        :return: 到达发送间隔时返回合并后的文本，否则返回 None
+        """
+        if text:
+            self._buffer.append(text)
+        if time.monotonic() - self._last_flush < self.interval:
+            return None
+        return self.flush()
+
+    def flush(self) -> str | None:
+        """取出缓冲区中的全部文本，缓冲区为空时返回 None"""
+        if not self._buffer:
+            return None
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        self._last_flush = time.monotonic()
+        return text
+
+
+class ReportDeltaParser:
+    """从生成器流式输出的结构化结果（不完整的 JSON 参数）中解析出各字段新增的文本"""
+    fields = ("analyze_goal", "reasoning_process_report", "final_report")
+
+    def __init__(self):
+        self._raw: str = ""
+        self._sent: dict[str, str] = {field: "" for field in self.fields}
+
+    def feed(self, text: str) -> dict[str, str]:
+        """
+        追加一段 JSON 片段
+        :return: 字段名 -> 自上次以来新增的文本，没有新增内容的字段不包含在内
+        """
+        self._raw += text
+        parsed = parse_partial_json(self._raw) if self._raw else None
+        if not isinstance(parsed, dict):
+            return {}
+
+        deltas = {}
+        for field in self.fields:
+            value, sent = parsed.get(field), self._sent[field]
+            # 不完整的转义序列可能被截断，只发送确定追加的部分
+            if isinstance(value, str) and len(value) > len(sent) and value.startswith(sent):
+                deltas[field] = value[len(sent):]
+                self._sent[field] = value
+        return deltas
 
 
 class PlannerService(Planner):
@@ -30,122 +109,154 @@ class PlannerService(Planner):
         super().__init__(
             type_name=type_name,
             tools=[get_monitor_report, get_camera_report],
-            system_prompt=planner_sys_prompt.format(monitor_info=monitors),
+            system_prompt=planner_system_prompt(),
+            history_window=True,
         )
+        self.task_cache = TaskResultCache()
 
-    def run_stream(self, user_prompt: str, type_name: str, type_id: int, task_uuid: str | None = None) -> Generator[str, None, None]:
+    def run_stream(self, user_prompt: str, type_name: str, type_id: int, task_uuid: str | None = None,
+                   stream_tokens: bool | None = None) -> Generator[str, None, None]:
         """
         流式执行智能体规划流程
         :param user_prompt: 用户举报信息
         :param type_name: 异常类型名称
         :param type_id: 类型下的案例ID
         :param task_uuid: 任务UUID
+        :param stream_tokens: 是否逐 token 输出 reasoning_delta / final_report_delta 事件，None 表示使用 STREAM_TOKENS
         :return: SSE 流式事件
         """
         if task_uuid is None:
             task_uuid = str(uuid.uuid4())
+        stream_mode = self._stream_mode(stream_tokens)
 
         all_messages = []  # 收集所有消息
 
         # 发送任务开始事件
-        yield self._format_sse_event(
-            "reasoning",
-            {"message": "任务开始", "task_uuid": task_uuid},
-            step=0,
-            event_type="reasoning"
-        )
+        yield self._task_start_event(task_uuid)
 
         step_count = 0
+        coalescer = DeltaCoalescer()
 
-        for chunk in self.planner.stream(
+        for mode, data in self.planner.stream(
             {"messages": [HumanMessage(content=f"市民举报信息如下：{user_prompt}")]},
-            {"configurable": {"thread_id": task_uuid}},
+            self._config(task_uuid),
             context=PlannerContext(type_name=type_name, id=type_id),
-            stream_mode="updates"
+            stream_mode=stream_mode
         ):
-            for step, data in chunk.items():
-                step_count += 1
-                response = data.get('messages', [None])[-1]
-
-                # 收集消息
-                if response is not None:
-                    all_messages.append(response)
-
-                if isinstance(response, AIMessage):
-                    # AI 消息事件 - 推理过程
-                    content = response.content if isinstance(response.content, str) else str(response.content)
-
-                    yield self._format_sse_event(
-                        "reasoning",
-                        {"content": content, "tool_calls": response.tool_calls or []},
-                        step=step_count,
-                        event_type="reasoning"
-                    )
-
-                    # 工具调用事件 - 推理过程
-                    if response.tool_calls is not None and len(response.tool_calls) > 0:
-                        for tool_call in response.tool_calls:
-                            yield self._format_sse_event(
-                                "tool_call",
-                                {"tool_name": tool_call.get('name'), "tool_args": tool_call.get('args', {})},
-                                step=step_count,
-                                event_type="reasoning"
-                            )
-
-                elif isinstance(response, ToolMessage):
-                    # 工具返回结果事件 - 推理过程
-                    tool_content = response.content
-                    # 如果是结构化对象，转换为字典
-                    if hasattr(tool_content, 'model_dump'):
-                        tool_content = tool_content.model_dump()
-
-                    yield self._format_sse_event(
-                        "tool_message",
-                        {"tool_name": response.name, "content": tool_content},
-                        step=step_count,
-                        event_type="reasoning"
-                    )
-
-                elif isinstance(response, HumanMessage):
-                    # 用户消息事件
-                    yield self._format_sse_event(
-                        "human_message",
-                        {"content": response.content},
-                        step=step_count,
-                        event_type="reasoning"
-                    )
-
-            # 步骤完成事件
-            yield self._format_sse_event(
-                "step",
-                {"message": f"步骤 {step_count} 完成"},
-                step=step_count,
-                event_type="reasoning"
-            )
+            events, step_count = self._planner_part_events(mode, data, step_count, all_messages, coalescer)
+            yield from events
 
         # 发送推理完成事件
-        yield self._format_sse_event(
-            "reasoning_complete",
-            {"message": "推理完成，开始生成报告", "total_steps": step_count},
-            step=step_count,
-            event_type="reasoning"
-        )
+        yield self._reasoning_complete_event(step_count)
 
         # 使用 generator 生成最终报告（参考 run_with_final_report）
-        prompt = generator_sys_prompt.format(user_prompt=user_prompt, agent_response=all_messages)
-        final_report_response = final_report_generator.invoke({"messages": [prompt]})
-        final_report: FinalReport = final_report_response["structured_response"]
+        prompt, transcript_stats = generator_prompt(user_prompt, all_messages)
+        final_report = None
+        coalescer, parser = DeltaCoalescer(), ReportDeltaParser()
+        for mode, data in get_generator().stream({"messages": [prompt]}, stream_mode=stream_mode):
+            events, final_report = self._report_part_events(mode, data, step_count, coalescer, parser, final_report)
+            yield from events
 
         # 发送最终报告事件 - 前端用绿色渲染
-        yield self._format_sse_event(
-            "final_report",
-            {
-                "analyze_goal": final_report.analyze_goal,
-                "reasoning_process_report": final_report.reasoning_process_report,
-                "final_report": final_report.final_report,
-            },
-            step=step_count,
-            event_type="final_report"
+        yield self._final_report_event(final_report, step_count, prompt_tokens_saved=transcript_stats.saved_tokens)
+
+    async def arun_stream(self, user_prompt: str, type_name: str, type_id: int, task_uuid: str | None = None,
+                          stream_tokens: bool | None = None) -> AsyncGenerator[str, None]:
+        """
+        流式执行智能体规划流程（异步版本，不阻塞事件循环）
+        未指定 task_uuid 的新会话与 /task 共用结果缓存：命中缓存或等待并发的相同请求时只发送最终结果，
+        复用的结果不属于本请求的会话，task_start 事件中的 task_uuid 为 None
+        :param user_prompt: 用户举报信息
+        :param type_name: 异常类型名称
+        :param type_id: 类型下的案例ID
+        :param task_uuid: 任务UUID
+        :param stream_tokens: 是否逐 token 输出 reasoning_delta / final_report_delta 事件，None 表示使用 STREAM_TOKENS
+        :return: SSE 流式事件
+        """
+        stream_mode = self._stream_mode(stream_tokens)
+        # 任务在独立的 asyncio 任务中执行，事件经队列转发；任务结束后放入 None 表示事件已发送完
+        events: asyncio.Queue[str | None] = asyncio.Queue()
+
+        if task_uuid is None:
+            cache_key = self.task_cache.make_key(user_prompt, type_name, type_id)
+            task = asyncio.ensure_future(self.task_cache.get_or_run(cache_key, lambda: self._astream_task(
+                user_prompt, type_name, type_id, str(uuid.uuid4()), stream_mode, events.put_nowait
+            )))
+        else:
+            # 续接已有会话时结果依赖历史，不走缓存
+            task = asyncio.ensure_future(self._astream_task(
+                user_prompt, type_name, type_id, task_uuid, stream_mode, events.put_nowait
+            ))
+        task.add_done_callback(lambda _: events.put_nowait(None))
+
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+        finally:
+            # 客户端断开时取消本请求；缓存中的任务只有在没有其他请求等待时才会被取消
+            if not task.done():
+                task.cancel()
+
+        if task_uuid is None:
+            result, reused = task.result()
+            if reused:
+                yield self._task_start_event(None)
+                yield self._reasoning_complete_event(result.steps)
+                yield self._final_report_event(result.final_report, result.steps, cache_hit=True)
+        else:
+            task.result()
+
+    async def _astream_task(self, user_prompt: str, type_name: str, type_id: int, task_uuid: str,
+                            stream_mode: list[str], emit: Callable[[str], None]) -> TaskResult:
+        """
+        执行一次流式任务，每个 SSE 事件通过 emit 发送
+        :param user_prompt: 用户举报信息
+        :param type_name: 异常类型名称
+        :param type_id: 类型下的案例ID
+        :param task_uuid: 任务UUID
+        :param stream_mode: 流式输出模式
+        :param emit: 发送事件的回调
+        :return: 任务结果
+        """
+        all_messages = []  # 收集所有消息
+
+        # 发送任务开始事件
+        emit(self._task_start_event(task_uuid))
+
+        step_count = 0
+        coalescer = DeltaCoalescer()
+
+        async for mode, data in self.planner.astream(
+            {"messages": [HumanMessage(content=f"市民举报信息如下：{user_prompt}")]},
+            self._config(task_uuid),
+            context=PlannerContext(type_name=type_name, id=type_id),
+            stream_mode=stream_mode
+        ):
+            events, step_count = self._planner_part_events(mode, data, step_count, all_messages, coalescer)
+            for event in events:
+                emit(event)
+
+        # 发送推理完成事件
+        emit(self._reasoning_complete_event(step_count))
+
+        # 使用 generator 生成最终报告（参考 run_with_final_report）
+        prompt, transcript_stats = generator_prompt(user_prompt, all_messages)
+        final_report = None
+        coalescer, parser = DeltaCoalescer(), ReportDeltaParser()
+        async for mode, data in get_generator().astream({"messages": [prompt]}, stream_mode=stream_mode):
+            events, final_report = self._report_part_events(mode, data, step_count, coalescer, parser, final_report)
+            for event in events:
+                emit(event)
+
+        # 发送最终报告事件 - 前端用绿色渲染
+        emit(self._final_report_event(final_report, step_count, prompt_tokens_saved=transcript_stats.saved_tokens))
+
+        return TaskResult(
+            task_uuid=task_uuid,
+            reasoning_process=self._reasoning_text(all_messages),
+            final_report=final_report,
+            steps=step_count,
+            prompt_tokens_saved=transcript_stats.saved_tokens,
         )
 
     def run(self, user_prompt: str, type_name: str, type_id: int, task_uuid: str | None = None) -> tuple[str, FinalReport, int]:
@@ -157,24 +268,287 @@ class PlannerService(Planner):
         :param task_uuid: 任务UUID
         :return: 推理过程、最终报告和步骤数
         """
+        result = self.run_task(user_prompt, type_name, type_id, task_uuid)
+        return result.reasoning_process, result.final_report, result.steps
+
+    async def arun(self, user_prompt: str, type_name: str, type_id: int, task_uuid: str | None = None) -> tuple[str, FinalReport, int]:
+        """
+        执行智能体规划流程（非流式，异步版本）
+        :param user_prompt: 用户举报信息
+        :param type_name: 异常类型名称
+        :param type_id: 类型下的案例ID
+        :param task_uuid: 任务UUID
+        :return: 推理过程、最终报告和步骤数
+        """
+        result = await self.arun_task(user_prompt, type_name, type_id, task_uuid)
+        return result.reasoning_process, result.final_report, result.steps
+
+    def run_task(self, user_prompt: str, type_name: str, type_id: int, task_uuid: str | None = None) -> TaskResult:
+        """
+        执行智能体规划流程（非流式），参数同 run
+        :return: 任务结果，包含精简消息历史节省的 token 数
+        """
         if task_uuid is None:
             task_uuid = str(uuid.uuid4())
+        messages = self.planner.invoke(
+            {"messages": [HumanMessage(content=f"市民举报信息如下：{user_prompt}")]},
+            self._config(task_uuid),
+            context=PlannerContext(type_name=type_name, id=type_id)
+        )["messages"]
+
+        # 使用 generator 生成最终报告（参考 run_with_final_report）
+        prompt, transcript_stats = generator_prompt(user_prompt, messages)
+        final_report = get_generator().invoke({"messages": [prompt]})["structured_response"]
 
-        response = self.planner.invoke(
+        return TaskResult(task_uuid=task_uuid, reasoning_process=self._reasoning_text(messages),
+                          final_report=final_report, steps=len(messages),
+                          prompt_tokens_saved=transcript_stats.saved_tokens)
+
+    async def arun_task(self, user_prompt: str, type_name: str, type_id: int, task_uuid: str | None = None) -> TaskResult:
+        """
+        执行智能体规划流程（非流式，异步版本），参数同 run
+        :return: 任务结果，包含精简消息历史节省的 token 数
+        """
+        if task_uuid is None:
+            task_uuid = str(uuid.uuid4())
+        messages = (await self.planner.ainvoke(
             {"messages": [HumanMessage(content=f"市民举报信息如下：{user_prompt}")]},
-            {"configurable": {"thread_id": task_uuid}},
+            self._config(task_uuid),
             context=PlannerContext(type_name=type_name, id=type_id)
+        ))["messages"]
+
+        # 使用 generator 生成最终报告（参考 run_with_final_report）
+        prompt, transcript_stats = generator_prompt(user_prompt, messages)
+        final_report = (await get_generator().ainvoke({"messages": [prompt]}))["structured_response"]
+
+        return TaskResult(task_uuid=task_uuid, reasoning_process=self._reasoning_text(messages),
+                          final_report=final_report, steps=len(messages),
+                          prompt_tokens_saved=transcript_stats.saved_tokens)
+
+    async def arun_cached(self, user_prompt: str, type_name: str, type_id: int, task_uuid: str | None = None) -> tuple[TaskResult, bool]:
+        """
+        带结果缓存的 arun：相同的举报与案例直接复用已有结果，并发的相同请求只执行一次
+        指定 task_uuid 表示续接已有会话，结果依赖会话历史，此时不使用缓存
+        复用的结果不属于本请求的会话，返回的 task_uuid 为 None，不会把其他请求的会话交给调用方续接
+        :param user_prompt: 用户举报信息
+        :param type_name: 异常类型名称
+        :param type_id: 类型下的案例ID
+        :param task_uuid: 任务UUID
+        :return: 任务结果，以及是否复用了缓存或其他请求的结果
+        """
+        if task_uuid is not None:
+            return await self.arun_task(user_prompt, type_name, type_id, task_uuid), False
+
+        cache_key = self.task_cache.make_key(user_prompt, type_name, type_id)
+        result, reused = await self.task_cache.get_or_run(
+            cache_key, lambda: self.arun_task(user_prompt, type_name, type_id, str(uuid.uuid4()))
         )
+        if reused:
+            result = dataclasses.replace(result, task_uuid=None, prompt_tokens_saved=0)
+        return result, reused
 
-        messages = response["messages"]
-        reasoning_content = messages[-1].content_blocks if messages[-1].content_blocks else ""
+    @staticmethod
+    def _reasoning_text(messages: list) -> str:
+        """取规划器最后一条消息的文本作为推理过程"""
+        if not messages:
+            return ""
+        content_blocks = messages[-1].content_blocks
+        return content_blocks[-1]['text'] if content_blocks else ""
 
-        # 使用 generator 生成最终报告（参考 run_with_final_report）
-        prompt = generator_sys_prompt.format(user_prompt=user_prompt, agent_response=messages)
-        final_report_response = final_report_generator.invoke({"messages": [prompt]})
-        final_report: FinalReport = final_report_response["structured_response"]
+    @staticmethod
+    def _stream_mode(stream_tokens: bool | None) -> list[str]:
+        """流式输出模式：updates 对应完整的节点输出，messages 对应模型逐 token 的输出"""
+        if stream_tokens is None:
+            stream_tokens = default_stream_tokens
+        return ["updates", "messages"] if stream_tokens else ["updates"]
+
+    def _planner_part_events(self, mode: str, data, step_count: int, all_messages: list,
+                             coalescer: DeltaCoalescer) -> tuple[list[str], int]:
+        """
+        将规划器的一次流式输出转换为 SSE 事件
+        :param mode: 流式输出模式，updates 或 messages
+        :param data: 对应模式的输出
+        :param step_count: 当前步骤数
+        :param all_messages: 收集到的所有消息，原地追加
+        :param coalescer: 推理过程增量的合并器
+        :return: SSE 事件列表和最新步骤数
+        """
+        if mode == "messages":
+            message, metadata = data
+            # 只转发规划器自身的模型输出：工具消息不是增量，工具内部执行器的输出位于嵌套的命名空间中
+            if not isinstance(message, AIMessageChunk) or metadata.get("langgraph_node") != "model" \
+                    or "|" in metadata.get("langgraph_checkpoint_ns", ""):
+                return [], step_count
+            text = coalescer.push(message.text)
+            return ([self._reasoning_delta_event(text, step_count + 1)] if text else []), step_count
+
+        # 节点输出之前先发送缓冲区中剩余的增量
+        events = [self._reasoning_delta_event(text, step_count + 1)] if (text := coalescer.flush()) else []
+        chunk_events, step_count = self._chunk_events(data, step_count, all_messages)
+        return events + chunk_events, step_count
+
+    def _report_part_events(self, mode: str, data, step_count: int, coalescer: DeltaCoalescer,
+                            parser: ReportDeltaParser, final_report: FinalReport | None) -> tuple[list[str], FinalReport | None]:
+        """
+        将生成器的一次流式输出转换为 final_report_delta 事件，并取出结构化的最终报告
+        :param mode: 流式输出模式，updates 或 messages
+        :param data: 对应模式的输出
+        :param step_count: 当前步骤数
+        :param coalescer: 报告 JSON 片段的合并器
+        :param parser: 报告字段增量的解析器
+        :param final_report: 已取得的最终报告
+        :return: SSE 事件列表和最终报告
+        """
+        if mode == "messages":
+            message, _ = data
+            if not isinstance(message, AIMessageChunk):
+                return [], final_report
+            # 结构化输出以工具调用参数的形式逐段返回
+            text = "".join(chunk.get("args") or "" for chunk in message.tool_call_chunks)
+            raw = coalescer.push(text)
+        else:
+            raw = coalescer.flush()
+            for update in data.values():
+                if isinstance(update, dict) and update.get("structured_response") is not None:
+                    final_report = update["structured_response"]
+
+        deltas = parser.feed(raw) if raw else {}
+        return ([self._final_report_delta_event(deltas, step_count)] if deltas else []), final_report
+
+    def _chunk_events(self, chunk: dict, step_count: int, all_messages: list) -> tuple[list[str], int]:
+        """
+        将一次 updates 流式输出转换为 SSE 事件
+        :param chunk: planner 的 updates 输出
+        :param step_count: 当前步骤数
+        :param all_messages: 收集到的所有消息，原地追加
+        :return: SSE 事件列表和最新步骤数
+        """
+        events = []
+        for step, data in chunk.items():
+            step_count += 1
+            response = data.get('messages', [None])[-1]
+
+            # 收集消息
+            if response is not None:
+                all_messages.append(response)
+
+            if isinstance(response, AIMessage):
+                # AI 消息事件 - 推理过程
+                content = response.content if isinstance(response.content, str) else str(response.content)
+
+                # usage 为本次模型调用的输入 token 数，以及其中命中与未命中服务端前缀缓存的数量
+                events.append(self._format_sse_event(
+                    "reasoning",
+                    {"content": content, "tool_calls": response.tool_calls or [], "usage": prompt_cache_usage(response)},
+                    step=step_count,
+                    event_type="reasoning"
+                ))
+
+                # 工具调用事件 - 推理过程
+                if response.tool_calls is not None and len(response.tool_calls) > 0:
+                    for tool_call in response.tool_calls:
+                        events.append(self._format_sse_event(
+                            "tool_call",
+                            {"tool_name": tool_call.get('name'), "tool_args": tool_call.get('args', {})},
+                            step=step_count,
+                            event_type="reasoning"
+                        ))
+
+            elif isinstance(response, ToolMessage):
+                # 工具返回结果事件 - 推理过程
+                tool_content = response.content
+                # 如果是结构化对象，转换为字典
+                if hasattr(tool_content, 'model_dump'):
+                    tool_content = tool_content.model_dump()
+
+                # 工具产物中记录了是否命中报告缓存，以及图片预处理节省的字节数
+                artifact = response.artifact if isinstance(response.artifact, dict) else {}
+
+                events.append(self._format_sse_event(
+                    "tool_message",
+                    {
+                        "tool_name": response.name,
+                        "content": tool_content,
+                        "cache_hit": artifact.get("cache_hit", False),
+                        "image_bytes": artifact.get("image_bytes", 0),
+                        "image_bytes_saved": artifact.get("image_bytes_saved", 0),
+                    },
+                    step=step_count,
+                    event_type="reasoning"
+                ))
+
+            elif isinstance(response, HumanMessage):
+                # 用户消息事件
+                events.append(self._format_sse_event(
+                    "human_message",
+                    {"content": response.content},
+                    step=step_count,
+                    event_type="reasoning"
+                ))
+
+        # 步骤完成事件
+        events.append(self._format_sse_event(
+            "step",
+            {"message": f"步骤 {step_count} 完成"},
+            step=step_count,
+            event_type="reasoning"
+        ))
+        return events, step_count
 
-        return reasoning_content, final_report, len(messages)
+    def _task_start_event(self, task_uuid: str | None) -> str:
+        """任务开始事件，复用其他请求的结果时 task_uuid 为 None"""
+        return self._format_sse_event(
+            "reasoning",
+            {"message": "任务开始", "task_uuid": task_uuid},
+            step=0,
+            event_type="reasoning"
+        )
+
+    def _reasoning_complete_event(self, step_count: int) -> str:
+        """推理完成事件"""
+        return self._format_sse_event(
+            "reasoning_complete",
+            {"message": "推理完成，开始生成报告", "total_steps": step_count},
+            step=step_count,
+            event_type="reasoning"
+        )
+
+    def _reasoning_delta_event(self, content: str, step: int) -> str:
+        """推理过程增量事件，step 为正在进行的步骤"""
+        return self._format_sse_event(
+            "reasoning_delta",
+            {"content": content},
+            step=step,
+            event_type="reasoning"
+        )
+
+    def _final_report_delta_event(self, deltas: dict[str, str], step_count: int) -> str:
+        """最终报告增量事件，data 为字段名 -> 新增文本"""
+        return self._format_sse_event(
+            "final_report_delta",
+            deltas,
+            step=step_count,
+            event_type="final_report"
+        )
+
+    def _final_report_event(self, final_report: FinalReport, step_count: int, cache_hit: bool = False,
+                            prompt_tokens_saved: int = 0) -> str:
+        """
+        最终报告事件，cache_hit 表示报告来自 /task 结果缓存
+        prompt_tokens_saved 为精简消息历史节省的生成器输入 token 数（估算）
+        """
+        return self._format_sse_event(
+            "final_report",
+            {
+                "analyze_goal": final_report.analyze_goal,
+                "reasoning_process_report": final_report.reasoning_process_report,
+                "final_report": final_report.final_report,
+                "cache_hit": cache_hit,
+                "prompt_tokens_saved": prompt_tokens_saved,
+            },
+            step=step_count,
+            event_type="final_report"
+        )
 
     @staticmethod
     def _format_sse_event(event: str, data: dict | str, step: int | None = None, event_type: str = "reasoning") -> str:
@@ -188,6 +562,121 @@ class PlannerService(Planner):
         return f"data: {json_data}\n\n"
 
 
+class CsvRowStream:
+    """
+    增量读取上传的 CSV 文件：按块读取并解码，表头只校验一次，之后逐条产出数据行
+    格式错误的行以 ValueError 的形式产出，由调用方转换为 verify_error 事件，而不是拒绝整个文件
+    """
+    required_fields = {"type_name", "id", "response"}
+
+    def __init__(self, file: UploadFile, chunk_size: int = 64 * 1024):
+        """
+        初始化
+        :param file: 上传的 CSV 文件
+        :param chunk_size: 每次读取的字节数
+        """
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._lines: deque[str] = deque()  # 已切分、待消费的文本行
+        self._partial: str = ""             # 最后一个尚未结束的文本行
+        self._eof: bool = False
+        self._header: list[str] = []
+        self._first_row: dict | ValueError | None = None
+
+    async def open(self) -> bool:
+        """
+        读取并校验表头，同时预读第一条数据
+        :return: 文件中是否存在数据行
+        """
+        header = await self._next_record()
+        if header is None:
+            raise ValueError("CSV 文件内容为空")
+        self._header = next(csv.reader(["".join(header)]))
+        if not self.required_fields.issubset(self._header):
+            raise ValueError(f"CSV 缺少必要列，需要: {self.required_fields}")
+
+        self._first_row = await self._next_row()
+        return self._first_row is not None
+
+    async def __aiter__(self) -> AsyncGenerator[dict | ValueError, None]:
+        """逐条产出数据行（需先调用 open）"""
+        row = self._first_row
+        self._first_row = None
+        while row is not None:
+            yield row
+            row = await self._next_row()
+
+    async def _next_row(self) -> dict | ValueError | None:
+        """读取下一条非空数据行，文件结束时返回 None"""
+        while (record := await self._next_record()) is not None:
+            try:
+                fields = next(csv.reader(["".join(record)], strict=True), [])
+            except csv.Error as e:
+                return self._bad_record(record, f"CSV 格式错误 ({e})")
+            if not fields:
+                continue  # 与 csv.DictReader 一致，跳过空行
+            if len(fields) != len(self._header):
+                return self._bad_record(record, "字段数量与表头不一致")
+            row = dict(zip(self._header, fields))
+            try:
+                return VerifyCsvRow(
+                    type_name=row["type_name"].strip(),
+                    id=row["id"].strip(),
+                    response=row["response"].strip(),
+                ).model_dump()
+            except ValueError as e:
+                return e
+        return None
+
+    def _bad_record(self, record: list[str], reason: str) -> ValueError:
+        """跨行记录解析失败时只把第一行当作错误行，其余行放回缓冲区重新解析"""
+        self._lines.extendleft(reversed(record[1:]))
+        return ValueError(f"{reason}: {record[0].strip()[:100]}")
+
+    async def _next_record(self) -> list[str] | None:
+        """
+        读取下一条完整的 CSV 记录（按行返回），引号内的换行不作为记录结束
+        与 csv 模块一致，只有字段开头的引号才开始引用，字段中间的引号按普通字符处理
+        """
+        record_lines = []
+        in_quotes, field_start = False, True
+        while (line := await self._next_line()) is not None:
+            record_lines.append(line)
+            escaped = False
+            for char in line:
+                if escaped:
+                    escaped = False
+                    in_quotes = char == '"'  # 连续两个引号是转义，否则刚才的引号结束了引用
+                    field_start = char == ","
+                elif in_quotes:
+                    escaped = char == '"'
+                elif char == '"' and field_start:
+                    in_quotes, field_start = True, False
+                else:
+                    field_start = char == ","
+            if not in_quotes or escaped:
+                break
+            field_start = False
+        return record_lines or None
+
+    async def _next_line(self) -> str | None:
+        """读取下一行文本（保留换行符），文件结束时返回 None"""
+        while not self._lines and not self._eof:
+            chunk = await self._file.read(self._chunk_size)
+            if not chunk:
+                self._eof = True
+                text = self._partial + self._decoder.decode(b"", final=True)
+                self._partial = ""
+                if text:
+                    self._lines.append(text)
+                break
+            lines = (self._partial + self._decoder.decode(chunk)).split("\n")
+            self._partial = lines.pop()
+            self._lines.extend(line + "\n" for line in lines)
+        return self._lines.popleft() if self._lines else None
+
+
 class VerifierService:
     """评估验证服务"""
 
@@ -272,16 +761,149 @@ class VerifierService:
             event_type="verify",
         )
 
+    async def arun_stream(self,
+                          rows: list[dict] | AsyncIterable[dict | ValueError],
+                          workers: int = verify_max_workers,
+                          ordered: bool = False) -> AsyncGenerator[str, None]:
+        """
+        并发评估每条数据，每条评估完成后立即通过 SSE 返回结果
+        :param rows: 解析后的 CSV 行列表，或增量产出数据行的 CsvRowStream，每行包含 type_name, id, response
+        :param workers: 并发评分的工作协程数
+        :param ordered: 是否按原始行顺序返回结果，默认按完成顺序返回
+        :return: SSE 事件生成器
+        """
+        # 增量读取时总数未知，在 verify_complete 事件中给出
+        total = len(rows) if isinstance(rows, list) else None
+        if total is not None:
+            workers = max(1, min(workers, total))
+
+        yield self._format_sse_event(
+            "verify_start",
+            {"message": "开始评估", "total": total, "workers": workers},
+            step=0,
+            event_type="verify",
+        )
+
+        input_queue: asyncio.Queue[tuple[int, dict | ValueError] | None] = asyncio.Queue(maxsize=workers * 2)
+        output_queue: asyncio.Queue[tuple[int, str] | None] = asyncio.Queue()
+        row_count = 0
+
+        async def produce() -> None:
+            nonlocal row_count
+            try:
+                if isinstance(rows, list):
+                    for row in rows:
+                        await input_queue.put((row_count, row))
+                        row_count += 1
+                else:
+                    async for row in rows:
+                        await input_queue.put((row_count, row))
+                        row_count += 1
+            except Exception as e:
+                # 读取过程中出错（例如编码错误），后续内容无法继续解析
+                await input_queue.put((row_count, ValueError(f"CSV 读取失败: {str(e)}")))
+                row_count += 1
+            finally:
+                for _ in range(workers):
+                    await input_queue.put(None)
+
+        async def work() -> None:
+            while (item := await input_queue.get()) is not None:
+                index, row = item
+                await output_queue.put((index, await self._averify_row(index, row)))
+            await output_queue.put(None)
+
+        tasks = [asyncio.create_task(produce())] + [asyncio.create_task(work()) for _ in range(workers)]
+        try:
+            pending: dict[int, str] = {}  # 有序模式下等待输出的事件
+            next_index = 0
+            finished_workers = 0
+            while finished_workers < workers:
+                result = await output_queue.get()
+                if result is None:
+                    finished_workers += 1
+                    continue
+
+                index, event = result
+                if not ordered:
+                    yield event
+                    continue
+
+                pending[index] = event
+                while next_index in pending:
+                    yield pending.pop(next_index)
+                    next_index += 1
+        finally:
+            # 客户端断开等情况下取消尚未完成的评分
+            for task in tasks:
+                task.cancel()
+
+        yield self._format_sse_event(
+            "verify_complete",
+            {"message": "评估完成", "total": row_count},
+            step=row_count,
+            event_type="verify",
+        )
+
+    async def _averify_row(self, index: int, row: dict | ValueError) -> str:
+        """
+        评估单行数据
+        :param index: 原始行索引
+        :param row: 行数据，格式错误的行为 ValueError
+        :return: verify_item 或 verify_error 事件
+        """
+        if isinstance(row, ValueError):
+            return self._format_sse_event(
+                "verify_error",
+                {"index": index, "type_name": None, "id": None, "error": str(row)},
+                step=index + 1,
+                event_type="verify",
+            )
+
+        try:
+            await verify_rate_limiter.aacquire()
+            report: VerifyReport = await aserver_verify(
+                type_name=row["type_name"],
+                id=row["id"],
+                response=row["response"],
+            )
+            return self._format_sse_event(
+                "verify_item",
+                {
+                    "index": index,
+                    "type_name": row["type_name"],
+                    "id": row["id"],
+                    "report": report.model_dump(),
+                },
+                step=index + 1,
+                event_type="verify",
+            )
+        except Exception as e:
+            return self._format_sse_event(
+                "verify_error",
+                {
+                    "index": index,
+                    "type_name": row["type_name"],
+                    "id": row["id"],
+                    "error": str(e),
+                },
+                step=index + 1,
+                event_type="verify",
+            )
+
 
 # 全局服务实例
 _planner_service: PlannerService | None = None
+_service_lock = threading.Lock()  # FastAPI 在线程池中执行同步依赖，需防止并发的首个请求重复创建实例
 
 
 def get_planner_service() -> PlannerService:
     """获取 Planner 服务实例"""
     global _planner_service
     if _planner_service is None:
-        _planner_service = PlannerService()
+        with _service_lock:
+            if _planner_service is None:
+                _planner_service = PlannerService()
     return _planner_service
 
 
@@ -292,5 +914,7 @@ def get_verifier_service() -> VerifierService:
     """获取 Verifier 服务实例"""
     global _verifier_service
     if _verifier_service is None:
-        _verifier_service = VerifierService()
+        with _service_lock:
+            if _verifier_service is None:
+                _verifier_service = VerifierService()
     return _verifier_service
@@ -0,0 +1,11 @@
+import os
+import sys
+from pathlib import Path
+
+# 测试不访问真实模型服务，只需要模块导入时读取的配置存在
+os.environ.setdefault("API_KEY", "test")
+os.environ.setdefault("BASE_URL", "http://127.0.0.1:9/v1")
+os.environ.setdefault("MODEL", "test-planner")
+os.environ.setdefault("VISUAL_MODEL", "test-visual")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,57 @@
+import pytest
+
+from guard.common.city_map import CityMap
+from guard.common.meta_registry import meta_registry
+from guard.common.model import Monitor, Camera
+
+GRID = [
+    ["area_1", "road_1_1", "area_2"],
+    ["road_2_1", "cross_1", "road_2_2"],
+]
+
+
+def camera(name: str, area: str) -> Camera:
+    return Camera(camera_name=name, camera_area=area, camera_location=f"{area} 里")
+
+
+def small_map(**overrides) -> CityMap:
+    kwargs = {
+        "grid": GRID,
+        "monitors": {"monitor_7": Monitor(monitor_name="monitor_7", monitor_area=["road_1_1", "road_2_1"])},
+        "cameras": {
+            "area_2_camera_1": camera("area_2_camera_1", "area_2"),
+            "area_1_camera_2": camera("area_1_camera_2", "area_1"),
+            "area_1_camera_1": camera("area_1_camera_1", "area_1"),
+        },
+    }
+    return CityMap(**(kwargs | overrides))
+
+
+def test_lookups():
+    city_map = small_map()
+    assert [c.camera_name for c in city_map.cameras_in("area_1")] == ["area_1_camera_2", "area_1_camera_1"]
+    assert city_map.cameras_in("area_9") == []
+    assert city_map.monitor_image_id("monitor_7") == "7"
+    assert city_map.camera_image_id("area_1_camera_2") == ("1", "2")
+    assert city_map.render_grid() == "area_1, road_1_1, area_2;\nroad_2_1, cross_1, road_2_2;"
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"grid": [["area_1", "road_1_1"], ["area_1", "cross_1"]]}, "重复的格子"),
+    ({"monitors": {"monitor_1": Monitor(monitor_name="monitor_1", monitor_area=["road_9_9"])}}, "不存在的格子"),
+    ({"cameras": {"area_9_camera_1": camera("area_9_camera_1", "area_9")}}, "不存在的格子"),
+    ({"monitors": {"monitor_": Monitor(monitor_name="monitor_", monitor_area=["road_1_1"])}}, "无法从名称中解析编号"),
+    ({"cameras": {"camera_1": camera("camera_1", "area_1")}}, "无法从名称中解析编号"),
+])
+def test_invalid_meta_is_rejected(overrides, message):
+    with pytest.raises(ValueError, match=message):
+        small_map(**overrides)
+
+
+def test_prompt_map_is_rendered_from_city_grid():
+    from guard.agent.planner import planner_system_prompt
+
+    city_map = meta_registry.city_map
+    assert city_map.render_grid() in planner_system_prompt().content
+    assert all(city_map.monitor_image_id(name) for name in city_map.monitors)
+    assert sum(len(city_map.cameras_in(cell)) for cells in city_map.grid for cell in cells) == len(city_map.cameras)
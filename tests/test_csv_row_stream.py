@@ -0,0 +1,82 @@
+import asyncio
+import io
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.datastructures import UploadFile
+
+from guard.server.router import router
+from guard.server.service import CsvRowStream, get_verifier_service
+
+HEADER = "type_name,id,response\n"
+
+
+def good_rows(start: int, count: int) -> str:
+    return "".join(f"占道经营,{i},\"报告 {i}, 含逗号\"\n" for i in range(start, start + count))
+
+
+def read_all(content: str, chunk_size: int = 64 * 1024) -> tuple[bool, list[dict | ValueError]]:
+    async def run():
+        rows = CsvRowStream(UploadFile(io.BytesIO(content.encode("utf-8"))), chunk_size=chunk_size)
+        has_rows = await rows.open()
+        return has_rows, [row async for row in rows]
+    return asyncio.run(run())
+
+
+def test_stray_quote_only_affects_its_own_row():
+    content = HEADER + good_rows(0, 300) + "garbage,3,abc\"def\n" + good_rows(300, 5)
+    for chunk_size in (7, 64 * 1024):
+        _, rows = read_all(content, chunk_size)
+        assert all(isinstance(row, dict) for row in rows)
+        assert [row["id"] for row in rows if row["type_name"] == "占道经营"] == list(range(305))
+        # 与 csv 模块一致，字段中间的引号按普通字符处理
+        assert {"type_name": "garbage", "id": 3, "response": "abc\"def"} in rows
+
+
+def test_unclosed_quote_resumes_at_next_line():
+    content = HEADER + good_rows(0, 300) + "garbage,\"abc\n" + good_rows(300, 5)
+    _, rows = read_all(content)
+    errors = [row for row in rows if isinstance(row, ValueError)]
+    assert [row["id"] for row in rows if isinstance(row, dict)] == list(range(305))
+    assert len(errors) == 1
+
+
+def test_quoted_newlines_and_escaped_quotes():
+    content = HEADER + "占道经营,1,\"第一行\n第二行 \"\"引用\"\"\"\n占道经营,2,ok\n"
+    _, rows = read_all(content)
+    assert rows == [
+        {"type_name": "占道经营", "id": 1, "response": "第一行\n第二行 \"引用\""},
+        {"type_name": "占道经营", "id": 2, "response": "ok"},
+    ]
+
+
+def test_bad_first_data_row_is_a_row_error():
+    has_rows, rows = read_all(HEADER + "garbage,\"abc\n" + good_rows(0, 2))
+    assert has_rows
+    assert isinstance(rows[0], ValueError)
+    assert [row["id"] for row in rows[1:]] == [0, 1]
+
+
+class RecordingVerifier:
+    """只记录收到的数据行，不调用模型"""
+    def __init__(self):
+        self.rows = []
+
+    async def arun_stream(self, rows, workers=None, ordered=True):
+        async for row in rows:
+            self.rows.append(row)
+            yield "data: {}\n\n"
+
+
+def test_verify_endpoint_accepts_bad_first_data_row():
+    verifier = RecordingVerifier()
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_verifier_service] = lambda: verifier
+
+    content = HEADER + "garbage,\"abc\n" + good_rows(0, 300) + "garbage,3,abc\"def\n" + good_rows(300, 5)
+    with TestClient(app) as client:
+        response = client.post("/api/v1/verify/stream", files={"file": ("rows.csv", content.encode("utf-8"), "text/csv")})
+    assert response.status_code == 200
+    scored = [row["id"] for row in verifier.rows if isinstance(row, dict) and row["type_name"] == "占道经营"]
+    assert scored == list(range(305))
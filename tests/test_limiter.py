@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+
+from guard.agent.limiter import AdaptiveConcurrencyLimiter, ConcurrencyLimiter
+
+
+def test_async_waiter_wakes_on_release():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial=1, max_limit=1)
+        order = []
+
+        async def worker(name: str, hold: float):
+            async with limiter:
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        start = time.perf_counter()
+        await asyncio.gather(worker("a", 0.01), worker("b", 0.0), worker("c", 0.0))
+        # 名额释放后立即唤醒，不等待轮询间隔
+        assert time.perf_counter() - start < 0.04
+        assert sorted(order) == ["a", "b", "c"]
+        assert limiter.inflight == 0
+
+    asyncio.run(run())
+
+
+def test_sync_release_wakes_async_waiter():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial=1, max_limit=1)
+        limiter.__enter__()
+        threading.Timer(0.02, limiter.__exit__, args=(None, None, None)).start()
+        async with limiter:
+            assert limiter.inflight == 1
+        assert limiter.inflight == 0
+
+    asyncio.run(asyncio.wait_for(run(), timeout=1))
+
+
+def test_cancelled_waiter_does_not_leak_slot():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial=1, max_limit=1)
+        async with limiter:
+            waiter = asyncio.create_task(limiter.__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+        async with limiter:
+            assert limiter.inflight == 1
+
+    asyncio.run(asyncio.wait_for(run(), timeout=1))
+
+
+def test_latency_is_tracked_per_model():
+    limiter = AdaptiveConcurrencyLimiter(initial=4, latency_tolerance=2.0)
+    for _ in range(20):
+        limiter.on_success(0.5, "planner")
+    before = limiter.limit
+    # 视觉模型本身就慢，不应被当作规划器变慢而下调上限
+    for _ in range(5):
+        limiter.on_success(5.0, "visual")
+    assert limiter.limit >= before
+
+    before = limiter.limit
+    for _ in range(5):
+        limiter.on_success(5.0, "planner")
+    assert limiter.limit < before
+
+
+def test_sync_and_async_share_one_cap():
+    limiter = ConcurrencyLimiter(2)
+    peak, lock = [0], threading.Lock()
+
+    def track(delta: int) -> None:
+        with lock:
+            track.current += delta
+            peak[0] = max(peak[0], track.current)
+    track.current = 0
+
+    def sync_call():
+        with limiter:
+            track(1)
+            time.sleep(0.02)
+            track(-1)
+
+    async def async_calls():
+        async def call():
+            async with limiter:
+                track(1)
+                await asyncio.sleep(0.02)
+                track(-1)
+        await asyncio.gather(*(call() for _ in range(4)))
+
+    threads = [threading.Thread(target=sync_call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    asyncio.run(async_calls())
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+    assert limiter.inflight == 0
+
+
+def test_unlimited_limiter_never_waits():
+    async def run():
+        limiter = ConcurrencyLimiter(0)
+        async with limiter, limiter, limiter:
+            assert limiter.inflight == 3
+
+    asyncio.run(asyncio.wait_for(run(), timeout=1))
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from guard.agent.llm import LoopLocalTransport
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_each_event_loop_gets_its_own_pool(server_url):
+    transport = LoopLocalTransport(httpx.Limits(max_connections=4))
+    client = httpx.AsyncClient(transport=transport, timeout=5)
+
+    async def request_twice() -> object:
+        assert (await client.get(server_url)).text == "ok"
+        pool = transport._transport()
+        assert (await client.get(server_url)).text == "ok"
+        assert transport._transport() is pool
+        return pool
+
+    # 连续的 asyncio.run 各自使用新的事件循环，上一个事件循环留下的空闲连接不能被复用
+    first = asyncio.run(request_twice())
+    second = asyncio.run(request_twice())
+    assert first is not second
+
+
+def test_client_is_usable_from_concurrent_loops(server_url):
+    client = httpx.AsyncClient(transport=LoopLocalTransport(httpx.Limits(max_connections=4)), timeout=5)
+    results = []
+
+    def worker() -> None:
+        async def run() -> None:
+            for _ in range(3):
+                results.append((await client.get(server_url)).status_code)
+        asyncio.run(run())
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [200] * 12
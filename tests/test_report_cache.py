@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from guard.common.model import MonitorReport, CameraReport
+from guard.common.report_cache import ReportCache
+
+
+def monitor_report(content: str) -> MonitorReport:
+    return MonitorReport(monitor_name="监控1", monitor_area=["A区"], monitor_content=content, monitor_report="报告")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ReportCache(db_path=str(tmp_path / "report_cache.sqlite3"), ttl=0, max_entries=8, enabled=True)
+
+
+def test_key_depends_on_model_prompt_and_image_order():
+    key = ReportCache.make_key("visual", "prompt", ["a", "b"])
+    assert key == ReportCache.make_key("visual", "prompt", ["a", "b"])
+    assert len({
+        key,
+        ReportCache.make_key("visual-2", "prompt", ["a", "b"]),
+        ReportCache.make_key("visual", "prompt 2", ["a", "b"]),
+        ReportCache.make_key("visual", "prompt", ["b", "a"]),
+        ReportCache.make_key("visual", "prompt", ["a"]),
+        # 各部分之间有分隔符，拼接结果相同的不同输入不会冲突
+        ReportCache.make_key("visual", "prompt", ["ab"]),
+        ReportCache.make_key("visual", "promp", ["ta", "b"]),
+    }) == 7
+
+
+def test_get_returns_stored_report_of_the_same_kind(cache):
+    key = ReportCache.make_key("visual", "prompt", ["a"])
+    cache.put(key, monitor_report("画面"))
+    assert cache.get(key, MonitorReport) == monitor_report("画面")
+    assert cache.get(key, CameraReport) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_expired_entries_are_dropped(cache):
+    cache.ttl = 0.05
+    key = ReportCache.make_key("visual", "prompt", ["a"])
+    cache.put(key, monitor_report("画面"))
+    time.sleep(0.1)
+    assert cache.get(key, MonitorReport) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.max_entries = 2
+    keys = [ReportCache.make_key("visual", "prompt", [str(i)]) for i in range(3)]
+    cache.put(keys[0], monitor_report("0"))
+    cache.put(keys[1], monitor_report("1"))
+    time.sleep(0.01)
+    assert cache.get(keys[0], MonitorReport) is not None
+    time.sleep(0.01)
+    cache.put(keys[2], monitor_report("2"))
+    assert [cache.get(key, MonitorReport) is not None for key in keys] == [True, False, True]
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = ReportCache(db_path=str(tmp_path / "report_cache.sqlite3"), enabled=False)
+    key = ReportCache.make_key("visual", "prompt", ["a"])
+    cache.put(key, monitor_report("画面"))
+    assert cache.get(key, MonitorReport) is None
+    assert not (tmp_path / "report_cache.sqlite3").exists()
+    assert cache.settings()["enabled"] is False
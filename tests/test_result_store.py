@@ -0,0 +1,117 @@
+import json
+import time
+
+import pytest
+
+import guard.experiment.solver as solver_module
+from guard.common.model import RootAnalyzeReport
+from guard.experiment.result_store import ExperimentResultStore, MissingResultsError
+from guard.experiment.solver import ExperimentSolver
+
+TYPE_NAME = "accident"
+
+
+class FakePlanner:
+    """只提供类型名称，规划结果由 ScriptedSolver 给出"""
+    type_name = TYPE_NAME
+
+
+class ScriptedSolver(ExperimentSolver):
+    """按轮次返回固定报告与得分，不调用模型；crash 为 True 时打分阶段抛出异常，模拟进程中断"""
+    def __init__(self, attempt: int, crash: bool = False):
+        super().__init__(FakePlanner(), experiment_name="resume-test")
+        self.attempt = attempt
+        self.crash = crash
+        self.planned: list[int] = []
+        self.verified: list[int] = []
+
+    def _process_single_task(self, idx: int, task_uuid: str | None = None) -> tuple[int, RootAnalyzeReport]:
+        self.planned.append(idx)
+        return idx, RootAnalyzeReport(type_name=TYPE_NAME, id=self.data[idx].id, reasoning=[],
+                                      response=f"第 {self.attempt} 次规划", step=self.attempt, score=0.0)
+
+    def _verify_single_report(self, report: RootAnalyzeReport) -> RootAnalyzeReport:
+        if self.crash:
+            raise RuntimeError("进程在打分前中断")
+        self.verified.append(report.id)
+        report.score = float(self.attempt)
+        report.timings["verify"] = 0.0
+        return report
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ExperimentResultStore(str(tmp_path / "results.db"))
+    monkeypatch.setattr(solver_module, "result_store", store)
+    yield store
+    store.close()
+
+
+def test_replan_clears_stale_score(store):
+    report = RootAnalyzeReport(type_name=TYPE_NAME, id=1, reasoning=[], response="旧报告", step=1, score=0.8)
+    store.save_report("exp", report)
+    store.save_score("exp", TYPE_NAME, 1, 0.5, metric="rescore")
+
+    report.response, report.score = "新报告", 0.0
+    store.save_report("exp", report, metric=None)
+    assert store.cases("exp")[0]["score"] is None
+    assert store.cases("exp", metric="rescore")[0]["score"] is None
+
+
+def test_replan_crash_then_resume_rescores_new_report(store):
+    ScriptedSolver(attempt=1).solve(start_id=1, end_id=2, is_multi=False)
+    assert [row["score"] for row in store.cases("resume-test")] == [1.0, 1.0]
+    config = json.loads(store._connect().execute("SELECT config FROM runs WHERE experiment = 'resume-test'").fetchone()[0])
+    assert set(config["image_preprocess"]) == {"enabled", "max_edge", "quality", "grayscale"}
+    assert set(config["report_cache"]) == {"enabled", "ttl"}
+    assert set(config["transcript"]) == {"enabled", "max_field_chars", "dedup"}
+
+    # 重新规划第一个样例后，在打分前中断
+    crashed = ScriptedSolver(attempt=2, crash=True)
+    crashed.solve(start_id=1, end_id=1, is_multi=False)
+    assert crashed.planned == [0]
+    row = store.cases("resume-test")[0]
+    assert (row["response"], row["score"]) == ("第 2 次规划", None)
+
+    # 续跑只为重新规划过的样例补打分，不重新规划，也不重复打分已完成的样例
+    resumed = ScriptedSolver(attempt=3)
+    resumed.solve(start_id=1, end_id=2, is_multi=False, resume=True)
+    assert resumed.planned == []
+    assert resumed.verified == [1]
+    assert [(row["response"], row["score"]) for row in store.cases("resume-test")] == [("第 2 次规划", 3.0), ("第 1 次规划", 1.0)]
+
+
+def test_analysis_without_results_points_to_import(store, monkeypatch):
+    import guard.experiment.new_verify_test as new_verify_test
+    monkeypatch.setattr(new_verify_test, "result_store", store)
+    with pytest.raises(MissingResultsError, match="guard.experiment.result_store import"):
+        new_verify_test.re_verify_all()
+
+
+def test_readers_default_to_latest_run(store, tmp_path):
+    csv_path = tmp_path / f"{TYPE_NAME}.csv"
+    csv_path.write_text("type_name,id,response,step,score\n"
+                        f"{TYPE_NAME},1,旧报告,9,0.1\n{TYPE_NAME},2,旧报告,9,0.2\n", encoding="utf-8")
+    assert store.import_csv("exp", str(csv_path)) == 2
+    # 只有导入的 CSV 时，它就是最近一次运行
+    assert store.latest_run("exp") == "csv"
+
+    for run_id, score in (("r0", 0.5), ("r1", 0.9)):
+        store.start_run("exp", run_id=run_id)
+        store.save_report("exp", RootAnalyzeReport(type_name=TYPE_NAME, id=1, reasoning=[], response=run_id,
+                                                   step=3, score=score), run_id=run_id)
+        time.sleep(0.01)
+    # 没有打分的样例
+    store.save_report("exp", RootAnalyzeReport(type_name=TYPE_NAME, id=2, reasoning=[], response="r1",
+                                               step=4, score=0.0), run_id="r1", metric=None)
+
+    assert store.latest_run("exp") == "r1"
+    assert [(row["run_id"], row["score"]) for row in store.cases("exp")] == [("r1", 0.9), ("r1", None)]
+    assert store.scores("exp") == [0.9]
+    assert store.steps("exp") == [3, 4]
+    assert store.scores("exp", run_id="r0") == [0.5]
+    assert len(store.cases("exp", run_id=None)) == 5
+    assert store.cases("missing") == []
+
+    summary = {row["run_id"]: row["cases"] for row in store.summary()}
+    assert summary == {"csv": 2, "r0": 1, "r1": 2}
@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+import pytest
+
+from guard.common.model import FinalReport
+from guard.server.cache import TaskResult, TaskResultCache
+from guard.server.service import PlannerService
+
+
+def task_result(task_uuid: str) -> TaskResult:
+    report = FinalReport(user_prompt="举报", analyze_goal="目标", reasoning_process_report="过程", final_report="结论")
+    return TaskResult(task_uuid=task_uuid, reasoning_process="推理", final_report=report, steps=1)
+
+
+def test_waiters_survive_leader_cancellation():
+    async def run():
+        cache = TaskResultCache(ttl=0, max_entries=8, enabled=True)
+        calls = []
+
+        async def work() -> TaskResult:
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return task_result("leader")
+
+        key = cache.make_key("举报", "garbage", 1)
+        leader = asyncio.create_task(cache.get_or_run(key, work))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_run(key, work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        result, shared = await waiter
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert (result.task_uuid, shared, len(calls)) == ("leader", True, 1)
+        assert cache.get(key) is result
+        assert cache.stats()["inflight"] == 0
+
+    asyncio.run(run())
+
+
+def test_last_waiter_cancellation_cancels_work():
+    async def run():
+        cache = TaskResultCache(ttl=0, max_entries=8, enabled=True)
+        finished = []
+
+        async def work() -> TaskResult:
+            await asyncio.sleep(0.05)
+            finished.append(1)
+            return task_result("leader")
+
+        key = cache.make_key("举报", "garbage", 1)
+        leader = asyncio.create_task(cache.get_or_run(key, work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+        # 取消后的新请求重新执行，而不是等待已经取消的任务
+        result, shared = await cache.get_or_run(key, work)
+        assert (result.task_uuid, shared) == ("leader", False)
+        await asyncio.sleep(0.06)
+        assert finished == [1]
+
+    asyncio.run(run())
+
+
+class ScriptedPlannerService(PlannerService):
+    """不调用模型，按固定事件序列模拟一次流式任务"""
+    def __init__(self):
+        super().__init__()
+        self.task_cache = TaskResultCache(ttl=0, max_entries=8, enabled=True)
+        self.calls: list[str] = []
+
+    async def _astream_task(self, user_prompt, type_name, type_id, task_uuid, stream_mode, emit) -> TaskResult:
+        self.calls.append(task_uuid)
+        emit(self._task_start_event(task_uuid))
+        await asyncio.sleep(0.05)
+        emit(self._reasoning_complete_event(3))
+        result = task_result(task_uuid)
+        emit(self._final_report_event(result.final_report, 3))
+        return result
+
+
+def sse_events(chunks: list[str]) -> list[dict]:
+    return [json.loads(chunk.removeprefix("data: ")) for chunk in chunks]
+
+
+def test_stream_shares_cache_without_leaking_session():
+    async def collect(service: PlannerService, task_uuid: str | None = None) -> list[dict]:
+        return sse_events([event async for event in service.arun_stream("举报", "garbage", 1, task_uuid)])
+
+    async def run():
+        service = ScriptedPlannerService()
+        leader, coalesced = await asyncio.gather(collect(service), collect(service))
+        cached = await collect(service)
+        resumed = await collect(service, task_uuid="session")
+
+        assert len(service.calls) == 2 and service.calls[1] == "session"
+        assert leader[0]["data"]["task_uuid"] == service.calls[0]
+        assert leader[-1]["data"]["cache_hit"] is False
+        for events in (coalesced, cached):
+            assert [event["event"] for event in events] == ["reasoning", "reasoning_complete", "final_report"]
+            assert events[0]["data"]["task_uuid"] is None
+            assert events[-1]["data"]["cache_hit"] is True
+        assert resumed[0]["data"]["task_uuid"] == "session"
+        assert service.task_cache.stats() == {
+            "hits": 1, "misses": 1, "coalesced": 1, "entries": 1, "inflight": 0
+        }
+
+    asyncio.run(run())
+
+
+def test_stream_disconnect_keeps_coalesced_request():
+    async def run():
+        service = ScriptedPlannerService()
+        leader = service.arun_stream("举报", "garbage", 1)
+        first = await anext(leader)
+        follower = asyncio.create_task(
+            asyncio.wait_for(_collect_all(service.arun_stream("举报", "garbage", 1)), 1)
+        )
+        await asyncio.sleep(0.01)
+        await leader.aclose()
+
+        events = sse_events(await follower)
+        assert sse_events([first])[0]["data"]["task_uuid"] == service.calls[0]
+        assert events[-1]["data"]["cache_hit"] is True
+        assert len(service.calls) == 1
+
+    asyncio.run(run())
+
+
+async def _collect_all(stream) -> list[str]:
+    return [event async for event in stream]
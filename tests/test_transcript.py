@@ -0,0 +1,56 @@
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, SystemMessage
+
+from guard.common.transcript import TranscriptCompactor
+
+
+def monitor_call(call_id: str) -> dict:
+    return {"name": "get_monitor_report", "args": {"monitor_name": "监控1"}, "id": call_id}
+
+
+def monitor_result(call_id: str, content: str) -> ToolMessage:
+    report = {"monitor_name": "监控1", "monitor_area": ["A区", "B区"], "monitor_content": content, "monitor_report": "有积水"}
+    return ToolMessage(content=str(report), tool_call_id=call_id, name="get_monitor_report", artifact={"report": report})
+
+
+def planner_messages() -> list:
+    return [
+        SystemMessage(content="系统提示"),
+        HumanMessage(content="市民举报信息如下：路口\n积水"),
+        AIMessage(content="先看监控", tool_calls=[monitor_call("c1"), monitor_call("c2")]),
+        monitor_result("c1", "路面积水" * 10),
+        monitor_result("c2", "路面积水" * 10),
+        AIMessage(content="确认积水"),
+    ]
+
+
+def test_render_compacts_dedups_and_truncates():
+    transcript, stats = TranscriptCompactor(max_field_chars=12, dedup=True, enabled=True).render(planner_messages())
+    assert transcript.splitlines() == [
+        "[2] 用户: 市民举报信息如下：路口 积水",
+        "[3] 规划器: 先看监控",
+        "  调用#1 get_monitor_report(monitor_name=监控1)",
+        "  调用#2 get_monitor_report(monitor_name=监控1)",
+        "[4] 结果#1 get_monitor_report:",
+        "  监控 监控1（区域: A区, B区）",
+        "  画面: 路面积水路面积水路面积水…（截断 28 字）",
+        "  分析: 有积水",
+        "[5] 结果#2 get_monitor_report: 同结果#1",
+        "[6] 规划器: 确认积水",
+    ]
+    assert (stats.messages, stats.truncated, stats.deduplicated) == (6, 2, 1)
+    assert stats.compact_tokens < stats.raw_tokens
+    assert stats.saved_tokens == stats.raw_tokens - stats.compact_tokens
+
+
+def test_render_without_dedup_or_truncation():
+    transcript, stats = TranscriptCompactor(max_field_chars=0, dedup=False, enabled=True).render(planner_messages())
+    assert transcript.count("画面: " + "路面积水" * 10) == 2
+    assert (stats.truncated, stats.deduplicated) == (0, 0)
+
+
+def test_disabled_compactor_keeps_message_repr():
+    messages = planner_messages()
+    transcript, stats = TranscriptCompactor(enabled=False).render(messages)
+    assert transcript == str(messages)
+    assert stats.saved_tokens == 0
+    assert TranscriptCompactor(enabled=False).settings()["enabled"] is False